@@ -4,6 +4,7 @@ from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_cors import CORS
 from flask_mail import Mail
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 import logging
 import os
@@ -19,6 +20,11 @@ def create_app():
     # Load configuration
     app.config.from_object('config.Config')
     
+    # Take the client address from the hops the reverse proxy appends to
+    # X-Forwarded-For, so rate limits and audit logs see real clients
+    if app.config.get('PROXY_FIX_X_FOR'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    
     # Initialize extensions
     db.init_app(app)
     migrate.init_app(app, db)
@@ -32,9 +38,20 @@ def create_app():
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
     
+    # Authenticated requests get a cached snapshot of the admin instead of a query
+    from .utils.admin_cache import load_admin_snapshot
+    
     @login_manager.user_loader
     def load_user(user_id):
-        return Admin.query.get(int(user_id))
+        return load_admin_snapshot(int(user_id))
+    
+    # Rate limit public and login endpoints before any other work is done
+    from .utils import rate_limit
+    rate_limit.init_app(app)
+    
+    # Queue registration and receipt uploads once they are at capacity
+    from .utils import admission
+    admission.init_app(app)
     
     # Register blueprints
     from .routes.auth import auth_bp
@@ -47,6 +64,14 @@ def create_app():
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp)
     
+    # Register CLI commands
+    from . import cli
+    cli.init_app(app)
+    
+    # Write audit entries in batches at the end of each request
+    from .utils import audit
+    audit.init_app(app)
+    
     # Context processors
     @app.context_processor
     def inject_models():
@@ -1,10 +1,16 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify, current_app, send_file
+from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_required, current_user
 from app import db
 from app.admin import admin_bp
 from app.models.user import Registration, Admin, CheckIn, RegistrationStatus
 from app.utils.qrcode_generator import generate_qr_code
 from app.utils.email import send_payment_confirmation, send_receipt_rejection
+from app.utils.histogram import invalidate_histogram_cache
+from app.utils.pagination import keyset_paginate, paginate, InvalidCursor
+from app.utils.search import apply_search
+from app.utils.serializers import REGISTRATION_LIST
+from app.utils.query_budget import query_budget
+from app.utils.csv_export import stream_rows, csv_response
 from datetime import datetime
 import json
 import os
@@ -53,6 +59,7 @@ def registrations():
     sort = request.args.get('sort', 'created_at_desc')
     show_archived = request.args.get('show_archived', '') == 'true'
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
     
     # Base query
@@ -72,29 +79,25 @@ def registrations():
     
     # Apply search
     if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            db.or_(
-                Registration.name.ilike(search_term),
-                Registration.email.ilike(search_term),
-                Registration.phone_number.ilike(search_term)
-            )
-        )
-    
-    # Apply sorting
-    if sort == 'created_at_desc':
-        query = query.order_by(Registration.created_at.desc())
-    elif sort == 'created_at_asc':
-        query = query.order_by(Registration.created_at.asc())
-    elif sort == 'name_asc':
-        query = query.order_by(Registration.name.asc())
+        query = apply_search(query, search)
+    
+    # Only load the columns the list shows
+    query = REGISTRATION_LIST.select(query)
+    
+    # Date sorts use keyset pagination on (created_at, id); name sorts still page by offset
+    if sort == 'name_asc':
+        registrations = paginate(query.order_by(Registration.name.asc()), page=page, per_page=per_page)
     elif sort == 'name_desc':
-        query = query.order_by(Registration.name.desc())
+        registrations = paginate(query.order_by(Registration.name.desc()), page=page, per_page=per_page)
     else:
-        query = query.order_by(Registration.created_at.desc())
-    
-    # Paginate results
-    registrations = query.paginate(page=page, per_page=per_page, error_out=False)
+        descending = sort != 'created_at_asc'
+        try:
+            registrations = keyset_paginate(query, Registration, 'created_at', cursor=cursor,
+                                            per_page=per_page, descending=descending)
+        except InvalidCursor:
+            flash('That page link has expired, showing the first page instead.', 'warning')
+            registrations = keyset_paginate(query, Registration, 'created_at',
+                                            per_page=per_page, descending=descending)
     
     return render_template('admin/registrations.html', registrations=registrations, show_archived=show_archived)
 
@@ -246,15 +249,18 @@ def reject_receipt(registration_id):
 @login_required
 def pending_verifications():
     """View all registrations pending verification"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
     
     # Get all registrations pending verification
     query = Registration.query.filter_by(status=RegistrationStatus.PENDING_VERIFICATION)
-    query = query.order_by(Registration.updated_at.desc())
     
-    # Paginate results
-    registrations = query.paginate(page=page, per_page=per_page, error_out=False)
+    # Paginate results on (updated_at, id)
+    try:
+        registrations = keyset_paginate(query, Registration, 'updated_at', cursor=cursor, per_page=per_page)
+    except InvalidCursor:
+        flash('That page link has expired, showing the first page instead.', 'warning')
+        registrations = keyset_paginate(query, Registration, 'updated_at', per_page=per_page)
     
     return render_template('admin/pending_verifications.html', registrations=registrations)
 
@@ -293,65 +299,67 @@ def preview_attendees():
 
 @admin_bp.route('/export-attendees')
 @login_required
+@query_budget(1)
 def export_attendees():
     """Export attendees as CSV"""
     # Get filter parameters
     status = request.args.get('status', 'CONFIRMED')
     checked_in = request.args.get('checked_in', '')
     
+    # Each registration's first check-in, aggregated once instead of queried per row
+    first_check_in = db.session.query(
+        CheckIn.registration_id.label('registration_id'),
+        db.func.min(CheckIn.check_in_time).label('check_in_time')
+    ).group_by(CheckIn.registration_id).subquery()
+    
     # Base query
-    query = Registration.query
+    query = Registration.query.outerjoin(first_check_in, first_check_in.c.registration_id == Registration.id)
     
     # Apply filters
     if status:
         try:
             status_enum = getattr(RegistrationStatus, status)
-            query = query.filter_by(status=status_enum)
+            query = query.filter(Registration.status == status_enum)
         except (AttributeError, ValueError):
             pass
     
     # Filter by check-in status if specified
     if checked_in == 'yes':
-        query = query.join(CheckIn).filter(CheckIn.registration_id == Registration.id)
+        query = query.filter(first_check_in.c.registration_id != None)
     elif checked_in == 'no':
-        query = query.outerjoin(CheckIn).filter(CheckIn.id == None)
-    
-    # Get all matching registrations
-    registrations = query.order_by(Registration.name.asc()).all()
-    
-    # Create CSV in memory
-    import csv
-    import io
-    from datetime import datetime
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['ID', 'Name', 'Email', 'Phone Number', 'Registration Date', 'Status', 'Checked In', 'Check-in Time'])
-    
-    # Write data
-    for reg in registrations:
-        check_in = CheckIn.query.filter_by(registration_id=reg.id).first()
-        writer.writerow([
+        query = query.filter(first_check_in.c.registration_id == None)
+    
+    # Select only the exported columns
+    query = query.with_entities(
+        Registration.id,
+        Registration.name,
+        Registration.email,
+        Registration.phone_number,
+        Registration.created_at,
+        Registration.status,
+        first_check_in.c.check_in_time
+    ).order_by(Registration.name.asc(), Registration.id.asc())
+    
+    # Rows are fetched and written while the response streams
+    rows = (
+        [
             reg.id,
             reg.name,
             reg.email,
             reg.phone_number,
             reg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
             reg.status.value,
-            'Yes' if check_in else 'No',
-            check_in.check_in_time.strftime('%Y-%m-%d %H:%M:%S') if check_in else ''
-        ])
+            'Yes' if reg.check_in_time else 'No',
+            reg.check_in_time.strftime('%Y-%m-%d %H:%M:%S') if reg.check_in_time else ''
+        ]
+        for reg in stream_rows(query)
+    )
     
-    # Prepare response
-    output.seek(0)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'sod2025_attendees_{timestamp}.csv'
+    return csv_response(
+        ['ID', 'Name', 'Email', 'Phone Number', 'Registration Date', 'Status', 'Checked In', 'Check-in Time'],
+        rows,
+        f'sod2025_attendees_{timestamp}.csv'
     )
 
 @admin_bp.route('/send-reminder', methods=['POST'])
@@ -401,6 +409,9 @@ def delete_registration(registration_id):
     db.session.delete(registration)
     db.session.commit()
     
+    # Closed histogram buckets no longer match the table
+    invalidate_histogram_cache()
+    
     flash(f'Registration for {email} has been permanently deleted.', 'success')
     return redirect(url_for('admin.registrations'))
 
@@ -1,4 +1,6 @@
 import click
+import json
+import os
 from flask.cli import with_appcontext
 from app import db
 from app.models.user import Admin, Role, Permission
@@ -8,6 +10,14 @@ def register_commands(app):
     app.cli.add_command(init_db_command)
     app.cli.add_command(create_admin_command)
     app.cli.add_command(init_roles_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(export_changes_command)
+    app.cli.add_command(rollup_audit_logs_command)
+    app.cli.add_command(archive_audit_logs_command)
+    app.cli.add_command(import_registrations_command)
+    app.cli.add_command(report_unnormalised_phones_command)
+    app.cli.add_command(archive_registrations_command)
+    app.cli.add_command(purge_registrations_command)
 
 @click.command('init-db')
 @with_appcontext
@@ -83,6 +93,164 @@ def init_roles_command():
     db.session.commit()
     click.echo('Initialized roles and permissions.')
 
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Create and fill the registration full-text search index."""
+    from app.utils.search import rebuild_search_index
+    count = rebuild_search_index()
+    click.echo(f'Indexed {count} registrations.')
+
+@click.command('export-changes')
+@click.option('--since', default=None, help='Watermark or ISO timestamp to export changes after')
+@click.option('--state-file', type=click.Path(dir_okay=False), default=None,
+              help='File the watermark is read from and saved to between runs')
+@click.option('--output', type=click.File('w', lazy=False), default='-', help='File to write JSON lines to')
+@click.option('--batch-size', default=1000, help='Rows fetched per stream per batch')
+@with_appcontext
+def export_changes_command(since, state_file, output, batch_size):
+    """Export registrations, check-ins and deletions changed since a watermark."""
+    from app.utils.changes import fetch_changes
+    
+    if since is None and state_file and os.path.exists(state_file):
+        with open(state_file) as f:
+            since = f.read().strip() or None
+    
+    counts = {'registrations': 0, 'check_ins': 0, 'deleted': 0}
+    while True:
+        changes = fetch_changes(since=since, limit=batch_size)
+        for stream in counts:
+            for row in changes[stream]:
+                output.write(json.dumps({'type': stream, 'data': row}) + '\n')
+            counts[stream] += len(changes[stream])
+        since = changes['watermark']
+        if not changes['has_more']:
+            break
+    
+    if state_file:
+        with open(state_file, 'w') as f:
+            f.write(since)
+    
+    click.echo(f"Exported {counts['registrations']} registrations, {counts['check_ins']} check-ins "
+               f"and {counts['deleted']} deletions. Watermark: {since}", err=True)
+
+@click.command('rollup-audit-logs')
+@click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='First day to recompute (default: the last rolled-up day)')
+@with_appcontext
+def rollup_audit_logs_command(since):
+    """Roll up audit log entries per admin per day."""
+    from app.utils.audit_retention import rollup_audit_logs
+    
+    days = rollup_audit_logs(start=since.date() if since else None,
+                             progress=lambda day, rows: click.echo(f'{day}: {rows} rollup rows'))
+    click.echo(f'Rolled up {days} days.')
+
+@click.command('archive-audit-logs')
+@click.option('--days', type=int, default=None, help='Keep this many days in audit_logs (default: AUDIT_RETENTION_DAYS)')
+@click.option('--batch-size', default=1000, help='Rows moved per transaction')
+@with_appcontext
+def archive_audit_logs_command(days, batch_size):
+    """Move audit log entries past the retention period into the archive table."""
+    from datetime import datetime, timedelta
+    from flask import current_app
+    from app.utils.audit_retention import rollup_audit_logs, archive_audit_logs
+    
+    days = days if days is not None else current_app.config['AUDIT_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    
+    # Bring the rollups up to date first so summaries cover every day
+    rollup_audit_logs()
+    
+    moved = archive_audit_logs(cutoff, batch_size=batch_size,
+                               progress=lambda total: click.echo(f'Archived {total} entries...'))
+    click.echo(f'Archived {moved} audit log entries older than {cutoff:%Y-%m-%d %H:%M}.')
+
+@click.command('import-registrations')
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--batch-size', default=500, help='Rows inserted per statement')
+@click.option('--status', type=click.Choice(['PENDING_PAYMENT', 'CONFIRMED']), default='PENDING_PAYMENT',
+              help='Status imported registrations start in')
+@click.option('--send-emails', is_flag=True, help='Send each imported attendee a confirmation email')
+@with_appcontext
+def import_registrations_command(csv_file, batch_size, status, send_emails):
+    """Import registrations from a CSV file with name, email and phone_number columns."""
+    from app.models.user import RegistrationStatus
+    from app.utils.email import send_bulk_registration_emails
+    from app.utils.registration_import import import_registrations
+    
+    status = RegistrationStatus[status]
+    email_kind = 'payment_confirmation' if status == RegistrationStatus.CONFIRMED else 'registration_confirmation'
+    
+    def on_batch(inserted, totals):
+        if send_emails and inserted:
+            send_bulk_registration_emails(email_kind, inserted)
+        click.echo(f"Imported {totals['imported']} registrations...")
+    
+    try:
+        totals = import_registrations(csv_file, batch_size=batch_size, status=status, on_batch=on_batch,
+                                      on_skip=lambda line, reason: click.echo(f'Line {line}: {reason}', err=True))
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    
+    click.echo(f"Imported {totals['imported']} registrations. Skipped {totals['duplicate']} duplicate "
+               f"and {totals['invalid']} invalid rows.")
+
+@click.command('report-unnormalised-phones')
+@with_appcontext
+def report_unnormalised_phones_command():
+    """List registrations whose phone number couldn't be normalised because another registration has it."""
+    from app.utils.availability import unnormalised_phones
+    
+    rows = unnormalised_phones()
+    for registration_id, email, phone, holder in rows:
+        clash = f'registration {holder} has it normalised' if holder else 'no clash left, edit to normalise'
+        click.echo(f'Registration {registration_id} ({email}): {phone!r}, {clash}')
+    click.echo(f'{len(rows)} registrations have phone numbers that aren\'t normalised.')
+
+@click.command('archive-registrations')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), required=True,
+              help='Archive registrations created before this day')
+@click.option('--unarchive', is_flag=True, help='Unarchive them instead')
+@click.option('--batch-size', default=None, type=int, help='Rows updated per transaction (default: BULK_CHUNK_SIZE)')
+@with_appcontext
+def archive_registrations_command(before, unarchive, batch_size):
+    """Archive or unarchive registrations created before a day, in chunks."""
+    from app.models.user import Registration
+    from app.utils.bulk import iter_registration_ids, bulk_set_archived
+    
+    archived = not unarchive
+    ids = iter_registration_ids(Registration.created_at < before, Registration.is_archived != archived,
+                                size=batch_size)
+    verb = 'Archived' if archived else 'Unarchived'
+    total = bulk_set_archived(ids, archived, size=batch_size,
+                              progress=lambda total: click.echo(f'{verb} {total} registrations...'))
+    click.echo(f'{verb} {total} registrations created before {before:%Y-%m-%d}.')
+
+@click.command('purge-registrations')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), required=True,
+              help='Delete registrations created before this day')
+@click.option('--include-active', is_flag=True, help='Delete unarchived registrations too, not only archived ones')
+@click.option('--batch-size', default=None, type=int, help='Rows deleted per transaction (default: BULK_CHUNK_SIZE)')
+@click.option('--yes', is_flag=True, help='Do not ask for confirmation')
+@with_appcontext
+def purge_registrations_command(before, include_active, batch_size, yes):
+    """Permanently delete old registrations with their check-ins and receipt files, in chunks."""
+    from app.models.user import Registration
+    from app.utils.bulk import iter_registration_ids, purge_registrations
+    
+    criteria = [Registration.created_at < before]
+    if not include_active:
+        criteria.append(Registration.is_archived == True)
+    
+    scope = 'registrations' if include_active else 'archived registrations'
+    if not yes:
+        click.confirm(f'Permanently delete {scope} created before {before:%Y-%m-%d}?', abort=True)
+    
+    total = purge_registrations(iter_registration_ids(*criteria, size=batch_size), size=batch_size,
+                                progress=lambda total: click.echo(f'Deleted {total} registrations...'))
+    click.echo(f'Deleted {total} {scope} created before {before:%Y-%m-%d}.')
+
 def init_app(app):
     """Register CLI commands."""
     register_commands(app) 
\ No newline at end of file
@@ -1,8 +1,9 @@
 from datetime import datetime
 import enum
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from app import db, login_manager
+from werkzeug.security import check_password_hash
+from app import db
+from app.utils.passwords import hash_password
 
 class RegistrationStatus(enum.Enum):
     PENDING_PAYMENT = "Pending Payment Upload"
@@ -69,6 +70,13 @@ class Permission(db.Model):
 class AuditLog(db.Model):
     """Model for audit logging"""
     __tablename__ = 'audit_logs'
+    __table_args__ = (
+        db.Index('ix_audit_logs_timestamp', 'timestamp'),
+        db.Index('ix_audit_logs_admin_action_resource', 'admin_id', 'action', 'resource_type', 'timestamp'),
+        db.Index('ix_audit_logs_action_timestamp', 'action', 'timestamp'),
+        db.Index('ix_audit_logs_resource_timestamp', 'resource_type', 'resource_id', 'timestamp'),
+        db.Index('ix_audit_logs_new_status_timestamp', 'new_status', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -79,6 +87,12 @@ class AuditLog(db.Model):
     details = db.Column(db.Text)
     ip_address = db.Column(db.String(45))  # IPv6 can be up to 45 chars
     
+    # Structured payload, with the fields audit views filter on pulled out into
+    # indexed columns
+    old_status = db.Column(db.String(50))
+    new_status = db.Column(db.String(50))
+    data = db.Column(db.JSON)
+    
     # Define relationships
     admin = db.relationship('Admin', backref='audit_logs')
     
@@ -103,23 +117,79 @@ class AuditLog(db.Model):
         return f'<AuditLog {self.action} {self.resource_type} {self.resource_id} by {self.admin_id}>'
     
     @classmethod
-    def log(cls, admin_id, action, resource_type, resource_id=None, details=None, ip_address=None):
-        """Create and save an audit log entry"""
-        log_entry = cls(
+    def log(cls, admin_id, action, resource_type, resource_id=None, details=None, ip_address=None,
+            old_status=None, new_status=None, data=None, buffered=False):
+        """
+        Record an audit log entry
+
+        details is the human-readable summary; old_status, new_status and the
+        JSON data payload are what audit views filter on. Entries are written
+        with the request's next commit, or in one batch when the request ends,
+        rather than committed one at a time. Pass buffered=True for high-volume
+        events to queue the entry in memory.
+        """
+        from app.utils.audit import record_audit_entry
+        record_audit_entry(
+            buffered=buffered,
             admin_id=admin_id,
             action=action,
             resource_type=resource_type,
             resource_id=resource_id,
             details=details,
-            ip_address=ip_address
+            ip_address=ip_address,
+            old_status=old_status,
+            new_status=new_status,
+            data=data
         )
-        db.session.add(log_entry)
-        db.session.commit()
-        return log_entry
+
+class AuditLogArchive(db.Model):
+    """Audit log entries moved out of audit_logs by the retention policy"""
+    __tablename__ = 'audit_logs_archive'
+    __table_args__ = (
+        db.Index('ix_audit_logs_archive_timestamp', 'timestamp'),
+        db.Index('ix_audit_logs_archive_admin_timestamp', 'admin_id', 'timestamp'),
+    )
+    
+    # Keeps the id the entry had in audit_logs; no foreign key, so admins can
+    # be deleted without touching their archived history
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    admin_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(100), nullable=False)
+    resource_type = db.Column(db.String(50), nullable=False)
+    resource_id = db.Column(db.Integer)
+    details = db.Column(db.Text)
+    ip_address = db.Column(db.String(45))
+    old_status = db.Column(db.String(50))
+    new_status = db.Column(db.String(50))
+    data = db.Column(db.JSON)
+    
+    def __repr__(self):
+        return f'<AuditLogArchive {self.action} {self.resource_type} {self.resource_id} by {self.admin_id}>'
+
+class AuditLogDailyRollup(db.Model):
+    """Number of audit log entries per admin, action and resource type per day"""
+    __tablename__ = 'audit_log_daily_rollups'
+    
+    day = db.Column(db.Date, primary_key=True)
+    admin_id = db.Column(db.Integer, primary_key=True)
+    action = db.Column(db.String(100), primary_key=True)
+    resource_type = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<AuditLogDailyRollup {self.day} {self.admin_id} {self.action} {self.count}>'
 
 class Registration(db.Model):
     """Model for attendee registrations"""
     __tablename__ = 'registrations'
+    __table_args__ = (
+        db.Index('ix_registrations_status_created', 'status', 'created_at'),
+        db.Index('ix_registrations_archived_created', 'is_archived', 'created_at'),
+        db.Index('ix_registrations_created_at', 'created_at'),
+        db.Index('ix_registrations_status_updated', 'status', 'updated_at'),
+        db.Index('ix_registrations_updated_at', 'updated_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -186,50 +256,24 @@ class Admin(UserMixin, db.Model):
     
     def set_password(self, password):
         """Set the password hash"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         """Check if the password is correct"""
         return check_password_hash(self.password_hash, password)
     
     def has_permission(self, permission):
-        """Check if admin has a specific permission"""
-        # Check direct permission
-        if any(p.name == permission for p in self.permissions):
-            return True
-        
-        # Check role-based permissions
-        if self.role:
-            if self.role.name == Role.ADMIN:
-                return True  # Admin role has all permissions
-            elif self.role.name == Role.MANAGER and permission != Permission.MANAGE_ADMINS:
-                return True  # Manager has all permissions except managing admins
-            elif self.role.name == Role.REGISTRAR and permission in [
-                Permission.VIEW_DASHBOARD, 
-                Permission.VIEW_REGISTRATIONS,
-                Permission.APPROVE_REGISTRATIONS,
-                Permission.REJECT_REGISTRATIONS,
-                Permission.MANAGE_REGISTRATIONS,
-                Permission.SEND_EMAILS
-            ]:
-                return True
-            elif self.role.name == Role.CHECKER and permission in [
-                Permission.VIEW_DASHBOARD,
-                Permission.VIEW_REGISTRATIONS,
-                Permission.CHECK_IN_ATTENDEES
-            ]:
-                return True
-            elif self.role.name == Role.VIEWER and permission in [
-                Permission.VIEW_DASHBOARD,
-                Permission.VIEW_REGISTRATIONS
-            ]:
-                return True
-        
-        return False
+        """Check if admin has a specific permission, directly or through their role"""
+        from app.utils.permissions import permission_set
+        return permission in permission_set(self)
 
 class CheckIn(db.Model):
     """Model for check-in records"""
     __tablename__ = 'check_ins'
+    __table_args__ = (
+        db.Index('ix_check_ins_registration_id', 'registration_id'),
+        db.Index('ix_check_ins_check_in_time', 'check_in_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     registration_id = db.Column(db.Integer, db.ForeignKey('registrations.id'), nullable=False)
@@ -242,7 +286,27 @@ class CheckIn(db.Model):
     def __repr__(self):
         return f'<CheckIn {self.registration_id} at {self.check_in_time}>'
 
-@login_manager.user_loader
-def load_user(user_id):
-    """Load a user for Flask-Login"""
-    return Admin.query.get(int(user_id)) 
\ No newline at end of file
+class RegistrationTombstone(db.Model):
+    """Record of a deleted registration, so incremental exports can report it"""
+    __tablename__ = 'registration_tombstones'
+    __table_args__ = (
+        db.Index('ix_registration_tombstones_deleted_at', 'deleted_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    registration_id = db.Column(db.Integer, nullable=False)
+    email = db.Column(db.String(100), nullable=True)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<RegistrationTombstone {self.registration_id} at {self.deleted_at}>'
+
+class CacheVersion(db.Model):
+    """Counter every worker checks to find out a per-process cache has gone stale"""
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.name} {self.version}>'
@@ -2,12 +2,21 @@ from flask import Blueprint, request, jsonify, render_template, redirect, url_fo
 from flask_login import login_required, current_user
 from app import db
 from app.models.user import Registration, RegistrationStatus, CheckIn, Permission, Admin, Role, AuditLog
-from app.utils.email import send_payment_confirmation, send_receipt_rejection, send_event_reminder
+from app.utils.email import send_payment_confirmation, send_receipt_rejection, send_event_reminder, queue_bulk_registration_emails
 from app.utils.qrcode_generator import generate_qr_code
 from app.utils.decorators import permission_required
-import csv
-import io
-from datetime import datetime
+from app.utils.query_budget import query_budget
+from app.utils.histogram import HISTOGRAM_SOURCES, parse_bucket_width, parse_timestamp, compute_histogram
+from app.utils.pagination import keyset_paginate, InvalidCursor, cached_count, estimated_count
+from app.utils.search import apply_search
+from app.utils.serializers import REGISTRATION_LIST, REGISTRATION_DATATABLES
+from app.utils.csv_export import stream_rows, csv_response
+from app.utils.exports import EXPORT_KINDS, parse_export_filters, attendees_export, registrations_export
+from app.utils.export_jobs import request_export, get_job, job_file_path
+from app.utils.changes import fetch_changes, MAX_CHANGES_LIMIT
+from app.utils.audit import status_name
+from app.utils.bulk import parse_registration_ids, bulk_set_status, bulk_set_archived, purge_registrations
+from datetime import datetime, timedelta
 import json
 import os
 import logging
@@ -17,6 +26,12 @@ logger = logging.getLogger(__name__)
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
+# Default bucket width and time span for each histogram source
+HISTOGRAM_DEFAULTS = {
+    'registrations': ('1d', timedelta(days=30)),
+    'checkins': ('15m', timedelta(days=1)),
+}
+
 @admin_bp.route('/')
 @login_required
 def dashboard():
@@ -53,22 +68,56 @@ def dashboard():
                           recent_logs=recent_logs,
                           recent_checkins=recent_checkins)
 
+@admin_bp.route('/api/histogram')
+@login_required
+@permission_required(Permission.VIEW_DASHBOARD)
+def histogram():
+    """API endpoint for registrations-per-day and arrivals-per-interval charts"""
+    source = request.args.get('source', 'registrations')
+    if source not in HISTOGRAM_SOURCES:
+        return jsonify({'error': f'Unknown source: {source}'}), 400
+
+    # Daily registrations over a month and 15-minute arrivals over a day by default
+    default_bucket, default_span = HISTOGRAM_DEFAULTS[source]
+
+    try:
+        width = parse_bucket_width(request.args.get('bucket', default_bucket))
+        end = request.args.get('end')
+        end = parse_timestamp(end) if end else datetime.utcnow()
+        start = request.args.get('start')
+        start = parse_timestamp(start) if start else end - default_span
+        buckets = compute_histogram(source, width, start, end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'source': source,
+        'bucket_seconds': width,
+        'buckets': buckets
+    })
+
 @admin_bp.route('/registrations')
 @login_required
 @permission_required(Permission.VIEW_REGISTRATIONS)
 def registrations():
     """List all registrations"""
     status = request.args.get('status', 'all')
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     
     query = Registration.query
     
     if status != 'all':
         query = query.filter_by(status=status)
     
-    registrations = query.order_by(Registration.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    # Only load the columns the list shows
+    query = REGISTRATION_LIST.select(query)
+    
+    # Keyset pagination on (created_at, id) keeps deep pages as cheap as the first
+    try:
+        registrations = keyset_paginate(query, Registration, 'created_at', cursor=cursor, per_page=20)
+    except InvalidCursor:
+        flash('That page link has expired, showing the latest registrations instead.', 'warning')
+        registrations = keyset_paginate(query, Registration, 'created_at', per_page=20)
     
     logger.info(f"Admin {current_user.email} viewed registrations with status filter: {status}")
     
@@ -188,59 +237,32 @@ def check_in(registration_id):
     db.session.add(checkin)
     db.session.commit()
     
+    # Check-ins come in bursts at the door, so the entry goes through the buffer
+    AuditLog.log(
+        admin_id=current_user.id,
+        action=AuditLog.ACTION_CHECKIN,
+        resource_type=AuditLog.RESOURCE_CHECKIN,
+        resource_id=registration.id,
+        details=f"Checked in attendee {registration.name} ({registration.email})",
+        ip_address=request.remote_addr,
+        data={'registration_id': registration.id, 'method': 'manual'},
+        buffered=True
+    )
+    
     flash('Attendee checked in successfully', 'success')
     return redirect(url_for('admin.view_registration', registration_id=registration_id))
 
 @admin_bp.route('/export-attendees')
 @login_required
 @permission_required(Permission.EXPORT_DATA)
+@query_budget(1)
 def export_attendees():
     """Export attendees to CSV"""
-    # Get filter parameters
-    status = request.args.get('status', '')
-    
-    # Start with base query
-    query = Registration.query
+    header, query, format_row = attendees_export(parse_export_filters('attendees', request.args))
     
-    # Apply status filter if provided
-    if status and status in [s.name for s in RegistrationStatus]:
-        query = query.filter_by(status=RegistrationStatus[status])
-    else:
-        # Default to confirmed registrations
-        query = query.filter_by(status=RegistrationStatus.CONFIRMED)
-    
-    # Get all matching registrations
-    registrations = query.all()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['ID', 'Name', 'Email', 'Phone', 'Status', 'Registration Date', 'Checked In'])
-    
-    # Write data
-    for reg in registrations:
-        checked_in = bool(reg.check_ins)
-        writer.writerow([
-            reg.id,
-            reg.name,
-            reg.email,
-            reg.phone_number,
-            reg.status.value,
-            reg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'Yes' if checked_in else 'No'
-        ])
-    
-    # Prepare response
-    output.seek(0)
+    # Rows are fetched and written while the response streams
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'attendees_{timestamp}.csv'
-    )
+    return csv_response(header, (format_row(reg) for reg in stream_rows(query)), f'attendees_{timestamp}.csv')
 
 @admin_bp.route('/send-reminder', methods=['POST'])
 @login_required
@@ -264,12 +286,15 @@ def send_reminder():
 @permission_required(Permission.VIEW_REGISTRATIONS)
 def pending_verifications():
     """View all pending verifications"""
-    page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     
-    # Get paginated pending verifications
-    pending = Registration.query.filter_by(status=RegistrationStatus.PENDING_VERIFICATION)\
-        .order_by(Registration.updated_at.desc())\
-        .paginate(page=page, per_page=20, error_out=False)
+    # Get pending verifications a page at a time, keyed on (updated_at, id)
+    query = Registration.query.filter_by(status=RegistrationStatus.PENDING_VERIFICATION)
+    try:
+        pending = keyset_paginate(query, Registration, 'updated_at', cursor=cursor, per_page=20)
+    except InvalidCursor:
+        flash('That page link has expired, showing the latest verifications instead.', 'warning')
+        pending = keyset_paginate(query, Registration, 'updated_at', per_page=20)
     
     return render_template('admin/pending_verifications.html', registrations=pending)
 
@@ -349,7 +374,9 @@ def process_qr():
             resource_type=AuditLog.RESOURCE_CHECKIN,
             resource_id=registration.id,
             details=f"Checked in attendee {registration.first_name} {registration.last_name} ({registration.email}) via QR scan",
-            ip_address=ip_address
+            ip_address=ip_address,
+            data={'registration_id': registration.id, 'method': 'qr'},
+            buffered=True
         )
         
         logger.info(f"Admin {current_user.email} checked in attendee via QR code, ID: {reg_id} - {registration.first_name} {registration.last_name}")
@@ -393,6 +420,7 @@ def preview_attendees():
 @admin_bp.route('/api/registrations')
 @login_required
 @permission_required(Permission.VIEW_REGISTRATIONS)
+@query_budget(3)
 def get_registrations():
     """API endpoint to get registrations data for DataTables"""
     # Get query parameters from DataTables
@@ -401,6 +429,13 @@ def get_registrations():
     length = request.args.get('length', type=int, default=10)
     search_value = request.args.get('search[value]', default='')
     
+    # Cursor paging is used instead of start/length when requested
+    paging = request.args.get('paging', default='offset')
+    cursor = request.args.get('cursor')
+    
+    # How totals are computed: 'cached', 'exact', 'estimate' or 'none'
+    count_mode = request.args.get('count', default='cached')
+    
     # Filter by status if provided
     status_filter = request.args.get('status', default=None)
     
@@ -411,26 +446,34 @@ def get_registrations():
     if status_filter and status_filter != 'ALL':
         query = query.filter_by(status=status_filter)
     
-    # Apply search if provided
-    if search_value:
-        search_term = f"%{search_value}%"
-        query = query.filter(
-            (Registration.first_name.like(search_term)) |
-            (Registration.last_name.like(search_term)) |
-            (Registration.email.like(search_term)) |
-            (Registration.phone.like(search_term))
-        )
+    # Totals before searching are reported as recordsTotal
+    unsearched_query = query
     
-    # Get total count before pagination
-    total_records = query.count()
-    filtered_records = total_records  # If no search, filtered = total
+    # Apply search if provided, through the full-text index where available
+    if search_value:
+        query = apply_search(query, search_value)
     
     # Apply sorting
     order_column_idx = request.args.get('order[0][column]', type=int, default=0)
     order_direction = request.args.get('order[0][dir]', default='asc')
     
+    if paging == 'cursor' or cursor:
+        # Keyset pages on (created_at, id) skip both OFFSET and COUNT
+        try:
+            page = keyset_paginate(REGISTRATION_DATATABLES.select(query), Registration, 'created_at',
+                                   cursor=cursor, per_page=length, descending=order_direction == 'desc')
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'draw': draw,
+            'data': REGISTRATION_DATATABLES.dump_all(page.items),
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor
+        })
+    
     # Map DataTables column index to model field
-    columns = ['id', 'first_name', 'last_name', 'email', 'phone', 'status', 'created_at', 'checked_in']
+    columns = ['id', 'name', 'email', 'phone_number', 'status', 'created_at', 'checked_in']
     
     if order_column_idx < len(columns):
         order_column = columns[order_column_idx]
@@ -441,23 +484,33 @@ def get_registrations():
         else:
             query = query.order_by(column_obj.asc())
     
-    # Apply pagination
-    registrations = query.offset(start).limit(length).all()
+    # Apply pagination, fetching one extra row to know whether a next page exists
+    registrations = REGISTRATION_DATATABLES.select(query).offset(start).limit(length + 1).all()
+    has_next = len(registrations) > length
+    registrations = registrations[:length]
+    
+    # Count without scanning the table on every draw where possible
+    if count_mode == 'none':
+        # Report just enough rows for DataTables to enable the next button
+        filtered_records = start + len(registrations) + (1 if has_next else 0)
+        total_records = filtered_records
+    else:
+        if count_mode == 'exact':
+            filtered_records = query.count()
+        else:
+            filtered_records = cached_count(query)
+        
+        if not search_value:
+            total_records = filtered_records
+        elif count_mode == 'estimate' and not (status_filter and status_filter != 'ALL'):
+            total_records = estimated_count(Registration)
+        elif count_mode == 'exact':
+            total_records = unsearched_query.count()
+        else:
+            total_records = cached_count(unsearched_query)
     
     # Format data for DataTables
-    data = []
-    for reg in registrations:
-        data.append({
-            'id': reg.id,
-            'first_name': reg.first_name,
-            'last_name': reg.last_name,
-            'email': reg.email,
-            'phone': reg.phone,
-            'status': reg.status,
-            'created_at': reg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'checked_in': reg.checked_in,
-            'actions': ''  # Placeholder for action buttons
-        })
+    data = REGISTRATION_DATATABLES.dump_all(registrations)
     
     # Return JSON response
     return jsonify({
@@ -493,12 +546,12 @@ def registration_detail(registration_id):
             if data['checked_in']:
                 registration.checked_in_at = datetime.utcnow()
         
-        db.session.commit()
-        
-        # Log the registration update
+        # Log the registration update, in the same transaction as the change
         changes = []
+        changed_fields = {}
         if 'status' in data and original_status != registration.status:
             changes.append(f"Status: {original_status} → {registration.status}")
+            changed_fields['status'] = [status_name(original_status), status_name(registration.status)]
             
             # Log specific approval/rejection actions
             if registration.status == 'APPROVED':
@@ -507,8 +560,10 @@ def registration_detail(registration_id):
                     action=AuditLog.ACTION_APPROVE,
                     resource_type=AuditLog.RESOURCE_REGISTRATION,
                     resource_id=registration.id,
-                    details=f"Approved registration for {registration.first_name} {registration.last_name} ({registration.email})",
-                    ip_address=request.remote_addr
+                    details=f"Approved registration for {registration.name} ({registration.email})",
+                    ip_address=request.remote_addr,
+                    old_status=original_status,
+                    new_status=registration.status
                 )
             elif registration.status == 'REJECTED':
                 AuditLog.log(
@@ -516,12 +571,15 @@ def registration_detail(registration_id):
                     action=AuditLog.ACTION_REJECT,
                     resource_type=AuditLog.RESOURCE_REGISTRATION,
                     resource_id=registration.id,
-                    details=f"Rejected registration for {registration.first_name} {registration.last_name} ({registration.email})",
-                    ip_address=request.remote_addr
+                    details=f"Rejected registration for {registration.name} ({registration.email})",
+                    ip_address=request.remote_addr,
+                    old_status=original_status,
+                    new_status=registration.status
                 )
         
         if 'checked_in' in data and original_checked_in != registration.checked_in:
             changes.append(f"Checked In: {original_checked_in} → {registration.checked_in}")
+            changed_fields['checked_in'] = [bool(original_checked_in), bool(registration.checked_in)]
             
             if registration.checked_in:
                 AuditLog.log(
@@ -529,8 +587,9 @@ def registration_detail(registration_id):
                     action=AuditLog.ACTION_CHECKIN,
                     resource_type=AuditLog.RESOURCE_CHECKIN,
                     resource_id=registration.id,
-                    details=f"Checked in attendee {registration.first_name} {registration.last_name} ({registration.email})",
-                    ip_address=request.remote_addr
+                    details=f"Checked in attendee {registration.name} ({registration.email})",
+                    ip_address=request.remote_addr,
+                    data={'registration_id': registration.id, 'method': 'manual'}
                 )
         
         # General update log if there were changes
@@ -540,10 +599,15 @@ def registration_detail(registration_id):
                 action=AuditLog.ACTION_UPDATE,
                 resource_type=AuditLog.RESOURCE_REGISTRATION,
                 resource_id=registration.id,
-                details=f"Updated registration for {registration.first_name} {registration.last_name}. Changes: {', '.join(changes)}",
-                ip_address=request.remote_addr
+                details=f"Updated registration for {registration.name}. Changes: {', '.join(changes)}",
+                ip_address=request.remote_addr,
+                old_status=original_status if 'status' in data else None,
+                new_status=registration.status if 'status' in data else None,
+                data={'changes': changed_fields}
             )
         
+        db.session.commit()
+        
         return jsonify({'message': 'Registration updated successfully'})
 
 @admin_bp.route('/export-registrations')
@@ -553,44 +617,11 @@ def export_registrations():
     """Export registrations to CSV"""
     # Get filter parameters
     status = request.args.get('status', default=None)
+    header, query, format_row = registrations_export({'status': status})
     
-    # Start with base query
-    query = Registration.query
-    
-    # Apply status filter if provided
-    if status and status != 'ALL':
-        query = query.filter_by(status=status)
-    
-    # Get all registrations
-    registrations = query.all()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header row
-    writer.writerow(['ID', 'First Name', 'Last Name', 'Email', 'Phone', 'Status', 
-                    'Created At', 'Checked In', 'Checked In At'])
-    
-    # Write data rows
-    for reg in registrations:
-        writer.writerow([
-            reg.id,
-            reg.first_name,
-            reg.last_name,
-            reg.email,
-            reg.phone,
-            reg.status,
-            reg.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'Yes' if reg.checked_in else 'No',
-            reg.checked_in_at.strftime('%Y-%m-%d %H:%M:%S') if reg.checked_in_at else ''
-        ])
-    
-    # Prepare response
-    output.seek(0)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    # Log the export action
+    # Log the export action before streaming starts
     ip_address = request.remote_addr
     AuditLog.log(
         admin_id=current_user.id,
@@ -598,98 +629,268 @@ def export_registrations():
         resource_type=AuditLog.RESOURCE_REGISTRATION,
         resource_id=0,  # 0 indicates bulk operation
         details=f"Exported registrations data with filter: status={status or 'ALL'}",
-        ip_address=ip_address
+        ip_address=ip_address,
+        data={'kind': 'registrations', 'filters': {'status': status}}
     )
     
     logger.info(f"Admin {current_user.email} exported registrations with status filter: {status}")
     
+    # Rows are fetched and written while the response streams
+    return csv_response(header, (format_row(reg) for reg in stream_rows(query)), f'registrations_{timestamp}.csv')
+
+@admin_bp.route('/api/changes')
+@login_required
+@permission_required(Permission.EXPORT_DATA)
+@query_budget(3)
+def export_changes():
+    """API endpoint for registrations, check-ins and deletions changed since a watermark"""
+    since = request.args.get('since')
+    limit = min(max(request.args.get('limit', 1000, type=int), 1), MAX_CHANGES_LIMIT)
+    
+    try:
+        changes = fetch_changes(since=since, limit=limit)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(changes)
+
+@admin_bp.route('/api/exports', methods=['POST'])
+@login_required
+def request_export_job():
+    """API endpoint to start a background export, or reuse a finished one"""
+    data = request.get_json(silent=True) or request.form
+    kind = data.get('kind')
+    if kind not in EXPORT_KINDS:
+        return jsonify({'error': f'Unknown export: {kind}'}), 400
+    
+    permission, _, _ = EXPORT_KINDS[kind]
+    if not current_user.has_permission(permission):
+        return jsonify({'error': 'You do not have permission to export this data'}), 403
+    
+    try:
+        filters = parse_export_filters(kind, data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job = request_export(kind, filters, current_user.id)
+    
+    AuditLog.log(
+        admin_id=current_user.id,
+        action=AuditLog.ACTION_EXPORT,
+        resource_type=AuditLog.RESOURCE_SYSTEM if kind == 'audit_logs' else AuditLog.RESOURCE_REGISTRATION,
+        resource_id=0,  # 0 indicates bulk operation
+        details=f"Requested {kind} export with filters: {filters}",
+        ip_address=request.remote_addr,
+        data={'kind': kind, 'filters': filters, 'job_id': job['job_id']}
+    )
+    
+    return jsonify(_export_job_json(job)), 200 if job['status'] == 'ready' else 202
+
+@admin_bp.route('/api/exports/<job_id>')
+@login_required
+def export_job_status(job_id):
+    """API endpoint to poll a background export"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Export not found'}), 404
+    
+    permission, _, _ = EXPORT_KINDS[job['kind']]
+    if not current_user.has_permission(permission):
+        return jsonify({'error': 'You do not have permission to export this data'}), 403
+    
+    return jsonify(_export_job_json(job))
+
+@admin_bp.route('/api/exports/<job_id>/download')
+@login_required
+def download_export_job(job_id):
+    """Download a finished export; Range requests resume a partial download"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Export not found'}), 404
+    
+    permission, _, _ = EXPORT_KINDS[job['kind']]
+    if not current_user.has_permission(permission):
+        return jsonify({'error': 'You do not have permission to export this data'}), 403
+    
+    if job['status'] != 'ready':
+        return jsonify(_export_job_json(job)), 409
+    
+    timestamp = datetime.fromtimestamp(job['requested_at']).strftime('%Y%m%d_%H%M%S')
     return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
+        job_file_path(job_id),
+        mimetype='application/gzip',
         as_attachment=True,
-        download_name=f'registrations_{timestamp}.csv'
+        download_name=f"{job['kind']}_{timestamp}.csv.gz",
+        conditional=True
     )
 
+def _export_job_json(job):
+    data = {
+        'job_id': job['job_id'],
+        'kind': job['kind'],
+        'filters': job['filters'],
+        'status': job['status'],
+        'status_url': url_for('admin.export_job_status', job_id=job['job_id'])
+    }
+    if job['status'] == 'ready':
+        data['size'] = job['size']
+        data['download_url'] = url_for('admin.download_export_job', job_id=job['job_id'])
+    elif job['status'] == 'failed':
+        data['error'] = job['error']
+    return data
+
 @admin_bp.route('/bulk-approve', methods=['POST'])
 @login_required
 @permission_required(Permission.MANAGE_REGISTRATIONS)
 def bulk_approve():
     """Bulk approve registrations"""
-    data = request.json
-    registration_ids = data.get('registration_ids', [])
+    data = request.get_json(silent=True) or {}
+    try:
+        registration_ids = parse_registration_ids(data.get('registration_ids', []))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid registration IDs'}), 400
     
     if not registration_ids:
         return jsonify({'success': False, 'message': 'No registrations selected'}), 400
     
-    # Get registrations
-    registrations = Registration.query.filter(Registration.id.in_(registration_ids)).all()
+    # One UPDATE per chunk, with an audit entry per registration. Only receipts
+    # awaiting verification are approved, each getting its check-in QR code
+    progress = []
+    changed = bulk_set_status(registration_ids, RegistrationStatus.CONFIRMED, current_user.id,
+                              AuditLog.ACTION_APPROVE, ip_address=request.remote_addr,
+                              from_status=RegistrationStatus.PENDING_VERIFICATION, qr_codes=True,
+                              progress=progress.append)
     
-    # Count how many were actually updated
-    updated_count = 0
+    # Confirmation emails, with the QR codes, go out over one connection in the background
+    if changed:
+        queue_bulk_registration_emails('payment_confirmation', changed)
     
-    for reg in registrations:
-        if reg.status != 'APPROVED':
-            reg.status = 'APPROVED'
-            updated_count += 1
+    return jsonify({
+        'success': True, 
+        'message': f'Successfully approved {len(changed)} registrations',
+        'updated_count': len(changed),
+        'updated_ids': [row['id'] for row in changed],
+        'progress': progress
+    })
+
+@admin_bp.route('/bulk-reject', methods=['POST'])
+@login_required
+@permission_required(Permission.MANAGE_REGISTRATIONS)
+def bulk_reject():
+    """Bulk reject registrations"""
+    data = request.get_json(silent=True) or {}
+    try:
+        registration_ids = parse_registration_ids(data.get('registration_ids', []))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid registration IDs'}), 400
     
-    db.session.commit()
+    if not registration_ids:
+        return jsonify({'success': False, 'message': 'No registrations selected'}), 400
+    
+    # One UPDATE per chunk, with an audit entry per registration
+    progress = []
+    changed = bulk_set_status(registration_ids, RegistrationStatus.REJECTED, current_user.id,
+                              AuditLog.ACTION_REJECT, ip_address=request.remote_addr, progress=progress.append)
+    
+    # Rejection emails go out over one connection in the background
+    if changed:
+        queue_bulk_registration_emails('receipt_rejection', changed)
+    
+    return jsonify({
+        'success': True, 
+        'message': f'Successfully rejected {len(changed)} registrations',
+        'updated_count': len(changed),
+        'updated_ids': [row['id'] for row in changed],
+        'progress': progress
+    })
+
+def _bulk_archive(archived):
+    """
+    Archive or unarchive the posted registration ids
+
+    Like the other bulk endpoints, the response lists the running total after
+    each BULK_CHUNK_SIZE chunk as 'progress'. Requests run synchronously, so
+    it arrives with the result; the CLI commands report it as they go.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        registration_ids = parse_registration_ids(data.get('registration_ids', []))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid registration IDs'}), 400
+    
+    if not registration_ids:
+        return jsonify({'success': False, 'message': 'No registrations selected'}), 400
+    
+    progress = []
+    updated_count = bulk_set_archived(registration_ids, archived, progress=progress.append)
+    verb = 'archived' if archived else 'unarchived'
     
-    # Log the bulk approval
     if updated_count > 0:
         AuditLog.log(
             admin_id=current_user.id,
-            action=AuditLog.ACTION_APPROVE,
+            action=AuditLog.ACTION_UPDATE,
             resource_type=AuditLog.RESOURCE_REGISTRATION,
             resource_id=0,  # 0 indicates bulk operation
-            details=f"Bulk approved {updated_count} registrations",
-            ip_address=request.remote_addr
+            details=f"Bulk {verb} {updated_count} registrations",
+            ip_address=request.remote_addr,
+            data={'registration_ids': registration_ids, 'is_archived': archived}
         )
     
     return jsonify({
-        'success': True, 
-        'message': f'Successfully approved {updated_count} registrations',
-        'updated_count': updated_count
+        'success': True,
+        'message': f'Successfully {verb} {updated_count} registrations',
+        'updated_count': updated_count,
+        'progress': progress
     })
 
-@admin_bp.route('/bulk-reject', methods=['POST'])
+@admin_bp.route('/bulk-archive', methods=['POST'])
 @login_required
 @permission_required(Permission.MANAGE_REGISTRATIONS)
-def bulk_reject():
-    """Bulk reject registrations"""
-    data = request.json
-    registration_ids = data.get('registration_ids', [])
+def bulk_archive():
+    """Bulk archive registrations"""
+    return _bulk_archive(True)
+
+@admin_bp.route('/bulk-unarchive', methods=['POST'])
+@login_required
+@permission_required(Permission.MANAGE_REGISTRATIONS)
+def bulk_unarchive():
+    """Bulk unarchive registrations"""
+    return _bulk_archive(False)
+
+@admin_bp.route('/bulk-purge', methods=['POST'])
+@login_required
+@permission_required(Permission.MANAGE_SYSTEM)
+def bulk_purge():
+    """Permanently delete registrations with their check-ins and receipt files"""
+    data = request.get_json(silent=True) or {}
+    try:
+        registration_ids = parse_registration_ids(data.get('registration_ids', []))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid registration IDs'}), 400
     
     if not registration_ids:
         return jsonify({'success': False, 'message': 'No registrations selected'}), 400
     
-    # Get registrations
-    registrations = Registration.query.filter(Registration.id.in_(registration_ids)).all()
-    
-    # Count how many were actually updated
-    updated_count = 0
+    # Deleted a chunk at a time so the registrations table is never locked for long
+    progress = []
+    deleted_count = purge_registrations(registration_ids, progress=progress.append)
     
-    for reg in registrations:
-        if reg.status != 'REJECTED':
-            reg.status = 'REJECTED'
-            updated_count += 1
-    
-    db.session.commit()
-    
-    # Log the bulk rejection
-    if updated_count > 0:
+    if deleted_count > 0:
         AuditLog.log(
             admin_id=current_user.id,
-            action=AuditLog.ACTION_REJECT,
+            action=AuditLog.ACTION_DELETE,
             resource_type=AuditLog.RESOURCE_REGISTRATION,
             resource_id=0,  # 0 indicates bulk operation
-            details=f"Bulk rejected {updated_count} registrations",
-            ip_address=request.remote_addr
+            details=f"Bulk purged {deleted_count} registrations",
+            ip_address=request.remote_addr,
+            data={'registration_ids': registration_ids}
         )
     
     return jsonify({
-        'success': True, 
-        'message': f'Successfully rejected {updated_count} registrations',
-        'updated_count': updated_count
+        'success': True,
+        'message': f'Permanently deleted {deleted_count} registrations',
+        'deleted_count': deleted_count,
+        'progress': progress
     })
 
 @admin_bp.route('/system-info')
@@ -3,7 +3,11 @@ from app import db
 from app.models.user import Registration, RegistrationStatus, CheckIn
 from app.utils.email import send_registration_confirmation, send_receipt_submission_confirmation
 from app.utils.file_upload import save_receipt
+from app.utils.intake import register_attendee, DuplicateRegistration, IntakeTimeout
 from app.utils.qrcode_generator import decrypt_qr_data
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.serializers import REGISTRATION_API
+from app.utils.query_budget import query_budget
 from functools import wraps
 import os
 
@@ -21,15 +25,37 @@ def require_api_key(f):
 
 @api_bp.route('/registrations', methods=['GET'])
 @require_api_key
+@query_budget(1)
 def get_registrations():
     """Get all registrations (for admin dashboard)"""
-    registrations = Registration.query.all()
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', type=int)
+    
+    # Select plain column tuples rather than full Registration objects
+    query = REGISTRATION_API.select(Registration.query)
+    
+    if not cursor and not limit:
+        registrations = query.all()
+        return jsonify({
+            'registrations': REGISTRATION_API.dump_all(registrations)
+        }), 200
+    
+    # Page through registrations newest first, keyed on (created_at, id)
+    limit = min(limit or 100, 500)
+    try:
+        page = keyset_paginate(query, Registration, 'created_at', cursor=cursor, per_page=limit)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
+    
     return jsonify({
-        'registrations': [reg.to_dict() for reg in registrations]
+        'registrations': REGISTRATION_API.dump_all(page.items),
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor
     }), 200
 
 @api_bp.route('/registrations/<int:registration_id>', methods=['GET'])
 @require_api_key
+@query_budget(2)
 def get_registration(registration_id):
     """Get a specific registration"""
     registration = Registration.query.get_or_404(registration_id)
@@ -44,25 +70,13 @@ def register():
     if not data or not data.get('name') or not data.get('email') or not data.get('phone_number'):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    # Check if email or phone number already exists
-    existing_email = Registration.query.filter_by(email=data['email']).first()
-    if existing_email:
-        return jsonify({'error': 'Email already registered'}), 409
-    
-    existing_phone = Registration.query.filter_by(phone_number=data['phone_number']).first()
-    if existing_phone:
-        return jsonify({'error': 'Phone number already registered'}), 409
-    
-    # Create new registration
-    new_registration = Registration(
-        name=data['name'],
-        email=data['email'],
-        phone_number=data['phone_number'],
-        status=RegistrationStatus.PENDING_PAYMENT
-    )
-    
-    db.session.add(new_registration)
-    db.session.commit()
+    # Create new registration; the unique constraints catch a taken email or phone number
+    try:
+        new_registration = register_attendee(data['name'], data['email'], data['phone_number'])
+    except DuplicateRegistration as e:
+        return jsonify({'error': e.message}), 409
+    except IntakeTimeout:
+        return jsonify({'error': 'We are experiencing very high demand. Please try again shortly.'}), 503, {'Retry-After': '5'}
     
     # Send confirmation email
     send_registration_confirmation(new_registration)
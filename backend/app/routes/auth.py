@@ -1,13 +1,17 @@
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash, send_file
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash
 from app import db
-from app.models.user import Admin, Role, Permission, AuditLog
+from app.models.user import Admin, Role, Permission, AuditLog, RegistrationStatus
 from app.forms import LoginForm
 from app.utils.decorators import permission_required
+from app.utils.csv_export import stream_rows, csv_response
+from app.utils.exports import audit_logs_export
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.audit_retention import activity_summary
+from app.utils.audit import filter_audit_logs, retained_days
+from app.utils.passwords import verify_password, needs_rehash, rehash_password, PasswordCheckBusy
 from datetime import datetime, timedelta
-import io
-import csv
 import logging
 
 # Set up logger
@@ -26,13 +30,26 @@ def login():
         # Find the admin by email
         admin = Admin.query.filter_by(email=form.email.data).first()
         
-        # Check if admin exists and password is correct
-        if admin and check_password_hash(admin.password_hash, form.password.data):
+        # Check if admin exists and password is correct, on the bounded hashing pool
+        try:
+            valid = admin is not None and verify_password(admin.password_hash, form.password.data)
+        except PasswordCheckBusy:
+            flash('Too many sign-ins at once. Please try again in a moment.', 'warning')
+            return render_template('auth/login.html', form=form), 503
+        
+        if valid:
             # Check if admin is active
             if not admin.is_active:
                 flash('Your account has been deactivated. Please contact the system administrator.', 'danger')
                 return render_template('auth/login.html', form=form)
             
+            # Upgrade the stored hash if the hashing parameters have changed
+            if needs_rehash(admin.password_hash):
+                try:
+                    admin.password_hash = rehash_password(form.password.data)
+                except PasswordCheckBusy:
+                    pass  # Try again on the next login
+            
             # Update last login time
             admin.last_login = datetime.utcnow()
             db.session.commit()
@@ -118,7 +135,8 @@ def create_admin():
             resource_type=AuditLog.RESOURCE_ADMIN,
             resource_id=new_admin.id,
             details=f"Created admin user {new_admin.email} with role {role.name}",
-            ip_address=ip_address
+            ip_address=ip_address,
+            data={'email': new_admin.email, 'role': role.name}
         )
         
         logger.info(f"Admin {current_user.email} created new admin: {new_admin.email} with role_id {data['role_id']}")
@@ -209,7 +227,14 @@ def manage_admin(admin_id):
             resource_type=AuditLog.RESOURCE_ADMIN,
             resource_id=admin.id,
             details=f"Updated admin user {admin.email}. Changes: {', '.join(changes)}",
-            ip_address=ip_address
+            ip_address=ip_address,
+            old_status=original_status if 'is_active' in data else None,
+            new_status=("Active" if admin.is_active else "Inactive") if 'is_active' in data else None,
+            data={
+                'email': [original_email, admin.email],
+                'role': [original_role, admin.role.name if admin.role else "None"],
+                'password_changed': bool(data.get('password'))
+            }
         )
         
         logger.info(f"Admin {current_user.email} updated admin {admin.email} role to {admin.role.name}")
@@ -234,7 +259,8 @@ def manage_admin(admin_id):
             resource_type=AuditLog.RESOURCE_ADMIN,
             resource_id=admin_id,
             details=f"Deleted admin user {email}",
-            ip_address=ip_address
+            ip_address=ip_address,
+            data={'email': email}
         )
         
         logger.info(f"Admin {current_user.email} deleted admin: {email}")
@@ -265,79 +291,39 @@ def audit_logs():
     admin_id = request.args.get('admin_id', type=int)
     action = request.args.get('action')
     resource_type = request.args.get('resource_type')
+    resource_id = request.args.get('resource_id', type=int)
+    status = request.args.get('status')
     days = request.args.get('days', type=int, default=7)
     
-    # Start with base query
-    query = AuditLog.query
+    cursor = request.args.get('cursor')
+    
+    # Older entries have been archived, so say so rather than show part of the window
+    window, capped = retained_days(days)
+    if capped and not cursor:
+        flash(f'Entries older than {window} days are archived, showing the last {window} days.', 'info')
+    
+    # Start with base query, loading each entry's admin in the same query
+    query = AuditLog.query.options(db.joinedload(AuditLog.admin))
     
     # Apply filters
-    if admin_id:
-        query = query.filter_by(admin_id=admin_id)
-    if action:
-        query = query.filter_by(action=action)
-    if resource_type:
-        query = query.filter_by(resource_type=resource_type)
-    if days:
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        query = query.filter(AuditLog.timestamp >= cutoff)
+    query = filter_audit_logs(query, {
+        'admin_id': admin_id,
+        'action': action,
+        'resource_type': resource_type,
+        'resource_id': resource_id,
+        'status': status,
+        'days': window
+    })
     
     # Get all admins for the filter dropdown
     admins = Admin.query.all()
     
-    # Get audit logs with pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = 50
-    
-    # Get all logs for this query
-    all_logs = query.order_by(AuditLog.timestamp.desc()).all()
-    
-    # Create a simple pagination object
-    class SimplePagination:
-        def __init__(self, items, page, per_page, total):
-            self.items = items
-            self.page = page
-            self.per_page = per_page
-            self.total = total
-            self.pages = (total + per_page - 1) // per_page
-        
-        @property
-        def has_prev(self):
-            return self.page > 1
-        
-        @property
-        def has_next(self):
-            return self.page < self.pages
-        
-        @property
-        def prev_num(self):
-            return self.page - 1 if self.has_prev else None
-        
-        @property
-        def next_num(self):
-            return self.page + 1 if self.has_next else None
-        
-        def iter_pages(self, left_edge=2, left_current=2, right_current=5, right_edge=2):
-            last = 0
-            for num in range(1, self.pages + 1):
-                if num <= left_edge or \
-                   (num > self.page - left_current - 1 and num < self.page + right_current) or \
-                   num > self.pages - right_edge:
-                    if last + 1 != num:
-                        yield None
-                    yield num
-                    last = num
-    
-    # Calculate start and end indices for the current page
-    start = (page - 1) * per_page
-    end = min(start + per_page, len(all_logs))
-    
-    # Create pagination object
-    logs = SimplePagination(
-        items=all_logs[start:end],
-        page=page,
-        per_page=per_page,
-        total=len(all_logs)
-    )
+    # Keyset pagination on (timestamp, id) keeps deep pages as cheap as the first
+    try:
+        logs = keyset_paginate(query, AuditLog, 'timestamp', cursor=cursor, per_page=50)
+    except InvalidCursor:
+        flash('That page link has expired, showing the latest entries instead.', 'warning')
+        logs = keyset_paginate(query, AuditLog, 'timestamp', per_page=50)
     
     logger.info(f"Admin {current_user.email} viewed audit logs with filters: admin_id={admin_id}, action={action}, resource_type={resource_type}, days={days}")
     
@@ -361,86 +347,59 @@ def audit_logs():
                               AuditLog.RESOURCE_CHECKIN,
                               AuditLog.RESOURCE_SYSTEM
                           ],
+                          statuses=[s.name for s in RegistrationStatus] + ['Active', 'Inactive'],
                           selected_admin_id=admin_id,
                           selected_action=action,
+                          selected_resource_id=resource_id,
+                          selected_status=status,
                           selected_resource_type=resource_type,
                           selected_days=days)
 
+@auth_bp.route('/api/audit-activity')
+@login_required
+@permission_required(Permission.VIEW_AUDIT_LOGS)
+def audit_activity():
+    """API endpoint for audit activity per admin per day, read from the daily rollups"""
+    days = min(max(request.args.get('days', 30, type=int), 1), 3660)
+    admin_id = request.args.get('admin_id', type=int)
+    
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+    return jsonify({
+        'start': start.isoformat(),
+        'activity': activity_summary(start, admin_id=admin_id)
+    })
+
 @auth_bp.route('/export-audit-logs')
 @login_required
 @permission_required(Permission.EXPORT_AUDIT_LOGS)
 def export_audit_logs():
     """Export audit logs to CSV"""
     # Get filter parameters
-    admin_id = request.args.get('admin_id', type=int)
-    action = request.args.get('action')
-    resource_type = request.args.get('resource_type')
-    days = request.args.get('days', type=int, default=7)
-    
-    # Start with base query
-    query = AuditLog.query
-    
-    # Apply filters
-    if admin_id:
-        query = query.filter_by(admin_id=admin_id)
-    if action:
-        query = query.filter_by(action=action)
-    if resource_type:
-        query = query.filter_by(resource_type=resource_type)
-    if days:
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        query = query.filter(AuditLog.timestamp >= cutoff)
-    
-    # Get all matching logs
-    logs = query.order_by(AuditLog.timestamp.desc()).all()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header row
-    writer.writerow(['ID', 'Timestamp', 'Admin', 'Action', 'Resource Type', 
-                    'Resource ID', 'Details', 'IP Address'])
+    filter_details = {
+        'admin_id': request.args.get('admin_id', type=int),
+        'action': request.args.get('action'),
+        'resource_type': request.args.get('resource_type'),
+        'resource_id': request.args.get('resource_id', type=int),
+        'status': request.args.get('status'),
+        'days': request.args.get('days', type=int, default=7)
+    }
     
-    # Write data rows
-    for log in logs:
-        admin_email = log.admin.email if log.admin else 'Unknown'
-        writer.writerow([
-            log.id,
-            log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            admin_email,
-            log.action,
-            log.resource_type,
-            log.resource_id,
-            log.details,
-            log.ip_address
-        ])
+    header, query, format_row = audit_logs_export(filter_details)
     
-    # Prepare response
-    output.seek(0)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
-    # Log the export action
-    filter_details = {
-        'admin_id': admin_id,
-        'action': action,
-        'resource_type': resource_type,
-        'days': days
-    }
+    # Log the export action before streaming starts
     AuditLog.log(
         admin_id=current_user.id,
         action=AuditLog.ACTION_EXPORT,
         resource_type=AuditLog.RESOURCE_SYSTEM,
         resource_id=0,
         details=f"Exported audit logs with filters: {filter_details}",
-        ip_address=request.remote_addr
+        ip_address=request.remote_addr,
+        data={'kind': 'audit_logs', 'filters': filter_details}
     )
     
-    logger.info(f"Admin {current_user.email} exported audit logs with filters: admin_id={admin_id}, action={action}, resource_type={resource_type}, days={days}")
+    logger.info(f"Admin {current_user.email} exported audit logs with filters: {filter_details}")
     
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'audit_logs_{timestamp}.csv'
-    ) 
\ No newline at end of file
+    # Rows are fetched and written while the response streams
+    return csv_response(header, (format_row(log) for log in stream_rows(query)), f'audit_logs_{timestamp}.csv')
@@ -3,6 +3,9 @@ from app import db
 from app.models.user import Registration, RegistrationStatus
 from app.utils.email import send_registration_confirmation, send_receipt_submission_confirmation, notify_admin_new_receipt
 from app.utils.file_upload import save_receipt
+from app.utils.availability import email_maybe_registered, phone_maybe_registered, normalise_email, normalise_phone
+from app.utils.intake import register_attendee, DuplicateRegistration, IntakeTimeout
+from app.utils.admission import waiting_room_status
 from app.models.user import Admin
 import uuid
 
@@ -17,25 +20,13 @@ def register():
     if not data or not data.get('name') or not data.get('email') or not data.get('phone_number'):
         return jsonify({'error': 'Missing required fields'}), 400
     
-    # Check if email or phone number already exists
-    existing_email = Registration.query.filter_by(email=data['email']).first()
-    if existing_email:
-        return jsonify({'error': 'Email already registered'}), 409
-    
-    existing_phone = Registration.query.filter_by(phone_number=data['phone_number']).first()
-    if existing_phone:
-        return jsonify({'error': 'Phone number already registered'}), 409
-    
-    # Create new registration
-    new_registration = Registration(
-        name=data['name'],
-        email=data['email'],
-        phone_number=data['phone_number'],
-        status=RegistrationStatus.PENDING_PAYMENT
-    )
-    
-    db.session.add(new_registration)
-    db.session.commit()
+    # Create new registration; the unique constraints catch a taken email or phone number
+    try:
+        new_registration = register_attendee(data['name'], data['email'], data['phone_number'])
+    except DuplicateRegistration as e:
+        return jsonify({'error': e.message}), 409
+    except IntakeTimeout:
+        return jsonify({'error': 'We are experiencing very high demand. Please try again shortly.'}), 503, {'Retry-After': '5'}
     
     # Send confirmation email
     send_registration_confirmation(new_registration)
@@ -105,15 +96,25 @@ def check_status(registration_id):
 @main_bp.route('/verify-email/<email>', methods=['GET'])
 def verify_email(email):
     """Check if an email is already registered"""
-    existing = Registration.query.filter_by(email=email).first()
+    if not email_maybe_registered(email):
+        return jsonify({'exists': False}), 200
+    # Compared the way the fast path compares, whatever the column's collation
+    existing = Registration.query.filter(db.func.lower(Registration.email) == normalise_email(email)).first()
     return jsonify({'exists': bool(existing)}), 200
 
 @main_bp.route('/verify-phone/<phone>', methods=['GET'])
 def verify_phone(phone):
     """Check if a phone number is already registered"""
-    existing = Registration.query.filter_by(phone_number=phone).first()
+    if not phone_maybe_registered(phone):
+        return jsonify({'exists': False}), 200
+    existing = Registration.query.filter_by(phone_number=normalise_phone(phone)).first()
     return jsonify({'exists': bool(existing)}), 200
 
+@main_bp.route('/waiting-room/<token>', methods=['GET'])
+def waiting_room(token):
+    """Poll a waiting-room ticket; resend the request with it once admitted"""
+    return waiting_room_status(token)
+
 @main_bp.route('/')
 def root():
     """Redirect to login page"""
@@ -0,0 +1,117 @@
+from collections import namedtuple
+from threading import Lock
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import joinedload
+from app.models.user import Admin, Role
+from app.utils.cache_versions import shared_version, bump_shared_version
+from app.utils.permissions import permission_set
+import time
+
+RoleSnapshot = namedtuple('RoleSnapshot', ['id', 'name'])
+
+class AdminSnapshot:
+    """
+    Read-only copy of the fields an authenticated request needs from an Admin
+
+    Snapshots aren't bound to a session, so one can be shared between threads
+    and requests. Code that needs to change an admin loads the Admin row.
+    """
+
+    def __init__(self, admin):
+        self.id = admin.id
+        self.email = admin.email
+        self.is_active = bool(admin.is_active)
+        self.role_id = admin.role_id
+        self.role = RoleSnapshot(admin.role.id, admin.role.name) if admin.role else None
+        self.last_login = admin.last_login
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+    def get_id(self):
+        return str(self.id)
+
+    def has_permission(self, permission):
+        """Check if admin has a specific permission, directly or through their role"""
+        return permission in permission_set(self)
+
+    def __eq__(self, other):
+        if hasattr(other, 'get_id'):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.get_id())
+
+    def __repr__(self):
+        return f'<AdminSnapshot {self.email}>'
+
+# Admin snapshots keyed by id. Entries are dropped when an admin or role
+# changes in this process, and when another worker's change moves the shared
+# 'admins' version, which is checked every CACHE_VERSION_INTERVAL seconds, so
+# deactivating or demoting an account applies everywhere within that.
+# ADMIN_CACHE_TTL still expires them in case a change skipped the ORM.
+_admin_cache = {}
+_admin_version = 0
+_admin_lock = Lock()
+
+def invalidate_admin(admin_id=None):
+    """Drop one admin's cached snapshot, or every snapshot when admin_id is None"""
+    global _admin_version
+    with _admin_lock:
+        _admin_version += 1
+        if admin_id is None:
+            _admin_cache.clear()
+        else:
+            _admin_cache.pop(admin_id, None)
+
+def load_admin_snapshot(admin_id):
+    """Return an AdminSnapshot for the user loader, or None if there is no such admin"""
+    ttl = current_app.config.get('ADMIN_CACHE_TTL', 60)
+    shared = shared_version('admins')
+    now = time.monotonic()
+
+    with _admin_lock:
+        entry = _admin_cache.get(admin_id)
+        version = (_admin_version, shared)
+    if entry and entry[1] == version and now - entry[2] < ttl:
+        return entry[0]
+
+    # The role is joined in so the snapshot is built from one query
+    admin = Admin.query.options(joinedload(Admin.role)).filter(Admin.id == admin_id).first()
+    if admin is None:
+        return None
+
+    snapshot = AdminSnapshot(admin)
+    with _admin_lock:
+        # Don't store a snapshot that raced with an invalidation
+        if version[0] == _admin_version:
+            _admin_cache[admin_id] = (snapshot, version, now)
+    return snapshot
+
+@event.listens_for(Admin, 'after_insert')
+@event.listens_for(Admin, 'after_update')
+@event.listens_for(Admin, 'after_delete')
+def _admin_changed(mapper, connection, target):
+    invalidate_admin(target.id)
+    # A login only moves last_login, which no other worker needs straight away
+    changed = {attr.key for attr in inspect(target).attrs if attr.history.has_changes()}
+    if changed != {'last_login'}:
+        # Bumped in the same transaction, so other workers see it once it commits
+        bump_shared_version('admins', connection)
+
+@event.listens_for(Role, 'after_update')
+@event.listens_for(Role, 'after_delete')
+def _role_changed(mapper, connection, target):
+    invalidate_admin()
+    bump_shared_version('admins', connection)
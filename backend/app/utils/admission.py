@@ -0,0 +1,268 @@
+from flask import current_app, g, jsonify, request
+from app.utils.rate_limit import SQLiteStore
+import logging
+import os
+import secrets
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# Endpoints guarded by the waiting room, mapped to the room whose slots they share
+ADMISSION_ROOMS = {
+    'main.register': 'register',
+    'api.register': 'register',
+    'main.upload_receipt': 'upload_receipt',
+    'api.upload_receipt': 'upload_receipt',
+}
+
+# Rooms mapped to (requests served at once, tickets allowed to wait).
+# ADMISSION_LIMITS in the config can override these.
+ADMISSION_LIMITS = {
+    'register': (20, 500),
+    'upload_receipt': (10, 200),
+}
+
+ADMITTED = 'admitted'
+WAITING = 'waiting'
+FULL = 'full'
+
+class AdmissionStore(SQLiteStore):
+    """
+    Concurrency slots and a FIFO queue of waiting tickets per room
+
+    A ticket is 'active' while its request is being served, 'waiting' in the
+    queue, or 'admitted' once a slot was reserved for it and the client hasn't
+    come back yet. Active and admitted tickets count against the room's cap.
+    Every ticket has an expiry, so slots held by a crashed worker and tickets
+    whose client stopped polling are released on their own.
+    """
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS admission_tickets ('
+        'seq INTEGER PRIMARY KEY AUTOINCREMENT, token TEXT NOT NULL UNIQUE, '
+        'room TEXT NOT NULL, state TEXT NOT NULL, expires REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_admission_tickets_room_state '
+        'ON admission_tickets (room, state, seq)',
+    )
+
+    def __init__(self, path, slot_timeout=60, wait_timeout=30, grace=30):
+        super().__init__(path)
+        self.slot_timeout = slot_timeout
+        self.wait_timeout = wait_timeout
+        self.grace = grace
+
+    def _refresh(self, connection, room, cap, now):
+        """Drop expired tickets and reserve free slots for the longest-waiting tickets"""
+        connection.execute('DELETE FROM admission_tickets WHERE expires < ?', (now,))
+        busy = connection.execute(
+            "SELECT COUNT(*) FROM admission_tickets WHERE room = ? AND state IN ('active', 'admitted')",
+            (room,)
+        ).fetchone()[0]
+        if busy < cap:
+            connection.execute(
+                "UPDATE admission_tickets SET state = 'admitted', expires = ? WHERE seq IN ("
+                "SELECT seq FROM admission_tickets WHERE room = ? AND state = 'waiting' "
+                "ORDER BY seq LIMIT ?)",
+                (now + self.grace, room, cap - busy)
+            )
+            busy = min(cap, busy + connection.execute('SELECT changes()').fetchone()[0])
+        return busy
+
+    def _position(self, connection, room, seq):
+        return connection.execute(
+            "SELECT COUNT(*) FROM admission_tickets WHERE room = ? AND state = 'waiting' AND seq <= ?",
+            (room, seq)
+        ).fetchone()[0]
+
+    def enter(self, room, cap, queue_size, token=None, now=None):
+        """
+        Try to start serving a request in room
+
+        Args:
+            room: The room the endpoint belongs to
+            cap: Requests served at once
+            queue_size: Tickets allowed to wait
+            token: A ticket token the client got earlier, if any
+
+        Returns:
+            (ADMITTED, token) with the slot to release afterwards,
+            (WAITING, token, position) when queued, or (FULL, None) when the
+            queue is full too
+        """
+        now = now or time.time()
+        with self._transaction() as connection:
+            busy = self._refresh(connection, room, cap, now)
+
+            if token:
+                row = connection.execute(
+                    'SELECT seq, state FROM admission_tickets WHERE token = ? AND room = ?', (token, room)
+                ).fetchone()
+                if row and row[1] == ADMITTED:
+                    connection.execute(
+                        "UPDATE admission_tickets SET state = 'active', expires = ? WHERE seq = ?",
+                        (now + self.slot_timeout, row[0])
+                    )
+                    return ADMITTED, token
+                if row and row[1] == WAITING:
+                    connection.execute(
+                        'UPDATE admission_tickets SET expires = ? WHERE seq = ?', (now + self.wait_timeout, row[0])
+                    )
+                    return WAITING, token, self._position(connection, room, row[0])
+
+            waiting = connection.execute(
+                "SELECT COUNT(*) FROM admission_tickets WHERE room = ? AND state = 'waiting'", (room,)
+            ).fetchone()[0]
+
+            # Nobody may jump the queue, even when a slot is free
+            if not waiting and busy < cap:
+                token = secrets.token_urlsafe(16)
+                connection.execute(
+                    "INSERT INTO admission_tickets (token, room, state, expires) VALUES (?, ?, 'active', ?)",
+                    (token, room, now + self.slot_timeout)
+                )
+                return ADMITTED, token
+
+            if waiting < queue_size:
+                token = secrets.token_urlsafe(16)
+                cursor = connection.execute(
+                    "INSERT INTO admission_tickets (token, room, state, expires) VALUES (?, ?, 'waiting', ?)",
+                    (token, room, now + self.wait_timeout)
+                )
+                return WAITING, token, self._position(connection, room, cursor.lastrowid)
+
+            return FULL, None
+
+    def poll(self, token, now=None):
+        """
+        Return a waiting ticket's (state, position), or None if it has expired
+
+        Polling keeps the ticket alive; once a slot is reserved for it the
+        state is 'admitted' and the client should resend its request.
+        """
+        now = now or time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT seq, room FROM admission_tickets WHERE token = ? AND expires >= ?', (token, now)
+            ).fetchone()
+            if row is None:
+                return None
+            seq, room = row
+            cap, _ = room_limits(room)
+            self._refresh(connection, room, cap, now)
+
+            state = connection.execute('SELECT state FROM admission_tickets WHERE seq = ?', (seq,)).fetchone()[0]
+            if state == WAITING:
+                connection.execute(
+                    'UPDATE admission_tickets SET expires = ? WHERE seq = ?', (now + self.wait_timeout, seq)
+                )
+                return WAITING, self._position(connection, room, seq)
+            return state, 0
+
+    def leave(self, token):
+        """Release the slot held by a finished request"""
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM admission_tickets WHERE token = ?', (token,))
+
+_store = None
+
+def get_store(app):
+    """Return this process's admission store"""
+    global _store
+    if _store is None:
+        path = app.config.get('ADMISSION_STORAGE') or os.path.join(app.instance_path, 'admission.sqlite')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _store = AdmissionStore(
+            path,
+            slot_timeout=app.config.get('ADMISSION_SLOT_TIMEOUT', 60),
+            wait_timeout=app.config.get('ADMISSION_WAIT_TIMEOUT', 30),
+            grace=app.config.get('ADMISSION_GRACE', 30)
+        )
+    return _store
+
+def room_limits(room):
+    return current_app.config.get('ADMISSION_LIMITS', {}).get(room) or ADMISSION_LIMITS[room]
+
+def request_token():
+    return request.headers.get('X-Admission-Token') or request.args.get('admission_token')
+
+def admit_request():
+    """
+    Hold back requests to guarded endpoints once their room is at capacity
+
+    Admitted requests go ahead and give their slot back when they end. Others
+    get a 202 with a ticket to poll at /waiting-room/<token>, or a 503 with
+    Retry-After once the queue is full as well.
+    """
+    if not current_app.config.get('ADMISSION_ENABLED', False) or request.method != 'POST':
+        return None
+    room = ADMISSION_ROOMS.get(request.endpoint)
+    if room is None:
+        return None
+
+    cap, queue_size = room_limits(room)
+    try:
+        result = get_store(current_app).enter(room, cap, queue_size, token=request_token())
+    except sqlite3.Error as e:
+        # Don't take the endpoint down with the waiting room
+        logger.warning(f"Admission store unavailable, admitting request: {str(e)}")
+        return None
+
+    if result[0] == ADMITTED:
+        g.admission_token = result[1]
+        return None
+
+    poll_interval = current_app.config.get('ADMISSION_POLL_INTERVAL', 2)
+    if result[0] == WAITING:
+        _, token, position = result
+        retry_after = poll_interval
+        response = jsonify({
+            'status': 'waiting',
+            'token': token,
+            'position': position,
+            'poll_url': f'/waiting-room/{token}',
+            'retry_after': retry_after
+        })
+        response.status_code = 202
+    else:
+        logger.warning(f"Waiting room for {room} is full, shedding request")
+        retry_after = poll_interval * 5
+        response = jsonify({
+            'error': 'We are experiencing very high demand. Please try again shortly.',
+            'retry_after': retry_after
+        })
+        response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def release_slot(exc=None):
+    token = g.pop('admission_token', None)
+    if token:
+        try:
+            get_store(current_app).leave(token)
+        except sqlite3.Error as e:
+            # The slot expires on its own after ADMISSION_SLOT_TIMEOUT
+            logger.warning(f"Failed to release admission slot: {str(e)}")
+
+def waiting_room_status(token):
+    """Build the poll response for a waiting-room ticket"""
+    poll_interval = current_app.config.get('ADMISSION_POLL_INTERVAL', 2)
+    try:
+        result = get_store(current_app).poll(token)
+    except sqlite3.Error as e:
+        logger.warning(f"Admission store unavailable: {str(e)}")
+        result = (ADMITTED, 0)
+
+    if result is None:
+        return jsonify({'error': 'Ticket expired. Please submit again.'}), 404
+
+    state, position = result
+    if state == WAITING:
+        response = jsonify({'status': 'waiting', 'position': position, 'retry_after': poll_interval})
+        response.headers['Retry-After'] = str(poll_interval)
+        return response, 200
+    return jsonify({'status': 'admitted', 'token': token}), 200
+
+def init_app(app):
+    """Run guarded endpoints through the waiting room"""
+    app.before_request(admit_request)
+    app.teardown_request(release_slot)
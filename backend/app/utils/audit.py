@@ -0,0 +1,206 @@
+from collections import deque
+from datetime import datetime, timedelta
+from threading import Lock, Thread, Event
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import event
+from app import db
+from app.models.user import AuditLog
+import atexit
+import logging
+
+logger = logging.getLogger(__name__)
+
+def status_name(value):
+    """Return the name stored in old_status/new_status for a status enum or string"""
+    if value is None:
+        return None
+    return getattr(value, 'name', str(value))
+
+def filter_audit_logs(query, filters, model=AuditLog):
+    """
+    Apply the audit log view filters to a query
+
+    Every filter maps to an indexed column: admin_id, action, resource_type
+    with resource_id, new_status (as 'status') and the days window on
+    timestamp.
+    """
+    if filters.get('admin_id'):
+        query = query.filter(model.admin_id == filters['admin_id'])
+    if filters.get('action'):
+        query = query.filter(model.action == filters['action'])
+    if filters.get('resource_type'):
+        query = query.filter(model.resource_type == filters['resource_type'])
+    if filters.get('resource_id'):
+        query = query.filter(model.resource_id == filters['resource_id'])
+    if filters.get('status'):
+        query = query.filter(model.new_status == filters['status'])
+    if filters.get('days'):
+        cutoff = datetime.utcnow() - timedelta(days=filters['days'])
+        query = query.filter(model.timestamp >= cutoff)
+    return query
+
+def retained_days(days):
+    """
+    Clamp a days filter to the history audit_logs still holds
+
+    archive-audit-logs moves entries older than AUDIT_RETENTION_DAYS to
+    audit_logs_archive, so a longer window (or 0, all time) would quietly
+    return part of it. Returns the days to filter on and whether they were
+    capped.
+    """
+    retention = current_app.config.get('AUDIT_RETENTION_DAYS')
+    if retention and (not days or days > retention):
+        return retention, True
+    return days, False
+
+def _entry(admin_id, action, resource_type, resource_id=None, details=None, ip_address=None,
+           old_status=None, new_status=None, data=None):
+    return {
+        'timestamp': datetime.utcnow(),
+        'admin_id': admin_id,
+        'action': action,
+        'resource_type': resource_type,
+        'resource_id': resource_id,
+        'details': details,
+        'ip_address': ip_address,
+        'old_status': status_name(old_status),
+        'new_status': status_name(new_status),
+        'data': data,
+    }
+
+def _insert(connection, entries):
+    connection.execute(AuditLog.__table__.insert(), entries)
+
+def record_audit_entry(buffered=False, **fields):
+    """
+    Record an audit entry without committing on its own
+
+    During a request the entry is queued. If the request commits afterwards,
+    the entry is written in that transaction; otherwise everything still
+    queued is written in one bulk insert when the request ends, unless it
+    ended with an exception. With
+    buffered=True the entry goes to the process-wide AuditBuffer instead,
+    trading a bounded loss window for no write on the request path at all.
+    Outside a request the entry is written straight away.
+    """
+    entry = _entry(**fields)
+
+    if buffered and has_app_context() and current_app.config.get('AUDIT_BUFFER_ENABLED', True):
+        get_audit_buffer(current_app._get_current_object()).append(entry)
+    elif has_request_context():
+        g.setdefault('audit_entries', []).append(entry)
+    else:
+        with db.engine.begin() as connection:
+            _insert(connection, [entry])
+
+def flush_request_audit_entries(exc=None):
+    """
+    Write the entries still queued by this request in one bulk insert
+
+    Entries are dropped when the request failed with an exception, since the
+    changes they describe were not committed.
+    """
+    entries = g.pop('audit_entries', None)
+    if not entries:
+        return
+    if exc is not None:
+        logger.warning(f"Dropped {len(entries)} audit log entries from a failed request")
+        return
+    try:
+        with db.engine.begin() as connection:
+            _insert(connection, entries)
+    except Exception:
+        logger.exception(f"Failed to write {len(entries)} audit log entries")
+
+@event.listens_for(db.session, 'before_commit')
+def _write_with_commit(session):
+    # Entries queued before the request commits ride along in its transaction.
+    # They stay queued until the commit succeeds, so a failed commit leaves
+    # them for the end of the request to write or drop
+    if has_request_context():
+        entries = g.get('audit_entries') or []
+        if entries:
+            _insert(session.connection(), entries)
+        g.audit_entries_committing = len(entries)
+
+@event.listens_for(db.session, 'after_commit')
+def _forget_committed(session):
+    if has_request_context():
+        written = g.pop('audit_entries_committing', 0)
+        if written:
+            del g.audit_entries[:written]
+
+class AuditBuffer:
+    """
+    Bounded in-memory queue of audit entries flushed by a background thread
+
+    At most `size` entries are held; when the buffer is full the oldest entry
+    is dropped and counted, so a stalled database can't grow memory. Entries
+    are written every `interval` seconds and when the process exits, which
+    bounds what a crash can lose to one interval's worth.
+    """
+
+    def __init__(self, app, size=10000, interval=2.0):
+        self.app = app
+        self.interval = interval
+        self.dropped = 0
+        self._entries = deque(maxlen=size)
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name='audit-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def append(self, entry):
+        with self._lock:
+            if len(self._entries) == self._entries.maxlen:
+                self.dropped += 1
+            self._entries.append(entry)
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of entries written"""
+        with self._lock:
+            entries = list(self._entries)
+            self._entries.clear()
+            dropped, self.dropped = self.dropped, 0
+
+        if dropped:
+            logger.warning(f"Audit buffer was full, dropped {dropped} entries")
+        if not entries:
+            return 0
+
+        with self.app.app_context():
+            try:
+                with db.engine.begin() as connection:
+                    _insert(connection, entries)
+            except Exception:
+                logger.exception(f"Failed to write {len(entries)} buffered audit log entries")
+                return 0
+        return len(entries)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+_buffer = None
+_buffer_lock = Lock()
+
+def get_audit_buffer(app):
+    """Return this process's AuditBuffer, starting it on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = AuditBuffer(
+                app,
+                size=app.config.get('AUDIT_BUFFER_SIZE', 10000),
+                interval=app.config.get('AUDIT_FLUSH_INTERVAL', 2.0)
+            )
+    return _buffer
+
+def init_app(app):
+    """Write each request's remaining audit entries when it ends"""
+    app.teardown_request(flush_request_audit_entries)
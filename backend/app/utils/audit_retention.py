@@ -0,0 +1,153 @@
+from datetime import date, datetime, timedelta
+from app import db
+from app.models.user import AuditLog, AuditLogArchive, AuditLogDailyRollup
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns copied from audit_logs into audit_logs_archive, in matching order
+ARCHIVE_COLUMNS = ('id', 'timestamp', 'admin_id', 'action', 'resource_type', 'resource_id', 'details', 'ip_address',
+                   'old_status', 'new_status', 'data')
+
+def _day_range(day):
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+def _count_day(model, day):
+    start, end = _day_range(day)
+    return db.session.query(
+        model.admin_id, model.action, model.resource_type, db.func.count(model.id)
+    ).filter(
+        model.timestamp >= start,
+        model.timestamp < end
+    ).group_by(model.admin_id, model.action, model.resource_type).all()
+
+def rollup_day(day):
+    """Recompute one day's rollup rows from audit_logs and the archive"""
+    counts = {}
+    for model in (AuditLog, AuditLogArchive):
+        for admin_id, action, resource_type, count in _count_day(model, day):
+            key = (admin_id, action, resource_type)
+            counts[key] = counts.get(key, 0) + count
+
+    AuditLogDailyRollup.query.filter_by(day=day).delete()
+    if counts:
+        db.session.execute(AuditLogDailyRollup.__table__.insert(), [
+            {'day': day, 'admin_id': admin_id, 'action': action, 'resource_type': resource_type, 'count': count}
+            for (admin_id, action, resource_type), count in counts.items()
+        ])
+    db.session.commit()
+    return len(counts)
+
+def default_rollup_start():
+    """
+    Return the first day that needs rolling up
+
+    The last rolled-up day is recomputed too, so entries buffered across
+    midnight still get counted.
+    """
+    last = db.session.query(db.func.max(AuditLogDailyRollup.day)).scalar()
+    if last:
+        return last if isinstance(last, date) else date.fromisoformat(last)
+
+    first = [
+        db.session.query(db.func.min(model.timestamp)).scalar()
+        for model in (AuditLog, AuditLogArchive)
+    ]
+    first = [value for value in first if value]
+    return min(first).date() if first else None
+
+def rollup_audit_logs(start=None, end=None, progress=None):
+    """
+    Roll up audit log entries per admin, action and resource type per day
+
+    Args:
+        start: First day to roll up; defaults to default_rollup_start()
+        end: Day to stop before; defaults to today, so only complete days are
+            rolled up
+        progress: Optional callable given each day and its number of rows
+
+    Returns:
+        The number of days rolled up
+    """
+    start = start or default_rollup_start()
+    end = end or datetime.utcnow().date()
+    if start is None:
+        return 0
+
+    days = 0
+    day = start
+    while day < end:
+        rows = rollup_day(day)
+        if progress:
+            progress(day, rows)
+        days += 1
+        day += timedelta(days=1)
+    return days
+
+def archive_audit_logs(before, batch_size=1000, progress=None):
+    """
+    Move audit log entries older than a cutoff into audit_logs_archive
+
+    Rows are copied and deleted in batches of batch_size, each in its own
+    short transaction, so the live table is never locked for long.
+
+    Args:
+        before: Entries with an earlier timestamp are archived
+        batch_size: Number of rows moved per transaction
+        progress: Optional callable given the running total after each batch
+
+    Returns:
+        The number of entries archived
+    """
+    live = AuditLog.__table__
+    archive = AuditLogArchive.__table__
+    moved = 0
+
+    while True:
+        ids = [row[0] for row in db.session.query(AuditLog.id)
+               .filter(AuditLog.timestamp < before)
+               .order_by(AuditLog.id)
+               .limit(batch_size)]
+        if not ids:
+            break
+
+        db.session.execute(archive.insert().from_select(
+            ARCHIVE_COLUMNS,
+            db.select(*(live.c[name] for name in ARCHIVE_COLUMNS)).where(live.c.id.in_(ids))
+        ))
+        db.session.execute(live.delete().where(live.c.id.in_(ids)))
+        db.session.commit()
+
+        moved += len(ids)
+        if progress:
+            progress(moved)
+
+    if moved:
+        logger.info(f"Archived {moved} audit log entries older than {before}")
+    return moved
+
+def activity_summary(start, admin_id=None):
+    """
+    Return audit activity per day from start, grouped by admin, action and resource type
+
+    Complete days are read from the rollup table; today is counted live from
+    audit_logs, which the timestamp index keeps cheap.
+    """
+    today = datetime.utcnow().date()
+
+    query = AuditLogDailyRollup.query.filter(AuditLogDailyRollup.day >= start, AuditLogDailyRollup.day < today)
+    if admin_id:
+        query = query.filter(AuditLogDailyRollup.admin_id == admin_id)
+    rows = [
+        {'day': row.day.isoformat(), 'admin_id': row.admin_id, 'action': row.action,
+         'resource_type': row.resource_type, 'count': row.count}
+        for row in query.order_by(AuditLogDailyRollup.day, AuditLogDailyRollup.admin_id)
+    ]
+
+    for row_admin_id, action, resource_type, count in _count_day(AuditLog, today):
+        if admin_id and row_admin_id != admin_id:
+            continue
+        rows.append({'day': today.isoformat(), 'admin_id': row_admin_id, 'action': action,
+                     'resource_type': resource_type, 'count': count})
+    return rows
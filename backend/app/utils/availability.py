@@ -0,0 +1,189 @@
+from datetime import datetime, timedelta
+from threading import Lock
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+from app import db
+from app.models.user import Registration
+from app.utils.cache_versions import shared_version
+from app.utils.csv_export import stream_rows
+import hashlib
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+_PHONE_SEPARATORS = re.compile(r'[\s\-().]')
+
+# Emails are normalised no further than the database's own comparison. Phone
+# numbers are stored without the separators people type, by every path that
+# writes them, so here too one stored value never stands in for another and
+# discarding it on delete is safe
+def normalise_email(email):
+    return (email or '').strip().lower()
+
+def normalise_phone(phone):
+    return _PHONE_SEPARATORS.sub('', phone or '')
+
+def unnormalised_phones():
+    """
+    Find registrations whose stored phone number still has separators in it
+
+    The migration normalising phone numbers leaves a row as it is when its
+    normalised number already belongs to another registration, for an admin
+    to merge.
+
+    Returns:
+        (id, email, phone_number, id of the registration holding the
+        normalised number or None) tuples in id order
+    """
+    query = db.session.query(Registration.id, Registration.email, Registration.phone_number)\
+        .order_by(Registration.id)
+    rows = [row for row in stream_rows(query) if normalise_phone(row.phone_number) != row.phone_number]
+    if not rows:
+        return []
+
+    holders = dict(db.session.query(Registration.phone_number, Registration.id).filter(
+        Registration.phone_number.in_({normalise_phone(row.phone_number) for row in rows})
+    ))
+    return [(row.id, row.email, row.phone_number, holders.get(normalise_phone(row.phone_number))) for row in rows]
+
+def _fingerprint(kind, value):
+    digest = hashlib.blake2b(f'{kind}:{value}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+class ContactSet:
+    """
+    Compact in-memory set of registered emails and phone numbers
+
+    Values are normalised and stored as 64-bit hashes, so a miss means the
+    value is definitely not registered and a hit only means it may be; hits are
+    confirmed in SQL. Rows written by other workers are picked up from
+    updated_at every REGISTRATION_FILTER_SYNC_INTERVAL seconds. Values deleted
+    elsewhere stay in the set and just cost a confirming query, until a purge
+    moves the shared 'contacts' version and every worker rebuilds.
+    """
+
+    def __init__(self):
+        self._hashes = set()
+        self._lock = Lock()
+        self.ready = False
+        self.version = None
+        self._synced_at = None
+        self._checked = 0.0
+
+    def build(self, version=None):
+        """Load every registration's email and phone number"""
+        started = datetime.utcnow()
+        hashes = set()
+        query = Registration.query.with_entities(Registration.email, Registration.phone_number)
+        for email, phone in stream_rows(query):
+            hashes.add(_fingerprint('email', normalise_email(email)))
+            hashes.add(_fingerprint('phone', normalise_phone(phone)))
+
+        with self._lock:
+            self._hashes = hashes
+            self._synced_at = started
+            self._checked = time.monotonic()
+            self.version = version
+            self.ready = True
+        logger.info(f"Built contact set with {len(hashes)} entries")
+
+    def sync(self, interval, lag=5):
+        """Add rows other workers wrote since the last sync, at most every interval seconds"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked < interval:
+                return
+            self._checked = now
+            since = self._synced_at - timedelta(seconds=lag)
+
+        started = datetime.utcnow()
+        rows = Registration.query.with_entities(Registration.email, Registration.phone_number).filter(
+            Registration.updated_at >= since
+        ).all()
+        for email, phone in rows:
+            self.add(email, phone)
+        with self._lock:
+            self._synced_at = max(self._synced_at, started)
+
+    def add(self, email, phone):
+        self._hashes.add(_fingerprint('email', normalise_email(email)))
+        self._hashes.add(_fingerprint('phone', normalise_phone(phone)))
+
+    def discard(self, email, phone):
+        self._hashes.discard(_fingerprint('email', normalise_email(email)))
+        self._hashes.discard(_fingerprint('phone', normalise_phone(phone)))
+
+    def __contains__(self, item):
+        kind, value = item
+        return _fingerprint(kind, value) in self._hashes
+
+    def __len__(self):
+        return len(self._hashes)
+
+_contacts = ContactSet()
+_build_lock = Lock()
+
+def get_contact_set():
+    """Return this process's contact set, building it on first use and after a purge"""
+    version = shared_version('contacts')
+    if not _contacts.ready or _contacts.version != version:
+        with _build_lock:
+            if not _contacts.ready or _contacts.version != version:
+                _contacts.build(version)
+    else:
+        _contacts.sync(current_app.config.get('REGISTRATION_FILTER_SYNC_INTERVAL', 5))
+    return _contacts
+
+def _maybe_registered(kind, value):
+    if not current_app.config.get('REGISTRATION_FILTER_ENABLED', True):
+        return True
+    try:
+        return (kind, value) in get_contact_set()
+    except Exception as e:
+        # Fall back to checking in SQL
+        logger.warning(f"Contact set unavailable: {str(e)}")
+        return True
+
+def email_maybe_registered(email):
+    """Return False only if no registration can have this email"""
+    return _maybe_registered('email', normalise_email(email))
+
+def phone_maybe_registered(phone):
+    """Return False only if no registration can have this phone number"""
+    return _maybe_registered('phone', normalise_phone(phone))
+
+def remember_contacts(email, phone):
+    """Add a new registration's email and phone to the set, if it has been built"""
+    if _contacts.ready:
+        _contacts.add(email, phone)
+
+def forget_contacts(email, phone):
+    """Remove a deleted registration's email and phone, once the delete has committed"""
+    if _contacts.ready:
+        _contacts.discard(email, phone)
+
+@event.listens_for(Registration, 'after_insert')
+@event.listens_for(Registration, 'after_update')
+def _add_contacts(mapper, connection, target):
+    # Added straight away: if the transaction rolls back the stale entry only
+    # costs a confirming query
+    remember_contacts(target.email, target.phone_number)
+
+@event.listens_for(Registration, 'after_delete')
+def _queue_discard(mapper, connection, target):
+    # Only removed once the delete commits, so a rollback can't hide a registration
+    session = object_session(target)
+    if _contacts.ready and session is not None:
+        session.info.setdefault('contact_discards', []).append((target.email, target.phone_number))
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_discards(session):
+    for email, phone in session.info.pop('contact_discards', []):
+        _contacts.discard(email, phone)
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_discards(session):
+    session.info.pop('contact_discards', None)
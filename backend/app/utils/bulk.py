@@ -0,0 +1,265 @@
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models.user import Registration, AuditLog, CheckIn, RegistrationTombstone
+from app.utils.audit import record_audit_entry
+from app.utils.availability import forget_contacts
+from app.utils.cache_versions import bump_shared_version
+from app.utils.histogram import invalidate_histogram_cache
+from app.utils.pagination import invalidate_counts
+from app.utils.qrcode_generator import generate_qr_code
+from app.utils.search import search_index_available, unindex_registrations
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+def parse_registration_ids(values):
+    """Turn a list of registration ids from a request into sorted unique ints; raises ValueError"""
+    if not isinstance(values, (list, tuple)):
+        raise ValueError('registration_ids must be a list')
+    return sorted({int(value) for value in values})
+
+def chunked(items, size):
+    """Yield successive lists of at most size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def chunk_size():
+    return current_app.config.get('BULK_CHUNK_SIZE', 500)
+
+def iter_registration_ids(*criteria, size=None):
+    """
+    Yield the ids of registrations matching criteria, in id order
+
+    Ids are read a page at a time by keyset, so callers changing the rows as
+    they go never hold a long-running read open on the table.
+    """
+    table = Registration.__table__
+    size = size or chunk_size()
+    last_id = 0
+    while True:
+        ids = db.session.execute(
+            db.select(table.c.id).where(table.c.id > last_id, *criteria).order_by(table.c.id).limit(size)
+        ).scalars().all()
+        db.session.rollback()
+        if not ids:
+            return
+        yield from ids
+        last_id = ids[-1]
+
+def _generate_qr_codes(rows):
+    """Write a check-in QR code for each row, returning the rows that got one"""
+    generated = []
+    for row in rows:
+        try:
+            generate_qr_code(row.id, row.email)
+        except Exception as e:
+            # Left in its current status, so it can be approved again
+            logger.error(f"Skipped registration {row.id}, failed to generate its QR code: {str(e)}")
+            continue
+        generated.append(row)
+    return generated
+
+def bulk_set_status(registration_ids, status, admin_id, action, ip_address=None, from_status=None,
+                    qr_codes=False, size=None, progress=None):
+    """
+    Move registrations to status with one UPDATE per chunk of ids
+
+    Each chunk runs in its own short transaction: the rows not already in
+    status are selected with FOR UPDATE, updated together, and an audit entry
+    per registration is queued so it commits with the chunk. Core updates skip
+    the mapper listeners, so cached counts are refreshed here, in every worker.
+
+    Args:
+        registration_ids: Ids of the registrations to change
+        status: The RegistrationStatus to move them to
+        admin_id: The admin making the change, for the audit entries
+        action: The AuditLog action to record
+        from_status: Only change registrations currently in this status
+        qr_codes: Generate each registration's check-in QR code and store
+            its path, as approving a single receipt does
+        progress: Called with the running total after each chunk
+
+    Returns:
+        Dicts with id, name, email, phone_number, qr_code, status and
+        old_status for every registration that changed
+    """
+    table = Registration.__table__
+    criteria = [table.c.status != status]
+    if from_status is not None:
+        criteria.append(table.c.status == from_status)
+    values = {'status': status}
+    if qr_codes:
+        # The path generate_qr_code saves each code under
+        values['qr_code'] = 'qrcodes/' + db.cast(table.c.id, db.String) + '.png'
+    changed = []
+
+    for ids in chunked(registration_ids, size or chunk_size()):
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.name, table.c.email, table.c.phone_number, table.c.status)
+            .where(table.c.id.in_(ids), *criteria)
+            .with_for_update()
+        ).all()
+        if qr_codes:
+            rows = _generate_qr_codes(rows)
+        if not rows:
+            db.session.rollback()
+            if progress:
+                progress(len(changed))
+            continue
+
+        now = datetime.utcnow()
+        db.session.execute(
+            table.update()
+            .where(table.c.id.in_([row.id for row in rows]), *criteria)
+            .values(updated_at=now, **values)
+        )
+        for row in rows:
+            record_audit_entry(
+                admin_id=admin_id,
+                action=action,
+                resource_type=AuditLog.RESOURCE_REGISTRATION,
+                resource_id=row.id,
+                details=f"Bulk changed status of registration {row.id} to {status.value}",
+                ip_address=ip_address,
+                old_status=row.status,
+                new_status=status,
+                data={'bulk': True}
+            )
+        db.session.commit()
+
+        changed.extend({
+            'id': row.id,
+            'name': row.name,
+            'email': row.email,
+            'phone_number': row.phone_number,
+            'qr_code': f'qrcodes/{row.id}.png' if qr_codes else None,
+            'status': status,
+            'old_status': row.status,
+        } for row in rows)
+        if progress:
+            progress(len(changed))
+
+    if changed:
+        invalidate_counts(shared=True)
+        logger.info(f"Admin {admin_id} moved {len(changed)} registrations to {status.name}")
+    return changed
+
+def bulk_set_archived(registration_ids, archived, size=None, progress=None):
+    """
+    Archive or unarchive registrations with one UPDATE per chunk of ids
+
+    Args:
+        registration_ids: Ids of the registrations to change, any iterable
+        archived: True to archive, False to unarchive
+        progress: Called with the running total after each chunk
+
+    Returns:
+        The number of registrations changed
+    """
+    table = Registration.__table__
+    total = 0
+
+    for ids in chunked(registration_ids, size or chunk_size()):
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id.in_(ids), table.c.is_archived != archived)
+            .values(is_archived=archived, updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+        total += result.rowcount
+        if progress:
+            progress(total)
+
+    if total:
+        invalidate_counts(shared=True)
+        logger.info(f"{'Archived' if archived else 'Unarchived'} {total} registrations")
+    return total
+
+def _static_file(path):
+    """Resolve a receipt or QR code path stored relative to the static folder, or None"""
+    if not path:
+        return None
+    static_dir = os.path.realpath(current_app.static_folder)
+    full_path = os.path.realpath(os.path.join(static_dir, path))
+    if not full_path.startswith(static_dir + os.sep):
+        return None
+    return full_path
+
+def _remove_files(rows):
+    for row in rows:
+        for path in (_static_file(row.receipt_url), _static_file(row.qr_code)):
+            if path and os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning(f"Failed to remove {path}: {str(e)}")
+
+def purge_registrations(registration_ids, size=None, progress=None):
+    """
+    Permanently delete registrations with their check-ins and files, a chunk at a time
+
+    Each chunk is one short transaction deleting its check-ins, tombstones
+    for the changes feed, search documents and registrations with a
+    statement each. Receipt and QR code files and contact set entries are
+    only removed once the chunk has committed. Core deletes skip the mapper
+    listeners, so everything they maintain is handled here, and the cached
+    counts, histogram buckets and contact sets of other workers are dropped
+    through their shared versions.
+
+    Args:
+        registration_ids: Ids of the registrations to delete, any iterable
+        progress: Called with the running total after each chunk
+
+    Returns:
+        The number of registrations deleted
+    """
+    table = Registration.__table__
+    total = 0
+
+    for ids in chunked(registration_ids, size or chunk_size()):
+        rows = db.session.execute(
+            db.select(table.c.id, table.c.email, table.c.phone_number, table.c.receipt_url, table.c.qr_code)
+            .where(table.c.id.in_(ids))
+            .with_for_update()
+        ).all()
+        if not rows:
+            db.session.rollback()
+            if progress:
+                progress(total)
+            continue
+
+        ids = [row.id for row in rows]
+        now = datetime.utcnow()
+        connection = db.session.connection()
+        connection.execute(CheckIn.__table__.delete().where(CheckIn.__table__.c.registration_id.in_(ids)))
+        connection.execute(RegistrationTombstone.__table__.insert(), [
+            {'registration_id': row.id, 'email': row.email, 'deleted_at': now} for row in rows
+        ])
+        if search_index_available(connection):
+            unindex_registrations(connection, ids)
+        connection.execute(table.delete().where(table.c.id.in_(ids)))
+        db.session.commit()
+
+        for row in rows:
+            forget_contacts(row.email, row.phone_number)
+        _remove_files(rows)
+        total += len(rows)
+        if progress:
+            progress(total)
+
+    if total:
+        invalidate_counts(shared=True)
+        # Closed histogram buckets no longer match the tables
+        invalidate_histogram_cache()
+        # Other workers still hold the purged emails and phone numbers
+        bump_shared_version('contacts')
+        logger.info(f"Purged {total} registrations")
+    return total
@@ -0,0 +1,78 @@
+from threading import Lock
+from flask import current_app
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app import db
+from app.models.user import CacheVersion
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# The last versions read from cache_versions, re-read at most every
+# CACHE_VERSION_INTERVAL seconds so checking them costs no query per request
+_versions = {}
+_checked = None
+_lock = Lock()
+
+def _refresh():
+    global _versions, _checked
+    table = CacheVersion.__table__
+    try:
+        with db.engine.connect() as connection:
+            # One read serves every request until the next interval, so it
+            # isn't charged to whichever view happened to trigger it
+            connection.execution_options(query_budget_exempt=True)
+            versions = dict(connection.execute(db.select(table.c.name, table.c.version)).all())
+    except SQLAlchemyError as e:
+        # Keep the last versions; per-process TTLs still bound staleness
+        logger.warning(f"Failed to read cache versions: {str(e)}")
+        versions = None
+    with _lock:
+        if versions is not None:
+            _versions = versions
+        _checked = time.monotonic()
+
+def shared_version(name):
+    """
+    Return the version of name every worker agrees on
+
+    A per-process cache stores the version it was filled at and treats
+    itself as stale once this moves on.
+    """
+    interval = current_app.config.get('CACHE_VERSION_INTERVAL', 2)
+    with _lock:
+        stale = _checked is None or time.monotonic() - _checked >= interval
+    if stale:
+        _refresh()
+    with _lock:
+        return _versions.get(name, 0)
+
+def _bump(connection, name):
+    table = CacheVersion.__table__
+    result = connection.execute(
+        table.update().where(table.c.name == name).values(version=table.c.version + 1)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(name=name, version=1))
+
+def bump_shared_version(name, connection=None):
+    """
+    Tell every worker that caches derived from name are stale
+
+    Pass the connection of an open transaction to bump the version only if
+    that transaction commits; otherwise the bump is committed on its own.
+    """
+    global _checked
+    if connection is not None:
+        _bump(connection, name)
+    else:
+        try:
+            with db.engine.begin() as own_connection:
+                _bump(own_connection, name)
+        except IntegrityError:
+            # Another worker created the row first
+            with db.engine.begin() as own_connection:
+                _bump(own_connection, name)
+    with _lock:
+        # Read the new version back on the next check
+        _checked = None
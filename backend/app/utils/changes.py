@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event
+from app import db
+from app.models.user import Registration, CheckIn, RegistrationTombstone
+from app.utils.pagination import InvalidCursor
+from app.utils.serializers import REGISTRATION_API
+import base64
+import json
+
+# Change streams mapped to the (timestamp, id) columns they are read in order of
+CHANGE_STREAMS = {
+    'registrations': (Registration.updated_at, Registration.id),
+    'check_ins': (CheckIn.check_in_time, CheckIn.id),
+    'deleted': (RegistrationTombstone.deleted_at, RegistrationTombstone.id),
+}
+
+MAX_CHANGES_LIMIT = 5000
+
+def encode_watermark(positions):
+    """
+    Encode each stream's position into an opaque watermark token
+
+    A position is (timestamp, id) after a truncated page, or (timestamp, None)
+    once everything up to and including timestamp has been returned.
+    """
+    payload = {
+        stream: [timestamp.isoformat(), row_id]
+        for stream, (timestamp, row_id) in positions.items()
+    }
+    data = json.dumps(payload, separators=(',', ':'), sort_keys=True)
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+def decode_watermark(token):
+    """
+    Decode a watermark token, or an ISO timestamp used as the start of every stream
+
+    Returns:
+        A dict of stream name to (timestamp, id or None); raises InvalidCursor
+    """
+    try:
+        since = datetime.fromisoformat(token)
+        return {stream: (since, None) for stream in CHANGE_STREAMS}
+    except ValueError:
+        pass
+
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        positions = {}
+        for stream in CHANGE_STREAMS:
+            timestamp, row_id = payload[stream]
+            if row_id is not None and not isinstance(row_id, int):
+                raise TypeError
+            positions[stream] = (datetime.fromisoformat(timestamp), row_id)
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor('Invalid watermark')
+    return positions
+
+def _after(timestamp_column, id_column, position):
+    timestamp, row_id = position
+    if row_id is None:
+        return timestamp_column > timestamp
+    return db.or_(
+        timestamp_column > timestamp,
+        db.and_(timestamp_column == timestamp, id_column > row_id)
+    )
+
+def _stream_query(stream):
+    if stream == 'registrations':
+        return REGISTRATION_API.select(Registration.query)
+    if stream == 'check_ins':
+        return CheckIn.query.with_entities(
+            CheckIn.id, CheckIn.registration_id, CheckIn.check_in_time, CheckIn.checked_in_by
+        )
+    return RegistrationTombstone.query.with_entities(
+        RegistrationTombstone.id, RegistrationTombstone.registration_id,
+        RegistrationTombstone.email, RegistrationTombstone.deleted_at
+    )
+
+def _dump(stream, row):
+    if stream == 'registrations':
+        return REGISTRATION_API.dump(row)
+    if stream == 'check_ins':
+        return {
+            'id': row.id,
+            'registration_id': row.registration_id,
+            'check_in_time': row.check_in_time.isoformat() if row.check_in_time else None,
+            'checked_in_by': row.checked_in_by
+        }
+    return {
+        'registration_id': row.registration_id,
+        'email': row.email,
+        'deleted_at': row.deleted_at.isoformat()
+    }
+
+def fetch_changes(since=None, limit=1000, now=None):
+    """
+    Return registrations, check-ins and deletions changed since a watermark
+
+    Rows newer than CHANGES_SAFETY_LAG seconds are held back until the next
+    call, so a transaction that commits a little after its timestamp was set
+    isn't skipped.
+
+    Args:
+        since: A watermark from a previous call, an ISO timestamp, or None for
+            everything
+        limit: Maximum rows per stream; has_more is set when any stream was cut
+        now: Current UTC time, for tests
+
+    Returns:
+        A dict with 'registrations', 'check_ins', 'deleted', 'watermark' and
+        'has_more'; raises InvalidCursor for a bad watermark
+    """
+    positions = decode_watermark(since) if since else {}
+    lag = current_app.config.get('CHANGES_SAFETY_LAG', 5)
+    upto = (now or datetime.utcnow()) - timedelta(seconds=lag)
+
+    changes = {'has_more': False}
+    next_positions = {}
+    for stream, (timestamp_column, id_column) in CHANGE_STREAMS.items():
+        position = positions.get(stream)
+        if position and position[0] >= upto and position[1] is None:
+            # Already caught up to the safety lag
+            changes[stream] = []
+            next_positions[stream] = position
+            continue
+
+        query = _stream_query(stream).filter(timestamp_column <= upto)
+        if position:
+            query = query.filter(_after(timestamp_column, id_column, position))
+        rows = query.order_by(timestamp_column.asc(), id_column.asc()).limit(limit + 1).all()
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_positions[stream] = (getattr(last, timestamp_column.key), last.id)
+            changes['has_more'] = True
+        else:
+            next_positions[stream] = (upto, None)
+
+        changes[stream] = [_dump(stream, row) for row in rows]
+
+    changes['watermark'] = encode_watermark(next_positions)
+    return changes
+
+@event.listens_for(Registration, 'after_delete')
+def _record_tombstone(mapper, connection, target):
+    connection.execute(RegistrationTombstone.__table__.insert().values(
+        registration_id=target.id,
+        email=target.email,
+        deleted_at=datetime.utcnow()
+    ))
@@ -0,0 +1,53 @@
+from flask import Response, stream_with_context
+import csv
+import io
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_FETCH_SIZE = 1000
+
+# Rows written before a chunk is sent to the client
+CSV_CHUNK_ROWS = 500
+
+def stream_rows(query, fetch_size=EXPORT_FETCH_SIZE):
+    """
+    Iterate over a query's rows without loading them all
+
+    yield_per turns on stream_results, which uses a server-side cursor
+    (SSCursor) on PyMySQL, so only fetch_size rows are held at a time.
+    """
+    return query.yield_per(fetch_size)
+
+def iter_csv(header, rows, chunk_rows=CSV_CHUNK_ROWS):
+    """Encode rows as CSV, yielding UTF-8 chunks of about chunk_rows rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # Send the header straight away so the download starts before the query runs
+    writer.writerow(header)
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate(0)
+
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_rows == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def csv_response(header, rows, filename):
+    """Build a streaming CSV download; rows may be a lazy generator over a query"""
+    return Response(
+        stream_with_context(iter_csv(header, rows)),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename={filename}',
+            # Stop reverse proxies from buffering the whole export
+            'X-Accel-Buffering': 'no'
+        }
+    )
@@ -180,7 +180,8 @@ def save_email_to_file(msg):
         email_dir = os.path.join(app.instance_path, 'emails')
         os.makedirs(email_dir, exist_ok=True)
         
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        # Microseconds keep emails saved in the same second, e.g. in bulk, apart
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
         filename = f"email_{timestamp}.json"
         filepath = os.path.join(email_dir, filename)
         
@@ -197,13 +198,13 @@ def save_email_to_file(msg):
         
         # Handle attachments if any
         if hasattr(msg, 'attachments') and msg.attachments:
+            # Flask-Mail keeps Attachment objects rather than tuples
             for attachment in msg.attachments:
-                if len(attachment) >= 3:
-                    email_data['attachments'].append({
-                        'filename': attachment[0],
-                        'content_type': attachment[1],
-                        'data_length': len(attachment[2]) if attachment[2] else 0
-                    })
+                email_data['attachments'].append({
+                    'filename': attachment.filename,
+                    'content_type': attachment.content_type,
+                    'data_length': len(attachment.data) if attachment.data else 0
+                })
         
         # Save to file
         with open(filepath, 'w') as f:
@@ -329,4 +330,110 @@ def notify_admin_new_receipt(registration, admin_emails):
         recipients=admin_emails,
         text_body="",
         html_body=render_template('emails/admin_new_receipt.html', registration=registration)
-    ) 
\ No newline at end of file
+    ) 
+
+# Registration emails that can go out in bulk, mapped to (subject, HTML template,
+# plain-text template or None), matching what the single-email helpers send
+BULK_EMAILS = {
+    'registration_confirmation': ("Registration Confirmation - SOD 2025", 'emails/registration_confirmation.html',
+                                  'emails/registration_confirmation.txt'),
+    'payment_confirmation': ("Payment Confirmed - SOD 2025", 'emails/payment_confirmation.html',
+                             'emails/payment_confirmation.txt'),
+    'receipt_rejection': ("SOD 2025 - Receipt Rejected, Re-upload Required", 'emails/receipt_rejection.html', None),
+    'event_reminder': ("SOD 2025 - Event Reminder", 'emails/event_reminder.html', None),
+}
+
+# Bulk emails whose template shows the check-in QR code
+QR_CODE_EMAILS = {'payment_confirmation'}
+
+def _qr_code_image(registration):
+    """Read the check-in QR code saved for a registration, or None if it has none"""
+    qr_code = registration.get('qr_code') if isinstance(registration, dict) else registration.qr_code
+    if not qr_code:
+        return None
+    qr_folder = current_app.config.get('QR_CODE_FOLDER', 'app/static/qrcodes')
+    try:
+        with open(os.path.join(qr_folder, os.path.basename(qr_code)), 'rb') as f:
+            return f.read()
+    except OSError as e:
+        logger.error(f"Failed to read QR code {qr_code}: {str(e)}")
+        return None
+
+def send_bulk_registration_emails(kind, registrations):
+    """
+    Send one kind of registration email to many registrations
+
+    SMTP messages go out over a single connection instead of one per email;
+    messages that fail are saved to file like send_email does.
+
+    Args:
+        kind: A key of BULK_EMAILS
+        registrations: Registrations, or dicts with the fields the template uses
+
+    Returns:
+        The number of emails sent or saved
+    """
+    app = current_app._get_current_object()
+    subject, template, text_template = BULK_EMAILS[kind]
+    sender = app.config.get('MAIL_DEFAULT_SENDER')
+    reply_to = app.config.get('MAIL_REPLY_TO')
+
+    messages = []
+    for registration in registrations:
+        email = registration['email'] if isinstance(registration, dict) else registration.email
+        msg = Message(subject, sender=sender, recipients=[email], reply_to=reply_to)
+        msg.body = render_template(text_template, registration=registration) if text_template else ""
+        msg.html = render_template(template, registration=registration)
+        qr_code = _qr_code_image(registration) if kind in QR_CODE_EMAILS else None
+        if qr_code:
+            # Shown in place by templates that reference cid:qr_code
+            msg.attach('qr_code.png', 'image/png', qr_code, 'inline', headers={'Content-ID': '<qr_code>'})
+        messages.append(msg)
+    if not messages:
+        return 0
+
+    if app.config.get('MAIL_SUPPRESS_SEND', False) or app.debug:
+        logger.info(f"Development mode: Saving {len(messages)} {kind} emails to file instead of sending")
+        return sum(1 for msg in messages if save_email_to_file(msg))
+
+    sent = 0
+    if app.config.get('MAIL_SERVER') == 'smtp.mailgun.org':
+        for msg in messages:
+            attachments = [{'filename': a.filename, 'content_type': a.content_type, 'data': a.data}
+                           for a in msg.attachments]
+            if send_via_mailgun_api(msg.recipients, msg.subject, msg.body, msg.html, attachments=attachments,
+                                    sender=sender, reply_to=reply_to):
+                sent += 1
+            elif save_email_to_file(msg):
+                sent += 1
+        logger.info(f"Sent {sent} of {len(messages)} {kind} emails via Mailgun API")
+        return sent
+
+    pending = list(messages)
+    try:
+        with mail.connect() as connection:
+            while pending:
+                connection.send(pending[0])
+                pending.pop(0)
+                sent += 1
+    except Exception as e:
+        logger.error(f"Bulk {kind} email failed after {sent} of {len(messages)} messages: {str(e)}")
+    logger.info(f"Sent {sent} of {len(messages)} {kind} emails via SMTP")
+
+    # Keep whatever didn't go out
+    return sent + sum(1 for msg in pending if save_email_to_file(msg))
+
+def queue_bulk_registration_emails(kind, registrations):
+    """Send bulk registration emails from a background thread so the caller doesn't wait"""
+    app = current_app._get_current_object()
+
+    def _send():
+        with app.app_context():
+            try:
+                send_bulk_registration_emails(kind, registrations)
+            except Exception as e:
+                logger.error(f"Failed to send bulk {kind} emails: {str(e)}")
+
+    thread = Thread(target=_send, name=f'bulk-email-{kind}', daemon=True)
+    thread.start()
+    return thread
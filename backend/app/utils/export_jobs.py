@@ -0,0 +1,213 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from flask import current_app
+from app import db
+from app.models.user import Registration, CheckIn, AuditLog
+from app.utils.csv_export import stream_rows
+from app.utils.exports import EXPORT_KINDS
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Export jobs run on a small shared pool so a burst of requests can't start
+# an unbounded number of exports at once
+_executor = None
+_executor_lock = Lock()
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('EXPORT_WORKERS', 2),
+                thread_name_prefix='export'
+            )
+    return _executor
+
+def export_folder():
+    """Return the directory export files are written to, creating it if needed"""
+    folder = current_app.config.get('EXPORT_FOLDER') or os.path.join(current_app.instance_path, 'exports')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def data_version(kind):
+    """
+    Fingerprint the tables an export reads
+
+    Inserts move the max id, deletes move the row count and updates move
+    max(updated_at), so any change to the data gives a new version. The
+    audit log version ignores export entries, otherwise requesting an audit
+    log export would itself invalidate the cached file.
+    """
+    if kind == 'audit_logs':
+        row = db.session.query(
+            db.func.min(AuditLog.id), db.func.max(AuditLog.id)
+        ).filter(AuditLog.action != AuditLog.ACTION_EXPORT).one()
+        return [row[0], row[1]]
+
+    registrations = db.session.query(
+        db.func.count(Registration.id), db.func.max(Registration.id), db.func.max(Registration.updated_at)
+    ).one()
+    check_ins = db.session.query(db.func.count(CheckIn.id), db.func.max(CheckIn.id)).one()
+    return [registrations[0], registrations[1],
+            registrations[2].isoformat() if registrations[2] else None,
+            check_ins[0], check_ins[1]]
+
+def job_key(kind, filters, version):
+    """Return the job id for an export of kind with filters at a data version"""
+    payload = json.dumps([kind, filters, version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def _paths(key):
+    base = os.path.join(export_folder(), key)
+    return {
+        'meta': base + '.json',
+        'file': base + '.csv.gz',
+        'part': base + '.csv.gz.part',
+        'error': base + '.error',
+    }
+
+def is_valid_job_id(job_id):
+    return len(job_id) == 32 and all(c in '0123456789abcdef' for c in job_id)
+
+def get_job(job_id):
+    """
+    Return a job's metadata and status, or None if there is no such job
+
+    Status is 'ready' once the file exists, 'failed' if the worker recorded an
+    error and 'pending' while it is still being written.
+    """
+    if not is_valid_job_id(job_id):
+        return None
+
+    paths = _paths(job_id)
+    try:
+        with open(paths['meta']) as f:
+            job = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    job['job_id'] = job_id
+    if os.path.exists(paths['file']):
+        job['status'] = 'ready'
+        job['size'] = os.path.getsize(paths['file'])
+    elif os.path.exists(paths['error']):
+        job['status'] = 'failed'
+        with open(paths['error']) as f:
+            job['error'] = f.read()
+    else:
+        job['status'] = 'pending'
+    return job
+
+def job_file_path(job_id):
+    """Return the path of a finished export file"""
+    return _paths(job_id)['file']
+
+def _claim(paths, timeout):
+    """
+    Claim a job by creating its .part file, so only one worker in any process
+    writes it. A .part file older than timeout is left by a dead worker and is
+    taken over.
+    """
+    try:
+        fd = os.open(paths['part'], os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(paths['part']) < timeout:
+                return False
+            os.remove(paths['part'])
+        except FileNotFoundError:
+            pass
+        return _claim(paths, float('inf'))
+    os.close(fd)
+    return True
+
+def request_export(kind, filters, admin_id):
+    """
+    Find or start an export job
+
+    Args:
+        kind: A key of EXPORT_KINDS
+        filters: Filters from parse_export_filters
+        admin_id: The admin requesting the export
+
+    Returns:
+        The job dict from get_job; its status is 'ready' straight away when a
+        file for the same filters and data version already exists
+    """
+    prune_exports()
+
+    version = data_version(kind)
+    key = job_key(kind, filters, version)
+    paths = _paths(key)
+
+    job = get_job(key)
+    if job and job['status'] == 'ready':
+        return job
+
+    if not _claim(paths, current_app.config.get('EXPORT_JOB_TIMEOUT', 30 * 60)):
+        # Another request is already writing this export
+        return get_job(key) or {'job_id': key, 'kind': kind, 'filters': filters, 'status': 'pending'}
+
+    if os.path.exists(paths['error']):
+        os.remove(paths['error'])
+
+    meta = {
+        'kind': kind,
+        'filters': filters,
+        'version': version,
+        'requested_by': admin_id,
+        'requested_at': time.time(),
+    }
+    with open(paths['meta'], 'w') as f:
+        json.dump(meta, f)
+
+    app = current_app._get_current_object()
+    _get_executor(app).submit(_run_export, app, kind, filters, key)
+    logger.info(f"Queued {kind} export {key} with filters {filters}")
+
+    return get_job(key)
+
+def _run_export(app, kind, filters, key):
+    """Write an export to a gzip file, renaming it into place once complete"""
+    with app.app_context():
+        paths = _paths(key)
+        try:
+            _, build, _ = EXPORT_KINDS[kind]
+            header, query, format_row = build(filters)
+
+            with gzip.open(paths['part'], 'wt', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                for row in stream_rows(query):
+                    writer.writerow(format_row(row))
+
+            os.replace(paths['part'], paths['file'])
+            logger.info(f"Finished {kind} export {key}")
+        except Exception as e:
+            logger.exception(f"Export {key} failed")
+            with open(paths['error'], 'w') as f:
+                f.write(str(e))
+            if os.path.exists(paths['part']):
+                os.remove(paths['part'])
+        finally:
+            db.session.remove()
+
+def prune_exports():
+    """Delete export files older than EXPORT_RETENTION seconds"""
+    folder = export_folder()
+    cutoff = time.time() - current_app.config.get('EXPORT_RETENTION', 24 * 60 * 60)
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        try:
+            if name.endswith('.part') or os.path.getmtime(path) >= cutoff:
+                continue
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,147 @@
+from app import db
+from app.models.user import Registration, RegistrationStatus, CheckIn, Admin, AuditLog, Permission
+from app.utils.audit import filter_audit_logs
+
+def _datetime_str(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+def _first_check_in():
+    """Each registration's first check-in, aggregated once instead of queried per row"""
+    return db.session.query(
+        CheckIn.registration_id.label('registration_id'),
+        db.func.min(CheckIn.check_in_time).label('check_in_time')
+    ).group_by(CheckIn.registration_id).subquery()
+
+def attendees_export(filters):
+    """Build the attendee export: (header, query, row formatter)"""
+    status = filters.get('status')
+
+    query = Registration.query
+    if status and status in RegistrationStatus.__members__:
+        query = query.filter_by(status=RegistrationStatus[status])
+    else:
+        # Default to confirmed registrations
+        query = query.filter_by(status=RegistrationStatus.CONFIRMED)
+
+    # Select only the exported columns, with the check-in state from the same query
+    query = query.with_entities(
+        Registration.id,
+        Registration.name,
+        Registration.email,
+        Registration.phone_number,
+        Registration.status,
+        Registration.created_at,
+        db.exists().where(CheckIn.registration_id == Registration.id).label('checked_in')
+    ).order_by(Registration.id)
+
+    def format_row(reg):
+        return [
+            reg.id,
+            reg.name,
+            reg.email,
+            reg.phone_number,
+            reg.status.value,
+            _datetime_str(reg.created_at),
+            'Yes' if reg.checked_in else 'No'
+        ]
+
+    header = ['ID', 'Name', 'Email', 'Phone', 'Status', 'Registration Date', 'Checked In']
+    return header, query, format_row
+
+def registrations_export(filters):
+    """Build the registrations export: (header, query, row formatter)"""
+    status = filters.get('status')
+
+    query = Registration.query
+    if status and status != 'ALL':
+        query = query.filter_by(status=status)
+
+    first_check_in = _first_check_in()
+    query = query.outerjoin(first_check_in, first_check_in.c.registration_id == Registration.id).with_entities(
+        Registration.id,
+        Registration.name,
+        Registration.email,
+        Registration.phone_number,
+        Registration.status,
+        Registration.created_at,
+        Registration.checked_in,
+        first_check_in.c.check_in_time
+    ).order_by(Registration.id)
+
+    def format_row(reg):
+        return [
+            reg.id,
+            reg.name,
+            reg.email,
+            reg.phone_number,
+            reg.status.value,
+            _datetime_str(reg.created_at),
+            'Yes' if reg.checked_in or reg.check_in_time else 'No',
+            _datetime_str(reg.check_in_time)
+        ]
+
+    header = ['ID', 'Name', 'Email', 'Phone', 'Status', 'Created At', 'Checked In', 'Checked In At']
+    return header, query, format_row
+
+def audit_logs_export(filters):
+    """Build the audit log export: (header, query, row formatter)"""
+    # Join the admin's email instead of loading it per row
+    query = AuditLog.query.outerjoin(Admin, Admin.id == AuditLog.admin_id)
+
+    query = filter_audit_logs(query, filters)
+
+    query = query.with_entities(
+        AuditLog.id,
+        AuditLog.timestamp,
+        Admin.email.label('admin_email'),
+        AuditLog.action,
+        AuditLog.resource_type,
+        AuditLog.resource_id,
+        AuditLog.old_status,
+        AuditLog.new_status,
+        AuditLog.details,
+        AuditLog.ip_address
+    ).order_by(AuditLog.timestamp.desc(), AuditLog.id.desc())
+
+    def format_row(log):
+        return [
+            log.id,
+            _datetime_str(log.timestamp),
+            log.admin_email or 'Unknown',
+            log.action,
+            log.resource_type,
+            log.resource_id,
+            log.old_status or '',
+            log.new_status or '',
+            log.details,
+            log.ip_address
+        ]
+
+    header = ['ID', 'Timestamp', 'Admin', 'Action', 'Resource Type', 'Resource ID',
+              'Old Status', 'New Status', 'Details', 'IP Address']
+    return header, query, format_row
+
+# Export kinds mapped to (required permission, builder, accepted filters and their types)
+EXPORT_KINDS = {
+    'attendees': (Permission.EXPORT_DATA, attendees_export, {'status': str}),
+    'registrations': (Permission.EXPORT_DATA, registrations_export, {'status': str}),
+    'audit_logs': (Permission.EXPORT_AUDIT_LOGS, audit_logs_export,
+                   {'admin_id': int, 'action': str, 'resource_type': str, 'resource_id': int,
+                    'status': str, 'days': int}),
+}
+
+def parse_export_filters(kind, args):
+    """Pick the filters an export kind accepts out of request args or JSON"""
+    _, _, accepted = EXPORT_KINDS[kind]
+    filters = {}
+    for name, type_ in accepted.items():
+        value = args.get(name)
+        if value in (None, ''):
+            continue
+        try:
+            filters[name] = type_(value)
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid value for {name}')
+    if kind == 'audit_logs':
+        filters.setdefault('days', 7)
+    return filters
@@ -0,0 +1,208 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from flask import current_app
+from app import db
+from app.models.user import Registration, CheckIn
+from app.utils.cache_versions import shared_version, bump_shared_version
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Sources that can be charted, mapped to the timestamp column they are bucketed on
+HISTOGRAM_SOURCES = {
+    'registrations': Registration.created_at,
+    'checkins': CheckIn.check_in_time,
+}
+
+# Accepted bucket width suffixes, in seconds
+BUCKET_UNITS = {
+    's': 1,
+    'm': 60,
+    'h': 60 * 60,
+    'd': 24 * 60 * 60,
+}
+
+MIN_BUCKET_SECONDS = 60
+MAX_BUCKETS = 2000
+
+# Widths come from the query string, so only this many (source, width) keys
+# are cached, the least recently used dropped first
+MAX_CACHED_WIDTHS = 32
+
+EPOCH = datetime(1970, 1, 1)
+
+# Counts for buckets that have already closed, keyed by (source, width).
+# Each entry holds the contiguous range of bucket indexes that has been
+# computed and the non-empty counts inside that range. Entries are dropped
+# when the shared 'histogram' version moves on, which deleting rows in any
+# process does, and expire after HISTOGRAM_CACHE_TTL seconds to bound
+# changes made behind the app's back.
+_closed_buckets = OrderedDict()
+_cache_lock = Lock()
+
+def parse_bucket_width(value):
+    """Parse a bucket width such as '15m', '1h', '1d' or '900' into seconds"""
+    if not value:
+        raise ValueError('Bucket width is required')
+
+    value = str(value).strip().lower()
+    if value[-1] in BUCKET_UNITS:
+        number, unit = value[:-1], BUCKET_UNITS[value[-1]]
+    else:
+        number, unit = value, 1
+
+    try:
+        seconds = int(number) * unit
+    except ValueError:
+        raise ValueError(f'Invalid bucket width: {value}')
+
+    if seconds < MIN_BUCKET_SECONDS:
+        raise ValueError(f'Bucket width must be at least {MIN_BUCKET_SECONDS} seconds')
+
+    return seconds
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 timestamp into a naive UTC datetime
+
+    Timestamps with an offset, including a trailing 'Z', are converted to UTC.
+    """
+    value = str(value).strip()
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid timestamp: {value}')
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def bucket_index(timestamp, width):
+    """Return the index of the bucket containing a naive UTC timestamp"""
+    return int((timestamp - EPOCH).total_seconds()) // width
+
+def bucket_start(index, width):
+    """Return the start time of a bucket index"""
+    return EPOCH + timedelta(seconds=index * width)
+
+def _epoch_seconds(column):
+    """Build a SQL expression giving the UTC epoch seconds of a DATETIME column"""
+    dialect = db.engine.dialect.name
+
+    if dialect == 'mysql':
+        # TIMESTAMPDIFF ignores the session time zone, unlike UNIX_TIMESTAMP
+        return db.func.timestampdiff(db.text('SECOND'), '1970-01-01 00:00:00', column)
+    if dialect == 'sqlite':
+        return db.cast(db.func.strftime('%s', column), db.Integer)
+    return db.cast(db.func.extract('epoch', column), db.Integer)
+
+def _query_bucket_counts(column, width, first, last):
+    """Count rows per bucket for bucket indexes first..last inclusive, in SQL"""
+    index = db.func.floor(_epoch_seconds(column) / width)
+    rows = db.session.query(index, db.func.count())\
+        .filter(column >= bucket_start(first, width))\
+        .filter(column < bucket_start(last + 1, width))\
+        .group_by(index)\
+        .all()
+    return {int(idx): count for idx, count in rows}
+
+def _query_current_bucket(column, width, current):
+    """Count rows in the bucket that is still open"""
+    return db.session.query(db.func.count())\
+        .filter(column >= bucket_start(current, width))\
+        .filter(column < bucket_start(current + 1, width))\
+        .scalar()
+
+def _closed_counts(source, column, width, first, last):
+    """Return counts for closed buckets first..last, reusing cached buckets"""
+    key = (source, width)
+    version = shared_version('histogram')
+    ttl = current_app.config.get('HISTOGRAM_CACHE_TTL', 3600)
+    now = time.monotonic()
+
+    with _cache_lock:
+        entry = _closed_buckets.get(key)
+        if entry and entry['version'] == version and now - entry['filled'] < ttl:
+            _closed_buckets.move_to_end(key)
+            lo, hi, counts, filled = entry['lo'], entry['hi'], dict(entry['counts']), entry['filled']
+        else:
+            lo, hi, counts, filled = None, None, {}, now
+
+    # Work out which ranges fall outside the cached span
+    missing = []
+    if lo is None:
+        missing.append((first, last))
+    else:
+        if first < lo:
+            missing.append((first, lo - 1))
+        if last > hi:
+            missing.append((hi + 1, last))
+
+    for start, end in missing:
+        counts.update(_query_bucket_counts(column, width, start, end))
+
+    if missing:
+        # The missing ranges always adjoin the cached span, so it stays contiguous
+        new_lo = first if lo is None else min(first, lo)
+        new_hi = last if hi is None else max(last, hi)
+        with _cache_lock:
+            _closed_buckets[key] = {'lo': new_lo, 'hi': new_hi, 'counts': counts,
+                                    'version': version, 'filled': filled}
+            _closed_buckets.move_to_end(key)
+            while len(_closed_buckets) > MAX_CACHED_WIDTHS:
+                _closed_buckets.popitem(last=False)
+
+    return counts
+
+def invalidate_histogram_cache():
+    """Forget cached bucket counts in every worker, e.g. after registrations or check-ins are deleted"""
+    with _cache_lock:
+        _closed_buckets.clear()
+    bump_shared_version('histogram')
+
+def compute_histogram(source, width, start, end, now=None):
+    """
+    Build a histogram of rows per bucket between start and end
+
+    Args:
+        source: One of HISTOGRAM_SOURCES
+        width: Bucket width in seconds
+        start: Naive UTC datetime of the first bucket to include
+        end: Naive UTC datetime of the last bucket to include
+        now: Current time, defaults to datetime.utcnow()
+
+    Returns:
+        A list of {'start': ..., 'count': ...} dicts, one per bucket
+    """
+    if source not in HISTOGRAM_SOURCES:
+        raise ValueError(f'Unknown histogram source: {source}')
+
+    column = HISTOGRAM_SOURCES[source]
+    now = now or datetime.utcnow()
+
+    first = bucket_index(start, width)
+    last = bucket_index(end, width)
+    current = bucket_index(now, width)
+
+    if last < first:
+        raise ValueError('End must not be before start')
+    if last - first + 1 > MAX_BUCKETS:
+        raise ValueError(f'A histogram can have at most {MAX_BUCKETS} buckets')
+
+    # Buckets in the future are always empty
+    last_closed = min(last, current - 1)
+    counts = {}
+    if first <= last_closed:
+        counts.update(_closed_counts(source, column, width, first, last_closed))
+
+    # The open bucket is recomputed on every request
+    if first <= current <= last:
+        counts[current] = _query_current_bucket(column, width, current)
+
+    return [
+        {'start': bucket_start(idx, width).isoformat(), 'count': counts.get(idx, 0)}
+        for idx in range(first, last + 1)
+    ]
@@ -0,0 +1,310 @@
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from threading import Lock, Thread, Event
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.user import Registration, RegistrationStatus
+from app.utils.availability import remember_contacts, normalise_email, normalise_phone
+from app.utils.pagination import invalidate_counts
+from app.utils.search import search_index_available, index_new_registrations
+import atexit
+import logging
+
+logger = logging.getLogger(__name__)
+
+class DuplicateRegistration(Exception):
+    """Raised when a registration's email or phone number is already taken"""
+
+    def __init__(self, field):
+        super().__init__(f'{field} already registered')
+        self.field = field
+
+    @property
+    def message(self):
+        if self.field == 'phone_number':
+            return 'Phone number already registered'
+        return 'Email already registered'
+
+class IntakeTimeout(Exception):
+    """Raised when a queued registration wasn't written within INTAKE_WAIT_TIMEOUT"""
+    pass
+
+def duplicate_field(error):
+    """
+    Return which unique column an IntegrityError was raised for, or None
+
+    Understands MySQL's "Duplicate entry '...' for key '...'" and SQLite's
+    "UNIQUE constraint failed: table.column"; only the key part is looked at,
+    so the duplicate value itself can't confuse it.
+    """
+    message = str(getattr(error, 'orig', error))
+    for marker in ('for key', 'UNIQUE constraint failed'):
+        if marker in message:
+            message = message.rsplit(marker, 1)[1]
+            break
+    else:
+        return None
+
+    if 'phone_number' in message:
+        return 'phone_number'
+    if 'email' in message:
+        return 'email'
+    return None
+
+def create_registration(name, email, phone_number):
+    """
+    Insert a registration in one statement, relying on the unique constraints
+
+    There is no SELECT beforehand, so concurrent submissions can't race past a
+    check; whichever commits second gets DuplicateRegistration. The returned
+    registration is detached with every column loaded, so reading it afterwards
+    doesn't reload it.
+    """
+    registration = Registration(
+        name=name,
+        email=email,
+        phone_number=normalise_phone(phone_number),
+        status=RegistrationStatus.PENDING_PAYMENT
+    )
+    db.session.add(registration)
+    try:
+        db.session.flush()
+        db.session.expunge(registration)
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        field = duplicate_field(e)
+        if field is None:
+            raise
+        raise DuplicateRegistration(field)
+    return registration
+
+def registrations_inserted(connection, rows):
+    """
+    Do what the Registration mapper listeners would have done for rows
+    inserted with a Core statement: refresh cached counts, index the rows for
+    search and add them to the contact set
+
+    Args:
+        connection: The connection the rows were inserted on
+        rows: Dicts with id, name, email and phone_number
+    """
+    if not rows:
+        return
+    invalidate_counts()
+    if search_index_available(connection):
+        index_new_registrations(connection, rows)
+    for row in rows:
+        remember_contacts(row['email'], row['phone_number'])
+
+def _new_row(name, email, phone_number, status, now):
+    return {
+        'name': name,
+        'email': email,
+        'phone_number': normalise_phone(phone_number),
+        'status': status,
+        'created_at': now,
+        'updated_at': now,
+        'is_archived': False,
+        'checked_in': False,
+    }
+
+def _taken(connection, rows):
+    """Return the normalised emails and phone numbers of rows that already exist"""
+    table = Registration.__table__
+    result = connection.execute(db.select(table.c.email, table.c.phone_number).where(db.or_(
+        table.c.email.in_([row['email'] for row in rows]),
+        table.c.phone_number.in_([row['phone_number'] for row in rows])
+    )))
+    emails, phones = set(), set()
+    for email, phone in result:
+        emails.add(normalise_email(email))
+        phones.add(normalise_phone(phone))
+    return emails, phones
+
+def _assign_ids(connection, rows):
+    table = Registration.__table__
+    result = connection.execute(db.select(table.c.id, table.c.email).where(
+        table.c.email.in_([row['email'] for row in rows])
+    ))
+    ids = {normalise_email(email): row_id for row_id, email in result}
+    for row in rows:
+        row['id'] = ids[normalise_email(row['email'])]
+
+def insert_registrations(entries, status=RegistrationStatus.PENDING_PAYMENT):
+    """
+    Insert a batch of registrations with one multi-row INSERT
+
+    Entries already taken in the database, or by an earlier entry in the same
+    batch, are turned down first. If another worker inserts a clashing row in
+    the meantime, the batch is retried one row at a time so only the clashing
+    entries fail.
+
+    Args:
+        entries: (name, email, phone_number) tuples
+        status: The RegistrationStatus the registrations start in
+
+    Returns:
+        One result per entry, in order: the new registration's row dict with
+        its id, or a DuplicateRegistration
+    """
+    now = datetime.utcnow()
+    rows = [_new_row(name, email, phone_number, status, now) for name, email, phone_number in entries]
+    results = [None] * len(rows)
+    table = Registration.__table__
+
+    with db.engine.connect() as connection:
+        emails, phones = _taken(connection, rows)
+        accepted = []
+        for i, row in enumerate(rows):
+            email, phone = normalise_email(row['email']), normalise_phone(row['phone_number'])
+            if email in emails:
+                results[i] = DuplicateRegistration('email')
+            elif phone in phones:
+                results[i] = DuplicateRegistration('phone_number')
+            else:
+                emails.add(email)
+                phones.add(phone)
+                accepted.append(i)
+        connection.rollback()
+
+    if not accepted:
+        return results
+
+    try:
+        with db.engine.begin() as connection:
+            batch = [rows[i] for i in accepted]
+            connection.execute(table.insert().values(batch))
+            _assign_ids(connection, batch)
+            registrations_inserted(connection, batch)
+        for i in accepted:
+            results[i] = rows[i]
+        return results
+    except IntegrityError:
+        logger.info(f"Intake batch of {len(accepted)} raced another writer, inserting one at a time")
+
+    for i in accepted:
+        try:
+            with db.engine.begin() as connection:
+                result = connection.execute(table.insert().values(rows[i]))
+                rows[i]['id'] = result.inserted_primary_key[0]
+                registrations_inserted(connection, [rows[i]])
+            results[i] = rows[i]
+        except IntegrityError as e:
+            field = duplicate_field(e)
+            results[i] = DuplicateRegistration(field) if field else e
+    return results
+
+class IntakeBuffer:
+    """
+    Per-process queue that writes registrations in groups
+
+    Requests hand their registration to submit() and wait on the returned
+    future while a background thread inserts everything queued every
+    `interval` seconds, or as soon as `batch_size` entries are waiting, as one
+    multi-row INSERT and one commit.
+    """
+
+    def __init__(self, app, interval=0.005, batch_size=200):
+        self.app = app
+        self.interval = interval
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name='intake-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, name, email, phone_number):
+        future = Future()
+        with self._lock:
+            self._pending.append(((name, email, phone_number), future))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+        return future
+
+    def flush(self):
+        """Write the next batch of queued registrations; returns the number taken off the queue"""
+        with self._lock:
+            taken, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+        # Requests that gave up waiting cancelled their future; the rest can't cancel any more
+        batch = [(entry, future) for entry, future in taken if future.set_running_or_notify_cancel()]
+        if not batch:
+            return len(taken)
+
+        with self.app.app_context():
+            try:
+                results = insert_registrations([entry for entry, _ in batch])
+            except Exception as e:
+                logger.exception(f"Failed to write {len(batch)} queued registrations")
+                results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+        return len(taken)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            while self.flush() == self.batch_size:
+                pass
+
+    def close(self):
+        self._stop.set()
+        self._wakeup.set()
+        while self.flush():
+            pass
+
+_buffer = None
+_buffer_lock = Lock()
+
+def get_intake_buffer(app):
+    """Return this process's IntakeBuffer, starting it on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = IntakeBuffer(
+                app,
+                interval=app.config.get('INTAKE_FLUSH_INTERVAL', 0.005),
+                batch_size=app.config.get('INTAKE_BATCH_SIZE', 200)
+            )
+    return _buffer
+
+def register_attendee(name, email, phone_number):
+    """
+    Create a registration, grouped with concurrent ones when INTAKE_BATCHING is on
+
+    Batching needs threaded workers (gunicorn --threads or gthread): a worker
+    serving one request at a time never has two registrations to group.
+
+    Returns:
+        The new Registration, detached from the session; raises
+        DuplicateRegistration if the email or phone number is taken, or
+        IntakeTimeout if the queued registration wasn't written in time
+    """
+    if not current_app.config.get('INTAKE_BATCHING'):
+        return create_registration(name, email, phone_number)
+
+    timeout = current_app.config.get('INTAKE_WAIT_TIMEOUT', 10)
+    future = get_intake_buffer(current_app._get_current_object()).submit(name, email, phone_number)
+    try:
+        row = future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # Still queued: take it off so it is never written
+        if future.cancel():
+            raise IntakeTimeout('Registration was not written in time')
+        # Already being written; give the insert one more timeout to finish
+        try:
+            row = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.error(f"Queued registration for {email} still not written after {2 * timeout}s")
+            raise IntakeTimeout('Registration was not written in time')
+    return Registration(**row)
@@ -0,0 +1,281 @@
+from datetime import datetime
+from threading import Lock
+from flask import current_app
+from sqlalchemy import event
+from app import db
+from app.models.user import Registration
+from app.utils.cache_versions import shared_version, bump_shared_version
+import base64
+import json
+import time
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(sort_key, value, row_id, direction='next'):
+    """Encode a sort position into an opaque, URL-safe cursor token"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort_key, value, row_id, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(token, sort_key):
+    """Decode a cursor token, returning (value, id, direction)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key, value, row_id, direction = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+    if key != sort_key or direction not in ('next', 'prev') or not isinstance(row_id, int):
+        raise InvalidCursor('Cursor does not match this listing')
+
+    if value is not None:
+        try:
+            value = datetime.fromisoformat(value)
+        except (ValueError, TypeError):
+            raise InvalidCursor('Invalid cursor')
+
+    return value, row_id, direction
+
+class KeysetPagination:
+    """A page of results fetched with keyset (cursor) pagination"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def keyset_paginate(query, model, sort_key, cursor=None, per_page=20, descending=True):
+    """
+    Paginate a query on (sort_key, id) without OFFSET or COUNT
+
+    Rows whose sort key is NULL come after every other row newest first, and
+    before them oldest first, which is where MySQL and SQLite sort NULLs.
+
+    Args:
+        query: The filtered query to paginate, without an ORDER BY
+        model: The model whose columns are used as the keyset
+        sort_key: Name of the timestamp column to order by, e.g. 'created_at'
+        cursor: A token from a previous page's next_cursor or prev_cursor
+        per_page: Number of items per page
+        descending: Whether the listing runs newest first
+
+    Returns:
+        A KeysetPagination; raises InvalidCursor for a bad token
+    """
+    sort_column = getattr(model, sort_key)
+    id_column = model.id
+
+    direction = 'next'
+    if cursor:
+        value, row_id, direction = decode_cursor(cursor, sort_key)
+
+        # Walking backwards means fetching the rows on the other side of the cursor
+        after = descending == (direction == 'next')
+        if value is None:
+            # NULL sorts below every value, so only the ids tell NULL rows apart
+            if after:
+                query = query.filter(sort_column.is_(None), id_column < row_id)
+            else:
+                query = query.filter(db.or_(
+                    sort_column.isnot(None),
+                    db.and_(sort_column.is_(None), id_column > row_id)
+                ))
+        elif after:
+            query = query.filter(db.or_(
+                sort_column < value,
+                db.and_(sort_column == value, id_column < row_id),
+                sort_column.is_(None)
+            ))
+        else:
+            query = query.filter(db.or_(
+                sort_column > value,
+                db.and_(sort_column == value, id_column > row_id)
+            ))
+
+    reverse = direction == 'prev'
+    if descending != reverse:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    # Fetch one extra row to find out whether another page follows
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+
+    def position(row, to):
+        return encode_cursor(sort_key, getattr(row, sort_key), row.id, to)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if reverse:
+            next_cursor = position(rows[-1], 'next')
+            prev_cursor = position(rows[0], 'prev') if has_more else None
+        else:
+            next_cursor = position(rows[-1], 'next') if has_more else None
+            prev_cursor = position(rows[0], 'prev') if cursor else None
+
+    return KeysetPagination(rows, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+class OffsetPagination:
+    """
+    A page of results fetched with LIMIT/OFFSET
+
+    Mirrors the parts of Flask-SQLAlchemy's Pagination the templates use. When
+    total is None the page was fetched without a COUNT, and has_next comes from
+    probing for one extra row.
+    """
+
+    def __init__(self, items, page, per_page, has_next, total=None):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self._has_next = has_next
+
+    @property
+    def pages(self):
+        if self.total is None:
+            # Only the pages seen so far, plus the next one if it exists
+            return self.page + 1 if self._has_next else self.page
+        return max((self.total + self.per_page - 1) // self.per_page, 1)
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+    @property
+    def has_next(self):
+        return self._has_next
+
+    @property
+    def prev_num(self):
+        return self.page - 1 if self.has_prev else None
+
+    @property
+    def next_num(self):
+        return self.page + 1 if self.has_next else None
+
+    def iter_pages(self, left_edge=2, left_current=2, right_current=5, right_edge=2):
+        last = 0
+        for num in range(1, self.pages + 1):
+            if num <= left_edge or \
+               (num > self.page - left_current - 1 and num < self.page + right_current) or \
+               num > self.pages - right_edge:
+                if last + 1 != num:
+                    yield None
+                yield num
+                last = num
+
+# Cached COUNT(*) results keyed by SQL and parameters. Entries are dropped when
+# registrations change in this process and expire after COUNT_CACHE_TTL seconds,
+# which bounds how stale a count written by another worker can get. Bulk
+# changes also move the shared 'counts' version, so every worker drops its
+# counts within CACHE_VERSION_INTERVAL.
+_count_cache = {}
+_count_version = 0
+_count_lock = Lock()
+
+def invalidate_counts(shared=False):
+    """
+    Drop every cached count, e.g. after registrations are added or removed
+
+    With shared=True every other worker drops its counts as well; meant for
+    bulk changes, which move counts too far to wait out COUNT_CACHE_TTL.
+    """
+    global _count_version
+    with _count_lock:
+        _count_version += 1
+        _count_cache.clear()
+    if shared:
+        bump_shared_version('counts')
+
+def _count_key(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(sorted((key, repr(value)) for key, value in compiled.params.items()))
+    return str(compiled), params
+
+def cached_count(query):
+    """Return COUNT(*) for a query, reusing a recent result for the same SQL"""
+    ttl = current_app.config.get('COUNT_CACHE_TTL', 60)
+    key = _count_key(query.order_by(None))
+    now = time.monotonic()
+
+    shared = shared_version('counts')
+    with _count_lock:
+        entry = _count_cache.get(key)
+        version = (_count_version, shared)
+    if entry and entry[1] == version and now - entry[2] < ttl:
+        return entry[0]
+
+    total = query.order_by(None).count()
+    with _count_lock:
+        # Don't store a count that raced with an invalidation
+        if version[0] == _count_version:
+            _count_cache[key] = (total, version, now)
+    return total
+
+def estimated_count(model):
+    """
+    Return a cheap estimate of a table's row count
+
+    On MySQL this reads the InnoDB statistics in information_schema, which can
+    be off by a few percent; other databases fall back to a cached exact count.
+    """
+    if db.engine.dialect.name == 'mysql':
+        estimate = db.session.execute(db.text(
+            'SELECT TABLE_ROWS FROM information_schema.TABLES '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table'
+        ), {'table': model.__tablename__}).scalar()
+        if estimate is not None:
+            return int(estimate)
+    return cached_count(model.query)
+
+def paginate(query, page=1, per_page=20, count='cached'):
+    """
+    Paginate an ordered query by offset
+
+    Args:
+        query: The ordered query to paginate
+        page: 1-based page number
+        per_page: Number of items per page
+        count: 'cached' for a cached COUNT(*), 'exact' for a fresh one, or
+            'none' to skip counting and probe for a next page instead
+
+    Returns:
+        An OffsetPagination
+    """
+    page = max(page or 1, 1)
+
+    # Fetch one extra row to find out whether another page follows
+    rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if count == 'none':
+        total = None
+    elif count == 'exact':
+        total = query.order_by(None).count()
+    else:
+        total = cached_count(query)
+
+    return OffsetPagination(rows, page, per_page, has_next, total=total)
+
+@event.listens_for(Registration, 'after_insert')
+@event.listens_for(Registration, 'after_update')
+@event.listens_for(Registration, 'after_delete')
+def _invalidate_counts_on_change(mapper, connection, target):
+    invalidate_counts()
@@ -0,0 +1,228 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from threading import Lock
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+from app.utils.rate_limit import SQLiteStore
+import logging
+import os
+import secrets
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HASH_METHOD = 'pbkdf2:sha256:600000'
+
+class PasswordCheckBusy(Exception):
+    """Raised when a password check couldn't get a hashing slot or finish in time"""
+    pass
+
+def hash_method():
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+    return DEFAULT_HASH_METHOD
+
+def hash_password(password):
+    """Hash a password with the configured PASSWORD_HASH_METHOD"""
+    return generate_password_hash(password, method=hash_method())
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    # The parameters werkzeug records for a method, with its defaults filled in.
+    # Worked out from the method string, since hashing to find them would cost
+    # a full-strength hash outside the node's hashing slots
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = args if args else (2**15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    return method
+
+def needs_rehash(password_hash):
+    """Check if a stored hash was made with different parameters than the configured ones"""
+    return password_hash.split('$', 1)[0] != _method_prefix(hash_method())
+
+class HashSlotStore(SQLiteStore):
+    """
+    Hashing slots shared by every worker on a node, with a FIFO queue
+
+    A token is 'active' while its hash runs and 'waiting' until one of the
+    node's slots frees up. Every token has an expiry, so a slot held by a
+    crashed worker, or a place kept by a login that gave up, is released on
+    its own.
+    """
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS hash_slots ('
+        'seq INTEGER PRIMARY KEY AUTOINCREMENT, token TEXT NOT NULL UNIQUE, '
+        'state TEXT NOT NULL, expires REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS ix_hash_slots_state ON hash_slots (state, seq)',
+    )
+
+    def __init__(self, path, slot_timeout=60, wait_timeout=5):
+        super().__init__(path)
+        self.slot_timeout = slot_timeout
+        self.wait_timeout = wait_timeout
+
+    def acquire(self, workers, queue_size, token=None, now=None):
+        """
+        Take a hashing slot, or a place in the queue for one
+
+        Args:
+            workers: Hashes allowed to run at once on the node
+            queue_size: Tokens allowed to wait
+            token: The token from an earlier call that was queued
+
+        Returns:
+            (token, True) when the slot is taken, (token, False) while queued,
+            or None when the queue is full, or the queued token has expired
+        """
+        now = now or time.time()
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM hash_slots WHERE expires < ?', (now,))
+            active = connection.execute("SELECT COUNT(*) FROM hash_slots WHERE state = 'active'").fetchone()[0]
+
+            if token:
+                row = connection.execute(
+                    "SELECT seq FROM hash_slots WHERE token = ? AND state = 'waiting'", (token,)
+                ).fetchone()
+                if row is None:
+                    return None
+                ahead = connection.execute(
+                    "SELECT COUNT(*) FROM hash_slots WHERE state = 'waiting' AND seq < ?", (row[0],)
+                ).fetchone()[0]
+                if active + ahead < workers:
+                    connection.execute(
+                        "UPDATE hash_slots SET state = 'active', expires = ? WHERE seq = ?",
+                        (now + self.slot_timeout, row[0])
+                    )
+                    return token, True
+                connection.execute('UPDATE hash_slots SET expires = ? WHERE seq = ?', (now + self.wait_timeout, row[0]))
+                return token, False
+
+            waiting = connection.execute("SELECT COUNT(*) FROM hash_slots WHERE state = 'waiting'").fetchone()[0]
+            # Nobody may jump the queue, even when a slot is free
+            if not waiting and active < workers:
+                token = secrets.token_urlsafe(16)
+                connection.execute(
+                    "INSERT INTO hash_slots (token, state, expires) VALUES (?, 'active', ?)",
+                    (token, now + self.slot_timeout)
+                )
+                return token, True
+            if waiting < queue_size:
+                token = secrets.token_urlsafe(16)
+                connection.execute(
+                    "INSERT INTO hash_slots (token, state, expires) VALUES (?, 'waiting', ?)",
+                    (token, now + self.wait_timeout)
+                )
+                return token, False
+            return None
+
+    def release(self, token):
+        """Give back a slot or a place in the queue"""
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM hash_slots WHERE token = ?', (token,))
+
+_store = None
+
+def get_store(app):
+    """Return this process's handle on the node's hashing slots"""
+    global _store
+    if _store is None:
+        path = app.config.get('PASSWORD_HASH_STORAGE') or os.path.join(app.instance_path, 'password_hash.sqlite')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _store = HashSlotStore(path)
+    return _store
+
+# Password hashing is deliberately slow, so it is capped per node rather than
+# per process: at most PASSWORD_HASH_WORKERS hashes at once across every
+# worker, with up to PASSWORD_HASH_QUEUE more waiting in turn. hashlib
+# releases the GIL while hashing, so the rest of the process keeps serving
+# requests meanwhile.
+SLOT_POLL_INTERVAL = 0.05
+
+_executor = None
+_executor_lock = Lock()
+
+def _get_pool(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+    return _executor
+
+def _release(store, token):
+    try:
+        store.release(token)
+    except sqlite3.Error as e:
+        # The slot expires on its own
+        logger.warning(f"Failed to release password hashing slot: {str(e)}")
+
+def _acquire_slot(app, deadline):
+    """
+    Wait in turn for one of the node's hashing slots
+
+    Returns:
+        The slot's token, or None if the slot store is unavailable and the
+        hash runs without one; raises PasswordCheckBusy when the queue is
+        full or the slot didn't free up before deadline
+    """
+    store = get_store(app)
+    workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+    queue_size = app.config.get('PASSWORD_HASH_QUEUE', 8)
+    token = None
+    try:
+        while True:
+            result = store.acquire(workers, queue_size, token=token)
+            if result is None:
+                break
+            token, granted = result
+            if granted:
+                return token
+            if time.monotonic() >= deadline:
+                _release(store, token)
+                break
+            time.sleep(SLOT_POLL_INTERVAL)
+    except sqlite3.Error as e:
+        # Don't lock admins out along with the slot store
+        logger.warning(f"Password hashing slots unavailable, hashing without one: {str(e)}")
+        return None
+
+    logger.warning("Password hashing slots are full, turning request away")
+    raise PasswordCheckBusy('Too many password checks in progress')
+
+def _run(fn, *args):
+    """Run fn on the hashing pool; raises PasswordCheckBusy if it can't finish in time"""
+    app = current_app._get_current_object()
+    timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 5.0)
+    executor = _get_pool(app)
+    token = _acquire_slot(app, time.monotonic() + timeout)
+
+    try:
+        future = executor.submit(fn, *args)
+    except Exception:
+        if token:
+            _release(get_store(app), token)
+        raise
+    if token:
+        store = get_store(app)
+        future.add_done_callback(lambda _: _release(store, token))
+
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        # The hash finishes in the background and frees its slot then
+        logger.warning(f"Password hashing took longer than {timeout}s, turning request away")
+        raise PasswordCheckBusy('Password check timed out')
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash on the hashing pool"""
+    return _run(check_password_hash, password_hash, password)
+
+def rehash_password(password):
+    """Hash a password with the configured method on the hashing pool"""
+    return _run(generate_password_hash, password, hash_method())
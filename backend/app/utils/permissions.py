@@ -0,0 +1,137 @@
+from threading import Lock
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import configure_mappers, object_session
+from app import db
+from app.models.user import Admin, Role, Permission, admin_permissions
+from app.utils.cache_versions import shared_version, bump_shared_version
+import time
+
+ALL_PERMISSIONS = frozenset([
+    Permission.VIEW_DASHBOARD,
+    Permission.VIEW_REGISTRATIONS,
+    Permission.APPROVE_REGISTRATIONS,
+    Permission.REJECT_REGISTRATIONS,
+    Permission.MANAGE_REGISTRATIONS,
+    Permission.CHECK_IN_ATTENDEES,
+    Permission.EXPORT_DATA,
+    Permission.SEND_EMAILS,
+    Permission.MANAGE_ADMINS,
+    Permission.MANAGE_SYSTEM,
+    Permission.VIEW_AUDIT_LOGS,
+    Permission.EXPORT_AUDIT_LOGS,
+])
+
+# Permissions each role grants on top of an admin's direct permissions
+ROLE_PERMISSIONS = {
+    Role.ADMIN: ALL_PERMISSIONS,
+    Role.MANAGER: ALL_PERMISSIONS - {Permission.MANAGE_ADMINS},
+    Role.REGISTRAR: frozenset([
+        Permission.VIEW_DASHBOARD,
+        Permission.VIEW_REGISTRATIONS,
+        Permission.APPROVE_REGISTRATIONS,
+        Permission.REJECT_REGISTRATIONS,
+        Permission.MANAGE_REGISTRATIONS,
+        Permission.SEND_EMAILS,
+    ]),
+    Role.CHECKER: frozenset([
+        Permission.VIEW_DASHBOARD,
+        Permission.VIEW_REGISTRATIONS,
+        Permission.CHECK_IN_ATTENDEES,
+    ]),
+    Role.VIEWER: frozenset([
+        Permission.VIEW_DASHBOARD,
+        Permission.VIEW_REGISTRATIONS,
+    ]),
+}
+
+# Effective permission sets keyed by (admin id, role id). Entries are dropped
+# when roles or permissions change in this process, and when another worker's
+# change moves the shared 'permissions' version, which is checked every
+# CACHE_VERSION_INTERVAL seconds. PERMISSION_CACHE_TTL still expires them in
+# case a change skipped the ORM. A role change on the admin row itself gives a
+# new key, so it applies everywhere on the next request.
+_permission_cache = {}
+_permission_version = 0
+_permission_lock = Lock()
+
+def invalidate_permissions():
+    """Drop every cached permission set, e.g. after roles or permissions change"""
+    global _permission_version
+    with _permission_lock:
+        _permission_version += 1
+        _permission_cache.clear()
+
+def resolve_permissions(admin_id, role_id):
+    """Load an admin's effective permissions from the database"""
+    direct = db.session.query(Permission.name).join(
+        admin_permissions, admin_permissions.c.permission_id == Permission.id
+    ).filter(admin_permissions.c.admin_id == admin_id)
+    permissions = set(name for name, in direct)
+
+    if role_id is not None:
+        role = db.session.get(Role, role_id)
+        if role:
+            permissions |= ROLE_PERMISSIONS.get(role.name, frozenset())
+    return frozenset(permissions)
+
+def _cached_permissions(key):
+    ttl = current_app.config.get('PERMISSION_CACHE_TTL', 300) if has_app_context() else 0
+    shared = shared_version('permissions') if has_app_context() else 0
+    now = time.monotonic()
+
+    with _permission_lock:
+        entry = _permission_cache.get(key)
+        version = (_permission_version, shared)
+    if entry and entry[1] == version and now - entry[2] < ttl:
+        return entry[0]
+
+    permissions = resolve_permissions(*key)
+    with _permission_lock:
+        # Don't store a set that raced with an invalidation
+        if version[0] == _permission_version:
+            _permission_cache[key] = (permissions, version, now)
+    return permissions
+
+def permission_set(admin):
+    """
+    Return an admin's effective permissions as a frozenset
+
+    Resolved at most once per request and served from the process cache after
+    that, so checking a permission normally issues no queries.
+    """
+    key = (admin.id, admin.role_id)
+    if not has_request_context():
+        return _cached_permissions(key)
+
+    memo = g.setdefault('permission_sets', {})
+    if key not in memo:
+        memo[key] = _cached_permissions(key)
+    return memo[key]
+
+def _permissions_changed(mapper, connection, target):
+    invalidate_permissions()
+    # Bumped in the same transaction, so other workers see it once it commits
+    bump_shared_version('permissions', connection)
+
+def _admin_permissions_changed(target, *args):
+    invalidate_permissions()
+    # The association rows are written on flush, so bump when the session commits
+    session = object_session(target)
+    if session is not None:
+        session.info['permissions_changed'] = True
+
+@event.listens_for(db.session, 'before_commit')
+def _share_admin_permission_changes(session):
+    if session.info.pop('permissions_changed', False):
+        bump_shared_version('permissions', session.connection())
+
+for _model in (Role, Permission):
+    event.listen(_model, 'after_insert', _permissions_changed)
+    event.listen(_model, 'after_update', _permissions_changed)
+    event.listen(_model, 'after_delete', _permissions_changed)
+
+# Admin.permissions is a backref, which only exists once the mappers are configured
+configure_mappers()
+event.listen(Admin.permissions, 'append', _admin_permissions_changed)
+event.listen(Admin.permissions, 'remove', _admin_permissions_changed)
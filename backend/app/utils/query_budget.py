@@ -0,0 +1,53 @@
+from functools import wraps
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import logging
+
+logger = logging.getLogger(__name__)
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a view runs more SQL statements than allowed"""
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and not conn.get_execution_options().get('query_budget_exempt'):
+        g.query_count = g.get('query_count', 0) + 1
+
+def query_count():
+    """Return the number of SQL statements run so far in this app context"""
+    return g.get('query_count', 0)
+
+def query_budget(max_queries):
+    """
+    Decorator that caps how many SQL statements a view may run
+
+    Only statements run inside the view body are counted, not those from
+    login or permission checks. Going over the budget logs a warning, or raises
+    QueryBudgetExceeded when QUERY_BUDGET_STRICT or TESTING is set, so an N+1
+    regression fails loudly in tests. Statements run while a streamed response
+    body is generated happen after the view returns and are not counted, nor
+    are those on connections with the query_budget_exempt execution option.
+
+    Usage:
+        @admin_bp.route('/export')
+        @login_required
+        @query_budget(2)
+        def export():
+            pass
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            before = query_count()
+            response = f(*args, **kwargs)
+            used = query_count() - before
+
+            if used > max_queries:
+                message = f"{request.endpoint} ran {used} queries, budget is {max_queries}"
+                if current_app.config.get('QUERY_BUDGET_STRICT') or current_app.config.get('TESTING'):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        return decorated_function
+    return decorator
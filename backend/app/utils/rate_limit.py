@@ -0,0 +1,166 @@
+from contextlib import contextmanager
+from threading import local
+from flask import current_app, jsonify, request
+import logging
+import math
+import os
+import random
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+# Endpoints mapped to (requests allowed, per seconds, methods limited or None for all).
+# RATE_LIMITS in the config can override any of these or add new ones.
+RATE_LIMIT_POLICIES = {
+    'main.register': (10, 60, None),
+    'main.upload_receipt': (10, 60, None),
+    'main.check_status': (60, 60, None),
+    # The registration form checks availability as the visitor types
+    'main.verify_email': (120, 60, None),
+    'main.verify_phone': (120, 60, None),
+    'api.register': (10, 60, None),
+    'api.upload_receipt': (10, 60, None),
+    'api.check_status': (60, 60, None),
+    'auth.login': (10, 60, ('POST',)),
+}
+
+class SQLiteStore:
+    """
+    Small SQLite database shared by every worker on a node
+
+    WAL mode lets workers read while another writes. Each thread keeps its own
+    connection; subclasses list the statements creating their tables in SCHEMA.
+    """
+    SCHEMA = ()
+
+    def __init__(self, path):
+        self.path = path
+        self._local = local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        """Yield the connection inside a write transaction, committed on success"""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+class SlidingWindowStore(SQLiteStore):
+    """
+    Sliding-window request counters
+
+    Each key keeps a counter for the current and the previous fixed window; the
+    previous one is weighted by how much of it still overlaps the sliding
+    window, so a key needs two rows however busy it is.
+    """
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS rate_limits ('
+        'key TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, '
+        'PRIMARY KEY (key, bucket))',
+    )
+
+    def hit(self, key, limit, period, now=None):
+        """
+        Count a request against key unless that would go over limit per period
+
+        Returns:
+            0 if the request is allowed, otherwise the seconds to wait before retrying
+        """
+        now = now or time.time()
+        window = int(now // period)
+        elapsed = now - window * period
+
+        with self._transaction() as connection:
+            counts = dict(connection.execute(
+                'SELECT bucket, count FROM rate_limits WHERE key = ? AND bucket IN (?, ?)',
+                (key, window - 1, window)
+            ).fetchall())
+            previous = counts.get(window - 1, 0)
+            current = counts.get(window, 0)
+            weight = 1 - elapsed / period
+
+            if previous * weight + current >= limit:
+                if current >= limit or previous == 0:
+                    wait = period - elapsed
+                else:
+                    # When the previous window's share will have shrunk enough
+                    wait = period * (1 - (limit - current) / previous) - elapsed
+                return max(1, math.ceil(wait))
+
+            connection.execute(
+                'INSERT INTO rate_limits (key, bucket, count) VALUES (?, ?, 1) '
+                'ON CONFLICT (key, bucket) DO UPDATE SET count = count + 1',
+                (key, window)
+            )
+
+        # Now and then drop counters no sliding window can reach any more
+        if random.random() < 0.01:
+            connection.execute('DELETE FROM rate_limits WHERE bucket < ?', (window - 1,))
+        return 0
+
+_store = None
+
+def get_store(app):
+    """Return this process's rate limit store"""
+    global _store
+    if _store is None:
+        path = app.config.get('RATE_LIMIT_STORAGE') or os.path.join(app.instance_path, 'ratelimit.sqlite')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _store = SlidingWindowStore(path)
+    return _store
+
+def _policy(endpoint):
+    policy = current_app.config.get('RATE_LIMITS', {}).get(endpoint) or RATE_LIMIT_POLICIES.get(endpoint)
+    if policy is None:
+        return None
+    limit, period, methods = (tuple(policy) + (None,))[:3]
+    if methods and request.method not in methods:
+        return None
+    return limit, period
+
+def check_rate_limit():
+    """Turn away a request over its endpoint's policy with a 429, before the view runs"""
+    if not current_app.config.get('RATE_LIMIT_ENABLED', True) or request.endpoint is None:
+        return None
+
+    policy = _policy(request.endpoint)
+    if policy is None:
+        return None
+
+    limit, period = policy
+    key = f"{request.endpoint}:{request.remote_addr}"
+    try:
+        retry_after = get_store(current_app).hit(key, limit, period)
+    except sqlite3.Error as e:
+        # Don't take the endpoint down with the limiter
+        logger.warning(f"Rate limit store unavailable, allowing request: {str(e)}")
+        return None
+
+    if not retry_after:
+        return None
+
+    logger.warning(f"Rate limited {request.remote_addr} on {request.endpoint}")
+    response = jsonify({'error': 'Too many requests. Please try again later.', 'retry_after': retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def init_app(app):
+    """Apply the rate limit policies ahead of every request"""
+    app.before_request(check_rate_limit)
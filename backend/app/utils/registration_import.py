@@ -0,0 +1,125 @@
+from app.models.user import Registration, RegistrationStatus
+from app.utils.availability import normalise_email, normalise_phone
+from app.utils.intake import insert_registrations, DuplicateRegistration
+import csv
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Registration fields mapped to the CSV headers accepted for them
+IMPORT_COLUMNS = {
+    'name': ('name', 'full_name', 'full name'),
+    'email': ('email', 'email_address', 'email address'),
+    'phone_number': ('phone_number', 'phone', 'phone number'),
+}
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+PHONE_PATTERN = re.compile(r'^\+?\d{6,}$')
+
+def _column_map(fieldnames):
+    """Map each registration field to the CSV header that holds it"""
+    headers = {(header or '').strip().lower(): header for header in fieldnames or []}
+    columns = {}
+    for field, aliases in IMPORT_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[field] = headers[alias]
+                break
+        else:
+            raise ValueError(f"CSV has no column for {field} (expected one of: {', '.join(aliases)})")
+    return columns
+
+def normalise_row(row, columns):
+    """
+    Clean up one CSV row
+
+    Returns:
+        (name, email, phone_number), or a string saying why the row was skipped
+    """
+    table = Registration.__table__
+    name = ' '.join((row.get(columns['name']) or '').split())
+    email = (row.get(columns['email']) or '').strip().lower()
+    # Stored the same way as phone numbers registered through the site
+    phone = normalise_phone(row.get(columns['phone_number']))
+
+    if not name or not email or not phone:
+        return 'missing required fields'
+    if not EMAIL_PATTERN.match(email):
+        return 'invalid email'
+    if not PHONE_PATTERN.match(phone):
+        return 'invalid phone number'
+    for field, value in (('name', name), ('email', email), ('phone_number', phone)):
+        if len(value) > table.c[field].type.length:
+            return f'{field} too long'
+    return name, email, phone
+
+def import_registrations(lines, batch_size=500, status=RegistrationStatus.PENDING_PAYMENT,
+                         on_batch=None, on_skip=None):
+    """
+    Import registrations from CSV without loading the whole file
+
+    Rows are validated and normalised as they are read, then written in
+    batches through insert_registrations: one query finds which emails and
+    phone numbers are already taken and the rest go in with one INSERT per
+    batch. Rows repeating an email or phone number from earlier in the file
+    are skipped before they reach the database.
+
+    Args:
+        lines: An open CSV file or any iterable of lines, with a header row
+        batch_size: Rows written per INSERT
+        status: The RegistrationStatus imported registrations start in
+        on_batch: Called with (inserted row dicts, totals) after each batch
+        on_skip: Called with (line number, reason) for every skipped row
+
+    Returns:
+        Totals of rows 'imported', 'duplicate' and 'invalid'
+    """
+    reader = csv.DictReader(lines)
+    columns = _column_map(reader.fieldnames)
+    totals = {'imported': 0, 'duplicate': 0, 'invalid': 0}
+    seen_emails, seen_phones = set(), set()
+    batch = []
+
+    def skip(line, reason, kind):
+        totals[kind] += 1
+        if on_skip:
+            on_skip(line, reason)
+
+    def flush():
+        results = insert_registrations([entry for _, entry in batch], status=status)
+        inserted = []
+        for (line, _), result in zip(batch, results):
+            if isinstance(result, DuplicateRegistration):
+                skip(line, result.message, 'duplicate')
+            elif isinstance(result, Exception):
+                skip(line, str(result), 'invalid')
+            else:
+                inserted.append(result)
+        totals['imported'] += len(inserted)
+        batch.clear()
+        if on_batch:
+            on_batch(inserted, totals)
+
+    for row in reader:
+        entry = normalise_row(row, columns)
+        if isinstance(entry, str):
+            skip(reader.line_num, entry, 'invalid')
+            continue
+
+        _, email, phone = entry
+        if normalise_email(email) in seen_emails or normalise_phone(phone) in seen_phones:
+            skip(reader.line_num, 'repeated earlier in the file', 'duplicate')
+            continue
+        seen_emails.add(normalise_email(email))
+        seen_phones.add(normalise_phone(phone))
+
+        batch.append((reader.line_num, entry))
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    logger.info(f"Imported {totals['imported']} registrations, skipped {totals['duplicate']} duplicate "
+                f"and {totals['invalid']} invalid rows")
+    return totals
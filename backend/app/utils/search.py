@@ -0,0 +1,258 @@
+from sqlalchemy import event
+from app import db
+from app.models.user import Registration
+import re
+import unicodedata
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Table holding one normalised search document per registration. On MySQL it is
+# a regular table with a FULLTEXT index, on SQLite an FTS5 virtual table keyed
+# by rowid. It is created by migration or `flask rebuild-search-index`.
+SEARCH_TABLE = 'registration_search'
+
+# InnoDB ignores words shorter than innodb_ft_min_token_size (3 by default), so
+# shorter words in a search term are matched with LIKE on every backend
+MIN_TOKEN_LENGTH = 3
+
+# InnoDB's default full-text stopwords, which it doesn't index either; a
+# required +com* would match nothing, so they are matched with LIKE on MySQL
+INNODB_STOPWORDS = frozenset([
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i', 'in',
+    'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when', 'where', 'who',
+    'will', 'with', 'und', 'www',
+])
+
+# National numbers are matched on their last nine digits, so a phone number
+# typed with or without its country code or trunk prefix still matches
+PHONE_SUFFIX_LENGTH = 9
+
+_WORD_RE = re.compile(r'[^\W_]+', re.UNICODE)
+_PHONE_RE = re.compile(r'^[\d\s()+.-]+$')
+
+_SQL = {
+    'mysql': {
+        'create': [
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            'registration_id INTEGER NOT NULL PRIMARY KEY, '
+            'document TEXT NOT NULL, '
+            'FULLTEXT INDEX ix_registration_search_document (document), '
+            'FOREIGN KEY (registration_id) REFERENCES registrations (id) ON DELETE CASCADE'
+            ') ENGINE=InnoDB',
+        ],
+        'delete': f'DELETE FROM {SEARCH_TABLE} WHERE registration_id = :id',
+        'insert': f'INSERT INTO {SEARCH_TABLE} (registration_id, document) VALUES (:id, :document)',
+        'match': f'SELECT registration_id FROM {SEARCH_TABLE} '
+                 'WHERE MATCH(document) AGAINST (:query IN BOOLEAN MODE)',
+    },
+    'sqlite': {
+        'create': [
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} '
+            "USING fts5(document, tokenize='unicode61 remove_diacritics 2')",
+        ],
+        'delete': f'DELETE FROM {SEARCH_TABLE} WHERE rowid = :id',
+        'insert': f'INSERT INTO {SEARCH_TABLE} (rowid, document) VALUES (:id, :document)',
+        'match': f'SELECT rowid AS registration_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :query',
+    },
+}
+
+# Whether the search table exists, checked once per process
+_index_available = None
+
+def _fold(value):
+    """Lowercase a string and strip accents"""
+    value = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in value if not unicodedata.combining(c)).lower()
+
+def normalize_phone(phone):
+    """Reduce a phone number to its digits"""
+    return ''.join(c for c in (phone or '') if c.isdigit())
+
+def tokenize(value):
+    """Split free text into lowercase, accent-free word tokens"""
+    return _WORD_RE.findall(_fold(value))
+
+def build_search_document(name, email, phone_number):
+    """Build the indexed document for a registration's name, email and phone"""
+    tokens = tokenize(name)
+
+    # The email is indexed both as its parts and as the whole local part
+    email = _fold(email)
+    local, _, domain = email.partition('@')
+    tokens.extend(tokenize(local))
+    tokens.append(''.join(tokenize(local)))
+    tokens.extend(tokenize(domain))
+
+    digits = normalize_phone(phone_number)
+    if digits:
+        tokens.append(digits)
+        if len(digits) > PHONE_SUFFIX_LENGTH:
+            tokens.append(digits[-PHONE_SUFFIX_LENGTH:])
+
+    # Keep the order stable but drop duplicates
+    return ' '.join(dict.fromkeys(t for t in tokens if t))
+
+def _query_groups(term, dialect):
+    """
+    Split a search term into what the full-text index can match and what it can't
+
+    Returns groups of alternative prefixes, every group required, and the
+    words the index doesn't hold.
+    """
+    if _PHONE_RE.match(term) and sum(c.isdigit() for c in term) >= MIN_TOKEN_LENGTH:
+        digits = normalize_phone(term)
+        # A leading trunk zero is not stored in the nine-digit suffix
+        alternatives = [digits]
+        if digits.startswith('0') and len(digits) > MIN_TOKEN_LENGTH:
+            alternatives.append(digits[1:])
+        return [alternatives], []
+
+    stopwords = INNODB_STOPWORDS if dialect == 'mysql' else frozenset()
+    groups, unmatched = [], []
+    for token in tokenize(term):
+        if len(token) < MIN_TOKEN_LENGTH or token in stopwords:
+            unmatched.append(token)
+        else:
+            groups.append([token])
+    return groups, unmatched
+
+def build_match_query(term, dialect):
+    """
+    Build a prefix-matching full-text query for a search term
+
+    Returns the query, or None if nothing in the term is indexable, and the
+    words left out of it.
+    """
+    groups, unmatched = _query_groups(term, dialect)
+    if not groups:
+        return None, unmatched
+
+    if dialect == 'mysql':
+        return ' '.join('+(' + ' '.join(f'{t}*' for t in group) + ')' for group in groups), unmatched
+    return ' AND '.join('(' + ' OR '.join(f'"{t}"*' for t in group) + ')' for group in groups), unmatched
+
+def _contains(text):
+    """Match registrations whose name, email or phone number contains text"""
+    pattern = f"%{text}%"
+    return db.or_(
+        Registration.name.ilike(pattern),
+        Registration.email.ilike(pattern),
+        Registration.phone_number.ilike(pattern)
+    )
+
+def _statements(connection):
+    return _SQL.get(connection.dialect.name)
+
+def search_index_available(connection=None):
+    """Check whether the search table exists on this database"""
+    global _index_available
+    if _index_available is None:
+        connection = connection or db.session.connection()
+        _index_available = bool(_statements(connection)) and \
+            db.inspect(connection).has_table(SEARCH_TABLE)
+    return _index_available
+
+def apply_search(query, term):
+    """
+    Filter a Registration query by a free-text search term
+
+    Uses the full-text index when it exists and the term is indexable, with
+    LIKE for any words the index doesn't hold, and otherwise falls back to a
+    LIKE scan over name, email and phone number.
+    """
+    term = (term or '').strip()
+    if not term:
+        return query
+
+    connection = db.session.connection()
+    if search_index_available(connection):
+        match_query, unmatched = build_match_query(term, connection.dialect.name)
+        if match_query:
+            matches = db.text(_statements(connection)['match'])\
+                .bindparams(query=match_query)\
+                .columns(registration_id=db.Integer)\
+                .subquery()
+            query = query.filter(Registration.id.in_(db.select(matches.c.registration_id)))
+            # Words the index doesn't hold are still required
+            for word in unmatched:
+                query = query.filter(_contains(word))
+            return query
+
+    return query.filter(_contains(term))
+
+def index_registration(connection, registration_id, name, email, phone_number):
+    """Insert or replace the search document for one registration"""
+    statements = _statements(connection)
+    connection.execute(db.text(statements['delete']), {'id': registration_id})
+    connection.execute(db.text(statements['insert']), {
+        'id': registration_id,
+        'document': build_search_document(name, email, phone_number)
+    })
+
+def index_new_registrations(connection, rows):
+    """Add search documents for newly inserted registrations in one batch"""
+    connection.execute(db.text(_statements(connection)['insert']), [
+        {'id': row['id'], 'document': build_search_document(row['name'], row['email'], row['phone_number'])}
+        for row in rows
+    ])
+
+def unindex_registration(connection, registration_id):
+    """Remove a registration from the search index"""
+    connection.execute(db.text(_statements(connection)['delete']), {'id': registration_id})
+
+def unindex_registrations(connection, registration_ids):
+    """Remove a batch of registrations from the search index"""
+    connection.execute(db.text(_statements(connection)['delete']), [
+        {'id': registration_id} for registration_id in registration_ids
+    ])
+
+def rebuild_search_index(batch_size=1000):
+    """Create the search table if needed and re-index every registration"""
+    global _index_available
+    connection = db.session.connection()
+    statements = _statements(connection)
+    if not statements:
+        raise RuntimeError(f'Full-text search is not supported on {connection.dialect.name}')
+
+    for statement in statements['create']:
+        connection.execute(db.text(statement))
+    connection.execute(db.text(f'DELETE FROM {SEARCH_TABLE}'))
+
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.session.query(Registration.id, Registration.name, Registration.email, Registration.phone_number)\
+            .filter(Registration.id > last_id)\
+            .order_by(Registration.id)\
+            .limit(batch_size)\
+            .all()
+        if not rows:
+            break
+        connection.execute(db.text(statements['insert']), [
+            {'id': row.id, 'document': build_search_document(row.name, row.email, row.phone_number)}
+            for row in rows
+        ])
+        count += len(rows)
+        last_id = rows[-1].id
+
+    db.session.commit()
+    _index_available = True
+    return count
+
+@event.listens_for(Registration, 'after_insert')
+def _index_after_insert(mapper, connection, target):
+    if search_index_available(connection):
+        index_registration(connection, target.id, target.name, target.email, target.phone_number)
+
+@event.listens_for(Registration, 'after_update')
+def _index_after_update(mapper, connection, target):
+    state = db.inspect(target)
+    changed = any(state.attrs[key].history.has_changes() for key in ('name', 'email', 'phone_number'))
+    if changed and search_index_available(connection):
+        index_registration(connection, target.id, target.name, target.email, target.phone_number)
+
+@event.listens_for(Registration, 'after_delete')
+def _unindex_after_delete(mapper, connection, target):
+    if search_index_available(connection):
+        unindex_registration(connection, target.id)
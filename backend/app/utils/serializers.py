@@ -0,0 +1,85 @@
+from app import db
+from app.models.user import Registration, CheckIn
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def _datetime_str(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+def _enum_value(value):
+    return value.value if value else None
+
+class RowSerializer:
+    """
+    Select only the columns an endpoint needs and map the rows to dicts
+
+    Each field is a (key, column, formatter) tuple. The columns are labelled
+    with their keys, so the selected rows can also be handed to templates, and
+    the key/formatter plan is built once rather than per row.
+    """
+
+    def __init__(self, fields, constants=None):
+        self.keys = tuple(key for key, _, _ in fields)
+        self.columns = tuple(column.label(key) for key, column, _ in fields)
+        self._plan = tuple((key, index, formatter) for index, (key, _, formatter) in enumerate(fields))
+        self._constants = dict(constants or {})
+
+    def select(self, query):
+        """Restrict a query to this serializer's columns, returning tuple rows"""
+        return query.with_entities(*self.columns)
+
+    def dump(self, row):
+        """Convert one selected row to a JSON-ready dict"""
+        data = {key: (formatter(row[index]) if formatter else row[index]) for key, index, formatter in self._plan}
+        if self._constants:
+            data.update(self._constants)
+        return data
+
+    def dump_all(self, rows):
+        """Convert a list of selected rows to JSON-ready dicts"""
+        return [self.dump(row) for row in rows]
+
+# True when the registration is flagged as checked in or has a check-in record,
+# computed in SQL instead of lazy-loading check_ins for every row
+registration_checked_in = db.or_(
+    Registration.checked_in == True,
+    db.exists().where(CheckIn.registration_id == Registration.id)
+)
+
+# Same shape as Registration.to_dict(), for the JSON API
+REGISTRATION_API = RowSerializer([
+    ('id', Registration.id, None),
+    ('name', Registration.name, None),
+    ('email', Registration.email, None),
+    ('phone_number', Registration.phone_number, None),
+    ('receipt_url', Registration.receipt_url, None),
+    ('status', Registration.status, _enum_value),
+    ('qr_code', Registration.qr_code, None),
+    ('created_at', Registration.created_at, _isoformat),
+    ('updated_at', Registration.updated_at, _isoformat),
+    ('checked_in', registration_checked_in, bool),
+])
+
+# Rows for the DataTables registrations endpoint
+REGISTRATION_DATATABLES = RowSerializer([
+    ('id', Registration.id, None),
+    ('name', Registration.name, None),
+    ('email', Registration.email, None),
+    ('phone_number', Registration.phone_number, None),
+    ('status', Registration.status, _enum_value),
+    ('created_at', Registration.created_at, _datetime_str),
+    ('checked_in', registration_checked_in, bool),
+], constants={'actions': ''})  # Placeholder for action buttons
+
+# Columns the registrations list template reads, without receipt_url
+REGISTRATION_LIST = RowSerializer([
+    ('id', Registration.id, None),
+    ('name', Registration.name, None),
+    ('email', Registration.email, None),
+    ('phone_number', Registration.phone_number, None),
+    ('status', Registration.status, None),
+    ('created_at', Registration.created_at, None),
+    ('updated_at', Registration.updated_at, None),
+    ('checked_in', registration_checked_in, bool),
+])
@@ -12,6 +12,95 @@ class Config:
     QR_CODE_FOLDER = os.environ.get('QR_CODE_FOLDER', 'app/static/qrcodes')
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 5 * 1024 * 1024))  # 5MB default
     
+    # Seconds between checks of the cache versions workers share, i.e. how long a
+    # change made by another worker can take to reach this one's caches
+    CACHE_VERSION_INTERVAL = float(os.environ.get('CACHE_VERSION_INTERVAL', 2))
+    
+    # Seconds cached counts for closed histogram buckets may be reused for
+    HISTOGRAM_CACHE_TTL = int(os.environ.get('HISTOGRAM_CACHE_TTL', 3600))
+    
+    # Seconds a cached listing COUNT(*) may be reused for
+    COUNT_CACHE_TTL = int(os.environ.get('COUNT_CACHE_TTL', 60))
+    
+    # Seconds an admin's resolved permission set may be reused for; changes made
+    # through the app reach every worker within CACHE_VERSION_INTERVAL anyway
+    PERMISSION_CACHE_TTL = int(os.environ.get('PERMISSION_CACHE_TTL', 300))
+    
+    # Seconds the user loader may reuse an admin's cached snapshot for; changes made
+    # through the app reach every worker within CACHE_VERSION_INTERVAL anyway
+    ADMIN_CACHE_TTL = int(os.environ.get('ADMIN_CACHE_TTL', 60))
+    
+    # Password hashing; stored hashes made with other parameters are upgraded at login.
+    # At most PASSWORD_HASH_WORKERS hashes run at once across every worker on the node,
+    # with PASSWORD_HASH_QUEUE more logins waiting in turn. A login waiting or hashing
+    # for longer than PASSWORD_HASH_TIMEOUT seconds gets a 503
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5.0))
+    PASSWORD_HASH_STORAGE = os.environ.get('PASSWORD_HASH_STORAGE')  # Defaults to instance/password_hash.sqlite
+    
+    # Per-client rate limits on public and login endpoints, counted in a SQLite file
+    # shared by every worker on the node (defaults to instance/ratelimit.sqlite)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+    RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE')
+    
+    # Number of reverse proxies in front of the app appending to X-Forwarded-For;
+    # clients are known by the address the outermost of them saw. Off by default,
+    # since trusting the header when the app is reached directly lets clients pick
+    # their own address; set it to the number of proxies when deployed behind them
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+    
+    # In-memory set of registered emails and phones that answers most availability
+    # checks without a query; rows from other workers are picked up every
+    # REGISTRATION_FILTER_SYNC_INTERVAL seconds
+    REGISTRATION_FILTER_ENABLED = os.environ.get('REGISTRATION_FILTER_ENABLED', 'True').lower() == 'true'
+    REGISTRATION_FILTER_SYNC_INTERVAL = int(os.environ.get('REGISTRATION_FILTER_SYNC_INTERVAL', 5))
+    
+    # Group-commit intake: queue registrations per worker and insert them together
+    # every INTAKE_FLUSH_INTERVAL seconds, trading a few ms of latency for throughput.
+    # Only pays off with threaded workers (gunicorn --threads / gthread). A request
+    # whose registration isn't written within INTAKE_WAIT_TIMEOUT seconds gets a 503
+    INTAKE_BATCHING = os.environ.get('INTAKE_BATCHING', 'False').lower() == 'true'
+    INTAKE_FLUSH_INTERVAL = float(os.environ.get('INTAKE_FLUSH_INTERVAL', 0.005))
+    INTAKE_BATCH_SIZE = int(os.environ.get('INTAKE_BATCH_SIZE', 200))
+    INTAKE_WAIT_TIMEOUT = float(os.environ.get('INTAKE_WAIT_TIMEOUT', 10))
+    
+    # Waiting room for registration and receipt uploads: requests over a room's
+    # concurrency cap get a ticket to poll, and a 503 once the queue is full too.
+    # Off by default, since queued requests get a 202 that only clients which poll
+    # /waiting-room/<token> understand
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', 'False').lower() == 'true'
+    ADMISSION_STORAGE = os.environ.get('ADMISSION_STORAGE')  # Defaults to instance/admission.sqlite
+    ADMISSION_POLL_INTERVAL = int(os.environ.get('ADMISSION_POLL_INTERVAL', 2))
+    ADMISSION_SLOT_TIMEOUT = int(os.environ.get('ADMISSION_SLOT_TIMEOUT', 60))  # Seconds before a stuck slot is freed
+    ADMISSION_WAIT_TIMEOUT = int(os.environ.get('ADMISSION_WAIT_TIMEOUT', 30))  # Seconds a ticket lives without a poll
+    ADMISSION_GRACE = int(os.environ.get('ADMISSION_GRACE', 30))  # Seconds an admitted client has to come back
+    
+    # Rows changed per transaction by bulk admin operations, keeping row locks short
+    BULK_CHUNK_SIZE = int(os.environ.get('BULK_CHUNK_SIZE', 500))
+    
+    # Raise instead of logging when a view goes over its @query_budget
+    QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'False').lower() == 'true'
+    
+    # Background export jobs; files default to instance/exports
+    EXPORT_FOLDER = os.environ.get('EXPORT_FOLDER')
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 2))
+    EXPORT_JOB_TIMEOUT = int(os.environ.get('EXPORT_JOB_TIMEOUT', 30 * 60))  # Seconds before a stuck job is restarted
+    EXPORT_RETENTION = int(os.environ.get('EXPORT_RETENTION', 24 * 60 * 60))  # Seconds finished exports are kept
+    
+    # Seconds delta exports hold back recent changes, so late commits aren't skipped
+    CHANGES_SAFETY_LAG = int(os.environ.get('CHANGES_SAFETY_LAG', 5))
+    
+    # In-memory buffer for high-volume audit entries such as check-ins; up to
+    # AUDIT_FLUSH_INTERVAL seconds of entries can be lost if a worker crashes
+    AUDIT_BUFFER_ENABLED = os.environ.get('AUDIT_BUFFER_ENABLED', 'True').lower() == 'true'
+    AUDIT_BUFFER_SIZE = int(os.environ.get('AUDIT_BUFFER_SIZE', 10000))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 2.0))
+    
+    # Days of audit history kept in audit_logs before archive-audit-logs moves it
+    AUDIT_RETENTION_DAYS = int(os.environ.get('AUDIT_RETENTION_DAYS', 180))
+    
     # Email configuration
     MAIL_SERVER = os.environ.get('MAIL_SERVER')
     MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
@@ -0,0 +1,109 @@
+import os
+import tempfile
+
+# Config is read when the config module is imported, so point it at a scratch
+# SQLite database and instance files before the app is loaded
+_scratch = tempfile.mkdtemp(prefix='sod-tests-')
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ['MAIL_SUPPRESS_SEND'] = 'true'
+os.environ['RATE_LIMIT_STORAGE'] = os.path.join(_scratch, 'ratelimit.sqlite')
+os.environ['ADMISSION_STORAGE'] = os.path.join(_scratch, 'admission.sqlite')
+os.environ['PASSWORD_HASH_STORAGE'] = os.path.join(_scratch, 'password_hash.sqlite')
+os.environ['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+import pytest
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import Admin, Role
+from app.utils import search
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app()
+    app.config.update(
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        RATE_LIMIT_ENABLED=False,
+        ADMISSION_ENABLED=False,
+        CACHE_VERSION_INTERVAL=0,
+    )
+    return app
+
+def _reset_process_caches():
+    from app.utils import availability, cache_versions, histogram
+    from app.utils.admin_cache import invalidate_admin
+    from app.utils.pagination import invalidate_counts
+    from app.utils.permissions import invalidate_permissions
+
+    invalidate_counts()
+    invalidate_permissions()
+    invalidate_admin()
+    histogram._closed_buckets.clear()
+    availability._contacts.__init__()
+    cache_versions._versions = {}
+    cache_versions._checked = None
+    search._index_available = None
+
+@pytest.fixture(autouse=True)
+def database(app):
+    """Give every test empty tables and cold per-process caches"""
+    with app.app_context():
+        db.drop_all()
+        # The search table isn't part of the models' metadata
+        db.session.execute(db.text(f'DROP TABLE IF EXISTS {search.SEARCH_TABLE}'))
+        db.session.commit()
+        db.create_all()
+        _reset_process_caches()
+        yield db
+        db.session.remove()
+
+@pytest.fixture
+def admin(database):
+    role = Role(name=Role.ADMIN, description='Full access to all features')
+    admin = Admin(email='admin@example.com', role=role)
+    admin.set_password('password')
+    db.session.add_all([role, admin])
+    db.session.commit()
+    return admin
+
+@pytest.fixture
+def admin_client(app, admin):
+    """A test client signed in as an admin with every permission"""
+    client = app.test_client()
+    response = client.post('/auth/login', data={'email': 'admin@example.com', 'password': 'password'})
+    assert response.status_code == 302
+    return client
+
+@pytest.fixture
+def make_registrations(database):
+    """Insert count registrations through the batched intake path and return their rows"""
+    from app.utils.intake import insert_registrations
+
+    created = [0]
+
+    def make(count, **fields):
+        first = created[0]
+        created[0] += count
+        entries = [
+            (f'Attendee {i}', f'attendee{i}@example.com', f'0240{i:06d}')
+            for i in range(first, first + count)
+        ]
+        rows = insert_registrations(entries, **fields)
+        assert not any(isinstance(row, Exception) for row in rows)
+        return rows
+
+    return make
+
+@pytest.fixture
+def count_queries(database):
+    """Return a callable giving the number of SQL statements run since the test started"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        # Counted the way query budgets count them
+        if not conn.get_execution_options().get('query_budget_exempt'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield lambda: len(statements)
+    event.remove(db.engine, 'before_cursor_execute', record)
@@ -0,0 +1,127 @@
+"""
+Print the query plans of the hot admin queries.
+
+Run it before and after `flask db upgrade` to show that the indexes are used:
+
+    python explain_hot_queries.py --save plans_before.json
+    flask db upgrade
+    python explain_hot_queries.py --compare plans_before.json
+"""
+
+import json
+import sys
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models.user import Registration, RegistrationStatus, CheckIn, AuditLog
+
+def hot_queries():
+    """Build the queries the admin routes run most, keyed by a short name"""
+    now = datetime.utcnow()
+    week_ago = now - timedelta(days=7)
+
+    return {
+        # registrations() with a status filter, newest first
+        'registrations_by_status': db.select(Registration)
+            .where(Registration.status == RegistrationStatus.CONFIRMED)
+            .order_by(Registration.created_at.desc(), Registration.id.desc())
+            .limit(21),
+        # registrations() without a status filter
+        'registrations_all': db.select(Registration)
+            .order_by(Registration.created_at.desc(), Registration.id.desc())
+            .limit(21),
+        # A deep keyset page of registrations()
+        'registrations_keyset_page': db.select(Registration)
+            .where(Registration.status == RegistrationStatus.CONFIRMED)
+            .where(db.or_(
+                Registration.created_at < week_ago,
+                db.and_(Registration.created_at == week_ago, Registration.id < 1000)
+            ))
+            .order_by(Registration.created_at.desc(), Registration.id.desc())
+            .limit(21),
+        # pending_verifications()
+        'pending_verifications': db.select(Registration)
+            .where(Registration.status == RegistrationStatus.PENDING_VERIFICATION)
+            .order_by(Registration.updated_at.desc(), Registration.id.desc())
+            .limit(21),
+        # Dashboard counters
+        'dashboard_status_count': db.select(db.func.count(Registration.id))
+            .where(Registration.status == RegistrationStatus.PENDING_PAYMENT),
+        # Check-in lookups during exports and scans
+        'checkin_by_registration': db.select(CheckIn)
+            .where(CheckIn.registration_id == 1),
+        'recent_checkins': db.select(CheckIn)
+            .order_by(CheckIn.check_in_time.desc())
+            .limit(5),
+        # audit_logs() with only the days filter
+        'audit_logs_recent': db.select(AuditLog)
+            .where(AuditLog.timestamp >= week_ago)
+            .order_by(AuditLog.timestamp.desc())
+            .limit(50),
+        # audit_logs() with every filter set
+        'audit_logs_filtered': db.select(AuditLog)
+            .where(AuditLog.admin_id == 1, AuditLog.action == AuditLog.ACTION_UPDATE,
+                   AuditLog.resource_type == AuditLog.RESOURCE_REGISTRATION,
+                   AuditLog.timestamp >= week_ago)
+            .order_by(AuditLog.timestamp.desc())
+            .limit(50),
+    }
+
+def explain(statement):
+    """Run EXPLAIN on a statement and return the plan as a list of strings"""
+    dialect = db.engine.dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+
+    result = db.session.execute(db.text(prefix + sql))
+    columns = list(result.keys())
+    plan = []
+    for row in result:
+        if dialect.name == 'sqlite':
+            plan.append(row.detail)
+        else:
+            plan.append(', '.join(f'{col}={value}' for col, value in zip(columns, row) if value is not None))
+    return plan
+
+def main(argv):
+    save_path = None
+    compare_path = None
+    if '--save' in argv:
+        save_path = argv[argv.index('--save') + 1]
+    if '--compare' in argv:
+        compare_path = argv[argv.index('--compare') + 1]
+
+    previous = {}
+    if compare_path:
+        with open(compare_path) as f:
+            previous = json.load(f)
+
+    app = create_app()
+    with app.app_context():
+        plans = {name: explain(statement) for name, statement in hot_queries().items()}
+
+    changed = 0
+    for name, plan in plans.items():
+        print(f"== {name}")
+        if name in previous:
+            if previous[name] == plan:
+                print("   (plan unchanged)")
+            else:
+                changed += 1
+                print("   before:")
+                for line in previous[name]:
+                    print(f"     {line}")
+                print("   after:")
+        for line in plan:
+            print(f"     {line}")
+        print()
+
+    if compare_path:
+        print(f"{changed} of {len(plans)} query plans changed")
+
+    if save_path:
+        with open(save_path, 'w') as f:
+            json.dump(plans, f, indent=2)
+        print(f"Saved plans to {save_path}")
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,67 @@
+"""Normalise registration phone numbers
+
+Revision ID: 4f2a7c1e9d30
+Revises: 8b3d5f0e7a12
+Create Date: 2026-10-20 15:08:12.447610
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+import logging
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = '4f2a7c1e9d30'
+down_revision = '8b3d5f0e7a12'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Frozen copy of app.utils.availability.normalise_phone as of this revision
+_PHONE_SEPARATORS = re.compile(r'[\s\-().]')
+
+
+def _normalise_phone(phone):
+    return _PHONE_SEPARATORS.sub('', phone or '')
+
+
+def upgrade():
+    bind = op.get_bind()
+    rows = bind.execute(sa.text('SELECT id, phone_number FROM registrations ORDER BY id')).fetchall()
+    taken = {row.phone_number for row in rows}
+
+    updates = []
+    clashes = []
+    for row in rows:
+        phone = _normalise_phone(row.phone_number)
+        if phone == row.phone_number:
+            continue
+        if phone in taken:
+            # Left as it is for an admin to merge, rather than failing the migration
+            logger.warning(f"Registration {row.id}: phone number {phone} already belongs to another "
+                           f"registration, left as {row.phone_number!r}")
+            clashes.append(row.id)
+            continue
+        taken.discard(row.phone_number)
+        taken.add(phone)
+        updates.append({'id': row.id, 'phone_number': phone})
+
+    if updates:
+        # updated_at moves so the changes feed reports the new values
+        now = datetime.utcnow()
+        bind.execute(
+            sa.text('UPDATE registrations SET phone_number = :phone_number, updated_at = :now WHERE id = :id'),
+            [dict(update, now=now) for update in updates]
+        )
+    logger.info(f"Normalised {len(updates)} registration phone numbers")
+    if clashes:
+        logger.warning(f"{len(clashes)} registrations were left unnormalised, run "
+                       f"`flask report-unnormalised-phones` to list them")
+
+
+def downgrade():
+    # The separators that were stripped aren't kept anywhere
+    pass
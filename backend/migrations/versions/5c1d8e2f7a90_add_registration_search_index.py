@@ -0,0 +1,79 @@
+"""Add registration full-text search index
+
+Revision ID: 5c1d8e2f7a90
+Revises: f9e0150414d0
+Create Date: 2026-10-19 09:12:31.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import re
+import unicodedata
+
+
+# revision identifiers, used by Alembic.
+revision = '5c1d8e2f7a90'
+down_revision = 'f9e0150414d0'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLE = 'registration_search'
+
+
+# Frozen copy of app.utils.search.build_search_document as of this revision,
+# so the backfill doesn't change when the app's version does
+def _fold(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in value if not unicodedata.combining(c)).lower()
+
+
+def _tokenize(value):
+    return re.findall(r'[^\W_]+', _fold(value), re.UNICODE)
+
+
+def _build_search_document(name, email, phone_number):
+    tokens = _tokenize(name)
+
+    email = _fold(email)
+    local, _, domain = email.partition('@')
+    tokens.extend(_tokenize(local))
+    tokens.append(''.join(_tokenize(local)))
+    tokens.extend(_tokenize(domain))
+
+    digits = ''.join(c for c in (phone_number or '') if c.isdigit())
+    if digits:
+        tokens.append(digits)
+        if len(digits) > 9:
+            tokens.append(digits[-9:])
+
+    return ' '.join(dict.fromkeys(t for t in tokens if t))
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        op.execute(f"CREATE VIRTUAL TABLE {SEARCH_TABLE} "
+                   "USING fts5(document, tokenize='unicode61 remove_diacritics 2')")
+        insert = f'INSERT INTO {SEARCH_TABLE} (rowid, document) VALUES (:id, :document)'
+    else:
+        op.create_table(SEARCH_TABLE,
+        sa.Column('registration_id', sa.Integer(), nullable=False),
+        sa.Column('document', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['registration_id'], ['registrations.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('registration_id'),
+        mysql_engine='InnoDB'
+        )
+        op.execute(f'CREATE FULLTEXT INDEX ix_registration_search_document ON {SEARCH_TABLE} (document)')
+        insert = f'INSERT INTO {SEARCH_TABLE} (registration_id, document) VALUES (:id, :document)'
+
+    # Backfill the index from existing registrations
+    rows = bind.execute(sa.text('SELECT id, name, email, phone_number FROM registrations')).fetchall()
+    if rows:
+        bind.execute(sa.text(insert), [
+            {'id': row.id, 'document': _build_search_document(row.name, row.email, row.phone_number)}
+            for row in rows
+        ])
+
+
+def downgrade():
+    op.execute(f'DROP TABLE {SEARCH_TABLE}')
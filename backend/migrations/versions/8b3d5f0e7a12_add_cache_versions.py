@@ -0,0 +1,28 @@
+"""Add cache versions shared between workers
+
+Revision ID: 8b3d5f0e7a12
+Revises: e1f6b3a9c8d7
+Create Date: 2026-10-20 09:41:26.305118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b3d5f0e7a12'
+down_revision = 'e1f6b3a9c8d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -0,0 +1,64 @@
+"""Add composite indexes for hot queries
+
+Revision ID: a3f47c9d2b61
+Revises: 5c1d8e2f7a90
+Create Date: 2026-10-19 11:02:47.618233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f47c9d2b61'
+down_revision = '5c1d8e2f7a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # registrations() filters on status and pages on (created_at, id), and
+    # pending_verifications() on (updated_at, id); InnoDB appends the primary
+    # key to every secondary index, so id does not need to be listed
+    with op.batch_alter_table('registrations', schema=None) as batch_op:
+        batch_op.create_index('ix_registrations_status_created', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_registrations_archived_created', ['is_archived', 'created_at'], unique=False)
+        batch_op.create_index('ix_registrations_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_registrations_status_updated', ['status', 'updated_at'], unique=False)
+
+    # InnoDB indexes foreign keys by itself, but SQLite doesn't
+    with op.batch_alter_table('check_ins', schema=None) as batch_op:
+        batch_op.create_index('ix_check_ins_registration_id', ['registration_id'], unique=False)
+        batch_op.create_index('ix_check_ins_check_in_time', ['check_in_time'], unique=False)
+
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_logs_timestamp', ['timestamp'], unique=False)
+        batch_op.create_index('ix_audit_logs_admin_action_resource', ['admin_id', 'action', 'resource_type', 'timestamp'], unique=False)
+
+
+def _keep_foreign_key_indexed(table, name, column):
+    # InnoDB drops the index it made for a foreign key once another index
+    # covers the key, then refuses to drop that one (error 1553), so give the
+    # key an index of its own again first
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    if name not in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}:
+        op.create_index(name, table, [column], unique=False)
+
+
+def downgrade():
+    _keep_foreign_key_indexed('audit_logs', 'ix_audit_logs_admin_id', 'admin_id')
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_logs_admin_action_resource')
+        batch_op.drop_index('ix_audit_logs_timestamp')
+
+    _keep_foreign_key_indexed('check_ins', 'ix_check_ins_registration_fk', 'registration_id')
+    with op.batch_alter_table('check_ins', schema=None) as batch_op:
+        batch_op.drop_index('ix_check_ins_check_in_time')
+        batch_op.drop_index('ix_check_ins_registration_id')
+
+    with op.batch_alter_table('registrations', schema=None) as batch_op:
+        batch_op.drop_index('ix_registrations_status_updated')
+        batch_op.drop_index('ix_registrations_created_at')
+        batch_op.drop_index('ix_registrations_archived_created')
+        batch_op.drop_index('ix_registrations_status_created')
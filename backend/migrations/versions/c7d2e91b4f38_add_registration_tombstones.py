@@ -0,0 +1,42 @@
+"""Add registration tombstones for incremental exports
+
+Revision ID: c7d2e91b4f38
+Revises: a3f47c9d2b61
+Create Date: 2026-10-19 15:12:09.482107
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e91b4f38'
+down_revision = 'a3f47c9d2b61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('registration_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('registration_id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=100), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('registration_tombstones', schema=None) as batch_op:
+        batch_op.create_index('ix_registration_tombstones_deleted_at', ['deleted_at'], unique=False)
+
+    # Delta exports page through registrations on (updated_at, id)
+    with op.batch_alter_table('registrations', schema=None) as batch_op:
+        batch_op.create_index('ix_registrations_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('registrations', schema=None) as batch_op:
+        batch_op.drop_index('ix_registrations_updated_at')
+
+    with op.batch_alter_table('registration_tombstones', schema=None) as batch_op:
+        batch_op.drop_index('ix_registration_tombstones_deleted_at')
+
+    op.drop_table('registration_tombstones')
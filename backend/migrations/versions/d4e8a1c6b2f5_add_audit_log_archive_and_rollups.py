@@ -0,0 +1,52 @@
+"""Add audit log archive and daily rollups
+
+Revision ID: d4e8a1c6b2f5
+Revises: c7d2e91b4f38
+Create Date: 2026-10-19 16:04:31.277915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e8a1c6b2f5'
+down_revision = 'c7d2e91b4f38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('audit_logs_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('admin_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=100), nullable=False),
+    sa.Column('resource_type', sa.String(length=50), nullable=False),
+    sa.Column('resource_id', sa.Integer(), nullable=True),
+    sa.Column('details', sa.Text(), nullable=True),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('audit_logs_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_logs_archive_timestamp', ['timestamp'], unique=False)
+        batch_op.create_index('ix_audit_logs_archive_admin_timestamp', ['admin_id', 'timestamp'], unique=False)
+
+    op.create_table('audit_log_daily_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('admin_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=100), nullable=False),
+    sa.Column('resource_type', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'admin_id', 'action', 'resource_type')
+    )
+
+
+def downgrade():
+    op.drop_table('audit_log_daily_rollups')
+
+    with op.batch_alter_table('audit_logs_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_logs_archive_admin_timestamp')
+        batch_op.drop_index('ix_audit_logs_archive_timestamp')
+
+    op.drop_table('audit_logs_archive')
@@ -0,0 +1,46 @@
+"""Add structured audit log fields
+
+Revision ID: e1f6b3a9c8d7
+Revises: d4e8a1c6b2f5
+Create Date: 2026-10-19 16:48:55.104326
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f6b3a9c8d7'
+down_revision = 'd4e8a1c6b2f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('old_status', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('new_status', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('data', sa.JSON(), nullable=True))
+        batch_op.create_index('ix_audit_logs_action_timestamp', ['action', 'timestamp'], unique=False)
+        batch_op.create_index('ix_audit_logs_resource_timestamp', ['resource_type', 'resource_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_audit_logs_new_status_timestamp', ['new_status', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('audit_logs_archive', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('old_status', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('new_status', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('data', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('audit_logs_archive', schema=None) as batch_op:
+        batch_op.drop_column('data')
+        batch_op.drop_column('new_status')
+        batch_op.drop_column('old_status')
+
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_logs_new_status_timestamp')
+        batch_op.drop_index('ix_audit_logs_resource_timestamp')
+        batch_op.drop_index('ix_audit_logs_action_timestamp')
+        batch_op.drop_column('data')
+        batch_op.drop_column('new_status')
+        batch_op.drop_column('old_status')
@@ -0,0 +1,24 @@
+import pytest
+from app.utils.admission import get_store
+
+@pytest.fixture
+def full_room(app, monkeypatch):
+    """Turn the waiting room on with no free slots for registrations"""
+    monkeypatch.setitem(app.config, 'ADMISSION_ENABLED', True)
+    monkeypatch.setitem(app.config, 'ADMISSION_LIMITS', {'register': (0, 1)})
+    store = get_store(app)
+    with store._transaction() as connection:
+        connection.execute('DELETE FROM admission_tickets')
+    yield
+    with store._transaction() as connection:
+        connection.execute('DELETE FROM admission_tickets')
+
+def test_register_waits_in_line_when_enabled(client, full_room):
+    payload = {'name': 'Ama Mensah', 'email': 'ama@example.com', 'phone_number': '0241234567'}
+
+    response = client.post('/api/register', json=payload)
+    assert response.status_code == 202
+    assert response.json['position'] == 1
+
+    # The queue holds one ticket, so the next client is turned away
+    assert client.post('/api/register', json=payload).status_code == 503
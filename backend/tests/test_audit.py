@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+import pytest
+from flask import g
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.user import AuditLog, Registration, RegistrationStatus
+from app.routes import auth as auth_routes
+from app.utils.audit import record_audit_entry, flush_request_audit_entries, get_audit_buffer, retained_days
+
+@pytest.fixture(autouse=True)
+def empty_queue():
+    # pytest-flask's test request context lasts the whole test, so start clean
+    g.pop('audit_entries', None)
+    yield
+    g.pop('audit_entries', None)
+
+def _record(resource_id=1):
+    record_audit_entry(admin_id=1, action=AuditLog.ACTION_UPDATE,
+                       resource_type=AuditLog.RESOURCE_REGISTRATION, resource_id=resource_id)
+
+def _logged():
+    return [entry.resource_id for entry in AuditLog.query.order_by(AuditLog.resource_id)]
+
+def test_entries_are_written_with_the_request_commit(admin):
+    _record()
+    db.session.commit()
+
+    assert _logged() == [1]
+    assert not g.audit_entries
+
+def test_failed_commit_keeps_entries_queued(admin, make_registrations):
+    make_registrations(1)
+    _record()
+    # Same email as the existing registration, so the commit fails
+    db.session.add(Registration(name='Copy', email='attendee0@example.com', phone_number='0249999999'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+    assert _logged() == []
+    assert len(g.audit_entries) == 1
+
+def test_entries_left_at_the_end_of_a_request_are_written(admin):
+    _record(1)
+    _record(2)
+    flush_request_audit_entries()
+    assert _logged() == [1, 2]
+
+def test_entries_are_dropped_when_the_request_failed(admin):
+    _record()
+    flush_request_audit_entries(RuntimeError('boom'))
+    assert _logged() == []
+    assert 'audit_entries' not in g
+
+def test_check_in_is_audited_through_the_buffer(app, admin_client, make_registrations):
+    registration = make_registrations(1, status=RegistrationStatus.CONFIRMED)[0]
+
+    response = admin_client.post(f"/admin/check-in/{registration['id']}")
+    assert response.status_code == 302
+    get_audit_buffer(app).flush()
+
+    entry = AuditLog.query.filter_by(action=AuditLog.ACTION_CHECKIN).one()
+    assert entry.resource_id == registration['id']
+    assert entry.data['method'] == 'manual'
+
+@pytest.mark.parametrize('days, expected', [(7, (7, False)), (30, (30, False)), (90, (30, True)), (0, (30, True))])
+def test_retained_days(app, monkeypatch, days, expected):
+    monkeypatch.setitem(app.config, 'AUDIT_RETENTION_DAYS', 30)
+    assert retained_days(days) == expected
+
+def test_audit_log_view_says_when_history_is_archived(app, admin_client, monkeypatch):
+    monkeypatch.setitem(app.config, 'AUDIT_RETENTION_DAYS', 30)
+    rendered = {}
+    monkeypatch.setattr(auth_routes, 'render_template',
+                        lambda template, **context: rendered.update(context) or '')
+    db.session.add(AuditLog(admin_id=1, action=AuditLog.ACTION_UPDATE, resource_type=AuditLog.RESOURCE_SYSTEM,
+                            details='Old entry', timestamp=datetime.utcnow() - timedelta(days=40)))
+    db.session.commit()
+
+    admin_client.get('/auth/audit-logs?days=0')
+    with admin_client.session_transaction() as session:
+        messages = [message for _, message in session.pop('_flashes', [])]
+    assert 'Entries older than 30 days are archived, showing the last 30 days.' in messages
+    assert 'Old entry' not in [log.details for log in rendered['logs'].items]
@@ -0,0 +1,201 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.user import AuditLog, CheckIn, Registration, RegistrationStatus, RegistrationTombstone
+from app.routes import admin as admin_routes
+from app.utils import bulk as bulk_utils, email as email_utils
+from app.utils.availability import get_contact_set, normalise_email
+from app.utils.bulk import (bulk_set_archived, bulk_set_status, chunked, parse_registration_ids,
+                            purge_registrations)
+from app.utils.cache_versions import bump_shared_version, shared_version
+from app.utils.pagination import cached_count
+from app.utils.search import SEARCH_TABLE, rebuild_search_index
+
+@pytest.fixture
+def statements(database):
+    """Collect the SQL statements run during the test"""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        seen.append(' '.join(statement.split()).upper())
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield seen
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+def _statuses():
+    return dict(db.session.query(Registration.id, Registration.status))
+
+def test_chunked():
+    assert list(chunked(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(chunked([], 3)) == []
+
+def test_parse_registration_ids():
+    assert parse_registration_ids(['3', 1, 3]) == [1, 3]
+    with pytest.raises(ValueError):
+        parse_registration_ids('1,2')
+
+def test_bulk_status_runs_one_update_per_chunk(admin, make_registrations, statements):
+    ids = [row['id'] for row in make_registrations(7)]
+    statements.clear()
+
+    changed = bulk_set_status(ids, RegistrationStatus.CONFIRMED, admin.id, AuditLog.ACTION_APPROVE, size=3)
+
+    assert sorted(row['id'] for row in changed) == ids
+    assert sum(s.startswith('UPDATE REGISTRATIONS') for s in statements) == 3
+    assert set(_statuses().values()) == {RegistrationStatus.CONFIRMED}
+
+def test_bulk_status_skips_rows_already_in_status(admin, make_registrations):
+    confirmed = [row['id'] for row in make_registrations(2, status=RegistrationStatus.CONFIRMED)]
+    pending = [row['id'] for row in make_registrations(3)]
+
+    changed = bulk_set_status(confirmed + pending, RegistrationStatus.CONFIRMED, admin.id,
+                              AuditLog.ACTION_APPROVE, size=2)
+
+    assert sorted(row['id'] for row in changed) == pending
+    assert {row['old_status'] for row in changed} == {RegistrationStatus.PENDING_PAYMENT}
+
+    # One audit entry per registration that changed, written with its chunk
+    entries = AuditLog.query.filter_by(action=AuditLog.ACTION_APPROVE).all()
+    assert sorted(entry.resource_id for entry in entries) == pending
+    assert all(entry.data == {'bulk': True} and entry.new_status == 'CONFIRMED' for entry in entries)
+
+@pytest.fixture
+def qr_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'QR_CODE_FOLDER', str(tmp_path))
+    return tmp_path
+
+def test_bulk_approve_endpoint_queues_emails(app, admin_client, make_registrations, qr_folder, monkeypatch):
+    queued = []
+    monkeypatch.setattr(admin_routes, 'queue_bulk_registration_emails',
+                        lambda kind, rows: queued.append((kind, [row['id'] for row in rows])))
+    monkeypatch.setitem(app.config, 'BULK_CHUNK_SIZE', 2)
+    ids = [row['id'] for row in make_registrations(5, status=RegistrationStatus.PENDING_VERIFICATION)]
+    # No receipt uploaded yet, so there's nothing to approve
+    unpaid = make_registrations(1)[0]['id']
+
+    response = admin_client.post('/admin/bulk-approve', json={'registration_ids': ids + [unpaid, 999]})
+
+    assert response.status_code == 200
+    assert sorted(response.json['updated_ids']) == ids
+    assert queued == [('payment_confirmation', sorted(ids))]
+    assert _statuses()[unpaid] == RegistrationStatus.PENDING_PAYMENT
+
+    # Every approved registration has its check-in QR code, like a single approval
+    qr_codes = dict(db.session.query(Registration.id, Registration.qr_code).filter(Registration.id.in_(ids)))
+    assert qr_codes == {i: f'qrcodes/{i}.png' for i in ids}
+    assert all((qr_folder / f'{i}.png').exists() for i in ids)
+
+    # Nothing left to change, so nothing more is sent
+    again = admin_client.post('/admin/bulk-approve', json={'registration_ids': ids})
+    assert again.json['updated_count'] == 0
+    assert len(queued) == 1
+
+def test_registration_whose_qr_code_fails_is_left_pending(admin, make_registrations, qr_folder, monkeypatch):
+    ids = [row['id'] for row in make_registrations(3, status=RegistrationStatus.PENDING_VERIFICATION)]
+    generate = bulk_utils.generate_qr_code
+
+    def flaky(registration_id, email):
+        if registration_id == ids[1]:
+            raise OSError('disk full')
+        return generate(registration_id, email)
+
+    monkeypatch.setattr(bulk_utils, 'generate_qr_code', flaky)
+    changed = bulk_set_status(ids, RegistrationStatus.CONFIRMED, admin.id, AuditLog.ACTION_APPROVE,
+                              from_status=RegistrationStatus.PENDING_VERIFICATION, qr_codes=True)
+
+    assert [row['id'] for row in changed] == [ids[0], ids[2]]
+    assert _statuses()[ids[1]] == RegistrationStatus.PENDING_VERIFICATION
+
+def test_confirmation_emails_carry_the_qr_code(admin, make_registrations, qr_folder, monkeypatch):
+    saved = []
+    monkeypatch.setattr(email_utils, 'save_email_to_file', lambda msg: saved.append(msg) or True)
+    ids = [row['id'] for row in make_registrations(2, status=RegistrationStatus.PENDING_VERIFICATION)]
+    changed = bulk_set_status(ids, RegistrationStatus.CONFIRMED, admin.id, AuditLog.ACTION_APPROVE,
+                              from_status=RegistrationStatus.PENDING_VERIFICATION, qr_codes=True)
+
+    assert email_utils.send_bulk_registration_emails('payment_confirmation', changed) == 2
+    for msg, row in zip(saved, changed):
+        [attachment] = msg.attachments
+        assert attachment.disposition == 'inline'
+        assert attachment.data == (qr_folder / f"{row['id']}.png").read_bytes()
+
+def test_bulk_endpoints_reject_bad_ids(admin_client):
+    response = admin_client.post('/admin/bulk-reject', json={'registration_ids': ['x']})
+    assert response.status_code == 400
+
+def test_archive_runs_in_chunks_and_reports_progress(make_registrations, statements):
+    ids = [row['id'] for row in make_registrations(5)]
+    statements.clear()
+    progress = []
+
+    assert bulk_set_archived(ids, True, size=2, progress=progress.append) == 5
+    assert progress == [2, 4, 5]
+    assert sum(s.startswith('UPDATE REGISTRATIONS') for s in statements) == 3
+    assert Registration.query.filter_by(is_archived=True).count() == 5
+
+    # Rows already archived aren't counted again
+    assert bulk_set_archived(ids[:2], True) == 0
+    assert bulk_set_archived(ids[:2], False) == 2
+
+@pytest.fixture
+def static_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'static_folder', str(tmp_path))
+    (tmp_path / 'uploads').mkdir()
+    return tmp_path
+
+def test_purge_removes_everything_a_registration_left_behind(admin, make_registrations, static_dir):
+    rows = make_registrations(3)
+    ids = [row['id'] for row in rows]
+    receipt = static_dir / 'uploads' / 'receipt.png'
+    receipt.write_bytes(b'png')
+    Registration.query.filter_by(id=ids[0]).update({'receipt_url': 'uploads/receipt.png'})
+    db.session.add(CheckIn(registration_id=ids[0], checked_in_by=admin.id))
+    db.session.commit()
+    rebuild_search_index()
+    contacts = get_contact_set()
+    progress = []
+
+    assert purge_registrations(ids[:2], size=1, progress=progress.append) == 2
+
+    assert progress == [1, 2]
+    assert [registration.id for registration in Registration.query] == ids[2:]
+    assert CheckIn.query.count() == 0
+    assert sorted(t.registration_id for t in RegistrationTombstone.query) == ids[:2]
+    assert not receipt.exists()
+    indexed = db.session.execute(db.text(f'SELECT rowid FROM {SEARCH_TABLE}')).scalars().all()
+    assert indexed == ids[2:]
+    assert ('email', normalise_email(rows[0]['email'])) not in contacts
+
+def test_purge_reaches_other_workers_caches(make_registrations):
+    ids = [row['id'] for row in make_registrations(3)]
+    versions = {name: shared_version(name) for name in ('counts', 'histogram', 'contacts')}
+
+    purge_registrations(ids[:1])
+
+    assert all(shared_version(name) > version for name, version in versions.items())
+
+def test_shared_versions_drop_counts_and_contacts_cached_elsewhere(make_registrations):
+    rows = make_registrations(3)
+    assert cached_count(Registration.query) == 3
+    assert ('email', rows[0]['email']) in get_contact_set()
+
+    # Another worker purges a row, touching nothing in this process
+    with db.engine.begin() as connection:
+        connection.execute(Registration.__table__.delete().where(Registration.__table__.c.id == rows[0]['id']))
+        bump_shared_version('counts', connection)
+        bump_shared_version('contacts', connection)
+
+    assert cached_count(Registration.query) == 2
+    assert ('email', rows[0]['email']) not in get_contact_set()
+
+def test_bulk_purge_endpoint_reports_progress(app, admin_client, make_registrations, monkeypatch):
+    monkeypatch.setitem(app.config, 'BULK_CHUNK_SIZE', 2)
+    ids = [row['id'] for row in make_registrations(3)]
+
+    response = admin_client.post('/admin/bulk-purge', json={'registration_ids': ids})
+
+    assert response.status_code == 200
+    assert response.json['deleted_count'] == 3
+    assert response.json['progress'] == [2, 3]
+    assert Registration.query.count() == 0
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models.user import Registration
+from app.utils import histogram
+from app.utils.cache_versions import bump_shared_version
+from app.utils.histogram import compute_histogram, parse_timestamp
+
+NOW = datetime(2026, 3, 10, 12, 0)
+
+def _backdate(rows, when):
+    ids = [row['id'] for row in rows]
+    Registration.query.filter(Registration.id.in_(ids)).update({'created_at': when}, synchronize_session=False)
+    db.session.commit()
+
+def _counts(buckets):
+    return [bucket['count'] for bucket in buckets]
+
+def test_counts_rows_per_bucket(make_registrations):
+    _backdate(make_registrations(3), datetime(2026, 3, 8, 9, 30))
+    _backdate(make_registrations(2), datetime(2026, 3, 9, 18, 0))
+
+    buckets = compute_histogram('registrations', 86400, datetime(2026, 3, 7), datetime(2026, 3, 10), now=NOW)
+    assert _counts(buckets) == [0, 3, 2, 0]
+
+def test_closed_buckets_are_served_from_cache(make_registrations, count_queries):
+    _backdate(make_registrations(3), datetime(2026, 3, 8, 9, 30))
+    compute_histogram('registrations', 86400, datetime(2026, 3, 7), datetime(2026, 3, 9), now=NOW)
+
+    before = count_queries()
+    buckets = compute_histogram('registrations', 86400, datetime(2026, 3, 7), datetime(2026, 3, 9), now=NOW)
+    assert _counts(buckets) == [0, 3, 0]
+    # No bucket query; the cache version check isn't counted
+    assert count_queries() - before == 0
+
+def test_another_workers_invalidation_drops_the_cache(make_registrations):
+    rows = make_registrations(3)
+    _backdate(rows, datetime(2026, 3, 8, 9, 30))
+    compute_histogram('registrations', 86400, datetime(2026, 3, 7), datetime(2026, 3, 9), now=NOW)
+
+    # Delete a row and bump the version the way another process would,
+    # without touching this process's cache directly
+    Registration.query.filter_by(id=rows[0]['id']).delete()
+    db.session.commit()
+    bump_shared_version('histogram')
+
+    buckets = compute_histogram('registrations', 86400, datetime(2026, 3, 7), datetime(2026, 3, 9), now=NOW)
+    assert _counts(buckets) == [0, 2, 0]
+
+def test_cached_buckets_expire(app, make_registrations, monkeypatch):
+    rows = make_registrations(3)
+    _backdate(rows, datetime(2026, 3, 8, 9, 30))
+    compute_histogram('registrations', 86400, datetime(2026, 3, 7), datetime(2026, 3, 9), now=NOW)
+
+    Registration.query.filter_by(id=rows[0]['id']).delete()
+    db.session.commit()
+    monkeypatch.setitem(app.config, 'HISTOGRAM_CACHE_TTL', 0)
+
+    buckets = compute_histogram('registrations', 86400, datetime(2026, 3, 7), datetime(2026, 3, 9), now=NOW)
+    assert _counts(buckets) == [0, 2, 0]
+
+def test_cache_keeps_only_the_most_recent_widths(database, monkeypatch):
+    monkeypatch.setattr(histogram, 'MAX_CACHED_WIDTHS', 2)
+    for width in (3600, 7200, 3600, 10800):
+        compute_histogram('registrations', width, datetime(2026, 3, 7), datetime(2026, 3, 9), now=NOW)
+
+    # 3600 was used again after 7200, so 7200 went first
+    assert list(histogram._closed_buckets) == [('registrations', 3600), ('registrations', 10800)]
+
+def test_parse_timestamp_normalises_offsets_to_naive_utc():
+    assert parse_timestamp('2026-03-10T12:00:00Z') == datetime(2026, 3, 10, 12, 0)
+    assert parse_timestamp('2026-03-10T14:00:00+02:00') == datetime(2026, 3, 10, 12, 0)
+    assert parse_timestamp('2026-03-10T12:00:00') == datetime(2026, 3, 10, 12, 0)
+
+def test_histogram_endpoint_accepts_aware_timestamps(admin_client):
+    response = admin_client.get('/admin/api/histogram?source=registrations&bucket=1d'
+                                '&start=2026-03-01T00:00:00Z&end=2026-03-03T00:00:00%2B00:00')
+    assert response.status_code == 200
+    assert len(response.json['buckets']) == 3
+
+def test_histogram_endpoint_rejects_bad_timestamps(admin_client):
+    response = admin_client.get('/admin/api/histogram?start=yesterday')
+    assert response.status_code == 400
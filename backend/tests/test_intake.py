@@ -0,0 +1,124 @@
+from threading import Thread
+import pytest
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.user import Registration, RegistrationStatus
+from app.utils import intake
+from app.utils.intake import (create_registration, insert_registrations, duplicate_field, register_attendee,
+                              DuplicateRegistration, IntakeBuffer, IntakeTimeout)
+
+@pytest.mark.parametrize('message, field', [
+    ("(1062, \"Duplicate entry 'ama@example.com' for key 'registrations.email'\")", 'email'),
+    ("(1062, \"Duplicate entry '0241234567' for key 'phone_number'\")", 'phone_number'),
+    # The duplicate value can't be mistaken for the key
+    ("(1062, \"Duplicate entry 'phone_number@example.com' for key 'email'\")", 'email'),
+    ('UNIQUE constraint failed: registrations.phone_number', 'phone_number'),
+    ('UNIQUE constraint failed: registrations.email', 'email'),
+    ('NOT NULL constraint failed: registrations.name', None),
+])
+def test_duplicate_field(message, field):
+    assert duplicate_field(IntegrityError('INSERT', {}, Exception(message))) == field
+
+def test_create_registration(database):
+    registration = create_registration('Ama Mensah', 'ama@example.com', '0241234567')
+    assert registration.id is not None
+    assert registration.status == RegistrationStatus.PENDING_PAYMENT
+    assert db.session.get(Registration, registration.id).email == 'ama@example.com'
+
+@pytest.mark.parametrize('email, phone, field', [
+    ('ama@example.com', '0249999999', 'email'),
+    ('kofi@example.com', '0241234567', 'phone_number'),
+])
+def test_create_registration_maps_duplicates(database, email, phone, field):
+    create_registration('Ama Mensah', 'ama@example.com', '0241234567')
+    with pytest.raises(DuplicateRegistration) as error:
+        create_registration('Someone Else', email, phone)
+    assert error.value.field == field
+
+    # The session is usable again afterwards
+    assert Registration.query.count() == 1
+
+def test_insert_registrations_maps_duplicates(make_registrations):
+    make_registrations(1)
+    results = insert_registrations([
+        ('Taken Email', 'attendee0@example.com', '0249999990'),
+        ('Taken Phone', 'new1@example.com', '0240000000'),
+        ('New', 'new2@example.com', '0249999992'),
+        ('Repeated In Batch', 'new3@example.com', '0249999992'),
+    ])
+
+    assert [getattr(result, 'field', None) for result in results] == ['email', 'phone_number', None, 'phone_number']
+    assert results[2]['id'] == db.session.query(Registration.id).filter_by(email='new2@example.com').scalar()
+    assert Registration.query.count() == 2
+
+def test_register_endpoint_reports_duplicates(client, make_registrations):
+    make_registrations(1)
+    response = client.post('/api/register', json={
+        'name': 'Ama Mensah', 'email': 'attendee0@example.com', 'phone_number': '0249999999'
+    })
+    assert response.status_code == 409
+    assert response.json['error'] == 'Email already registered'
+
+@pytest.fixture
+def batching(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'INTAKE_BATCHING', True)
+
+@pytest.fixture
+def stalled_buffer(app, batching, monkeypatch):
+    """An intake buffer that never flushes on its own"""
+    buffer = IntakeBuffer(app, interval=3600, batch_size=1000)
+    monkeypatch.setattr(intake, '_buffer', buffer)
+    monkeypatch.setitem(app.config, 'INTAKE_WAIT_TIMEOUT', 0.05)
+    yield buffer
+    buffer.close()
+
+def test_concurrent_registrations_are_written_together(app, batching):
+    results = []
+
+    def register(i):
+        with app.app_context():
+            try:
+                results.append(register_attendee(f'Guest {i}', f'guest{i}@example.com', f'02450000{i:02d}'))
+            except DuplicateRegistration as e:
+                results.append(e)
+
+    threads = [Thread(target=register, args=(i % 8,)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    created = [result for result in results if isinstance(result, Registration)]
+    assert len(created) == 8
+    assert len({registration.id for registration in created}) == 8
+    assert sum(isinstance(result, DuplicateRegistration) for result in results) == 2
+    assert Registration.query.count() == 8
+
+def test_batch_that_races_another_writer_falls_back_to_single_rows(make_registrations, monkeypatch):
+    make_registrations(1)
+    # The pre-check misses the existing row, as if it was inserted right after
+    monkeypatch.setattr(intake, '_taken', lambda connection, rows: (set(), set()))
+
+    results = insert_registrations([
+        ('First', 'first@example.com', '0249999991'),
+        ('Clash', 'attendee0@example.com', '0249999992'),
+        ('Third', 'third@example.com', '0249999993'),
+    ])
+
+    assert isinstance(results[1], DuplicateRegistration) and results[1].field == 'email'
+    assert [row['email'] for row in (results[0], results[2])] == ['first@example.com', 'third@example.com']
+    assert Registration.query.count() == 3
+
+def test_timed_out_registration_is_never_written(stalled_buffer):
+    with pytest.raises(IntakeTimeout):
+        register_attendee('Late Guest', 'late@example.com', '0249999999')
+
+    stalled_buffer.flush()
+    assert Registration.query.filter_by(email='late@example.com').count() == 0
+
+def test_register_endpoint_returns_503_on_intake_timeout(client, stalled_buffer):
+    response = client.post('/api/register', json={
+        'name': 'Late Guest', 'email': 'late@example.com', 'phone_number': '0249999999'
+    })
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
@@ -0,0 +1,87 @@
+import pytest
+from app import db
+from app.models.user import Registration
+from app.utils.pagination import keyset_paginate, encode_cursor, InvalidCursor
+
+def _walk(per_page, descending=True):
+    pages, cursor = [], None
+    while True:
+        page = keyset_paginate(Registration.query, Registration, 'created_at', cursor=cursor,
+                               per_page=per_page, descending=descending)
+        pages.append(page)
+        if not page.has_next:
+            return pages
+        cursor = page.next_cursor
+
+def _ids(page):
+    return [registration.id for registration in page.items]
+
+def test_walks_every_row_once_newest_first(make_registrations):
+    # Rows from one batch share created_at, so the id breaks the ties
+    make_registrations(7)
+    pages = _walk(3)
+
+    assert [len(page.items) for page in pages] == [3, 3, 1]
+    assert sum((_ids(page) for page in pages), []) == list(range(7, 0, -1))
+    assert not pages[0].has_prev
+    assert pages[-1].next_cursor is None
+
+def test_walks_oldest_first(make_registrations):
+    make_registrations(5)
+    pages = _walk(2, descending=False)
+    assert sum((_ids(page) for page in pages), []) == [1, 2, 3, 4, 5]
+
+@pytest.mark.parametrize('descending', [True, False])
+def test_rows_without_a_sort_key_are_not_skipped(make_registrations, descending):
+    make_registrations(7)
+    # Legacy rows with no created_at
+    Registration.query.filter(Registration.id.in_([2, 3, 5])).update({'created_at': None})
+    db.session.commit()
+
+    pages = _walk(2, descending=descending)
+
+    expected = [7, 6, 4, 1, 5, 3, 2] if descending else [2, 3, 5, 1, 4, 6, 7]
+    assert sum((_ids(page) for page in pages), []) == expected
+
+    # Walking back from the last page retraces the same rows
+    back, cursor = [], pages[-1].prev_cursor
+    while cursor:
+        page = keyset_paginate(Registration.query, Registration, 'created_at', cursor=cursor, per_page=2,
+                               descending=descending)
+        back = _ids(page) + back
+        cursor = page.prev_cursor
+    assert back + _ids(pages[-1]) == expected
+
+def test_prev_cursor_returns_the_previous_page(make_registrations):
+    make_registrations(7)
+    first = keyset_paginate(Registration.query, Registration, 'created_at', per_page=3)
+    second = keyset_paginate(Registration.query, Registration, 'created_at', cursor=first.next_cursor, per_page=3)
+    back = keyset_paginate(Registration.query, Registration, 'created_at', cursor=second.prev_cursor, per_page=3)
+
+    assert _ids(back) == _ids(first)
+    assert back.next_cursor is not None
+    assert not back.has_prev
+
+def test_rows_added_while_paging_do_not_shift_pages(make_registrations):
+    make_registrations(6)
+    first = keyset_paginate(Registration.query, Registration, 'created_at', per_page=3)
+    make_registrations(4)
+    second = keyset_paginate(Registration.query, Registration, 'created_at', cursor=first.next_cursor, per_page=3)
+    assert _ids(second) == [3, 2, 1]
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', encode_cursor('updated_at', '2026-01-01T00:00:00', 1)])
+def test_rejects_bad_cursors(make_registrations, cursor):
+    make_registrations(2)
+    with pytest.raises(InvalidCursor):
+        keyset_paginate(Registration.query, Registration, 'created_at', cursor=cursor)
+
+def test_api_pages_with_cursors(app, client, make_registrations):
+    make_registrations(5)
+    headers = {'X-API-Key': app.config.get('API_KEY', 'your-api-key-here')}
+
+    first = client.get('/api/registrations?limit=2', headers=headers).json
+    second = client.get(f"/api/registrations?limit=2&cursor={first['next_cursor']}", headers=headers).json
+    assert [r['id'] for r in first['registrations']] == [5, 4]
+    assert [r['id'] for r in second['registrations']] == [3, 2]
+
+    assert client.get('/api/registrations?cursor=garbage', headers=headers).status_code == 400
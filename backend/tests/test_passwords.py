@@ -0,0 +1,82 @@
+import time
+import pytest
+from werkzeug.security import generate_password_hash
+from app.utils import passwords
+from app.utils.passwords import HashSlotStore, PasswordCheckBusy, get_store, verify_password
+
+@pytest.fixture
+def store(tmp_path):
+    return HashSlotStore(str(tmp_path / 'slots.sqlite'))
+
+@pytest.fixture
+def node_slots(app):
+    """The node's slot store, emptied before and after the test"""
+    store = get_store(app)
+
+    def clear():
+        with store._transaction() as connection:
+            connection.execute('DELETE FROM hash_slots')
+
+    clear()
+    yield store
+    clear()
+
+@pytest.mark.parametrize('method', ['pbkdf2:sha256:1000', 'pbkdf2:sha512', 'pbkdf2', 'scrypt', 'scrypt:16384:8:1'])
+def test_method_prefix_matches_what_werkzeug_records(method, monkeypatch):
+    expected = generate_password_hash('', method=method).split('$', 1)[0]
+    # Working the prefix out never hashes anything
+    monkeypatch.setattr(passwords, 'generate_password_hash', None)
+    passwords._method_prefix.cache_clear()
+    assert passwords._method_prefix(method) == expected
+
+def test_slots_are_handed_out_in_turn(store):
+    first, granted = store.acquire(1, 2)
+    assert granted
+    second, granted = store.acquire(1, 2)
+    third, _ = store.acquire(1, 2)
+    assert not granted
+    assert store.acquire(1, 2) is None
+
+    assert store.acquire(1, 2, token=third) == (third, False)
+    store.release(first)
+    # The head of the queue goes first
+    assert store.acquire(1, 2, token=third) == (third, False)
+    assert store.acquire(1, 2, token=second) == (second, True)
+
+def test_slots_of_crashed_workers_expire(store):
+    store.acquire(1, 0, now=1000)
+    assert store.acquire(1, 0, now=1001) is None
+    assert store.acquire(1, 0, now=1000 + store.slot_timeout + 1)[1]
+
+def test_busy_node_turns_password_checks_away(app, node_slots, monkeypatch):
+    # Other workers hold every slot
+    for _ in range(app.config['PASSWORD_HASH_WORKERS']):
+        node_slots.acquire(app.config['PASSWORD_HASH_WORKERS'], 0)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_TIMEOUT', 0.2)
+
+    started = time.monotonic()
+    with pytest.raises(PasswordCheckBusy):
+        verify_password(generate_password_hash('secret', method='pbkdf2:sha256:1000'), 'secret')
+    assert time.monotonic() - started < 2
+
+def test_slot_is_released_after_the_check(app, node_slots):
+    password_hash = generate_password_hash('secret', method='pbkdf2:sha256:1000')
+    for _ in range(app.config['PASSWORD_HASH_WORKERS'] + 1):
+        assert verify_password(password_hash, 'secret')
+
+    time.sleep(0.1)
+    with node_slots._transaction() as connection:
+        assert connection.execute('SELECT COUNT(*) FROM hash_slots').fetchone()[0] == 0
+
+def test_slow_hash_times_out(app, node_slots, monkeypatch):
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_TIMEOUT', 0.1)
+    with pytest.raises(PasswordCheckBusy):
+        passwords._run(time.sleep, 0.5)
+
+def test_login_returns_503_when_hashing_is_busy(app, client, admin, node_slots, monkeypatch):
+    for _ in range(app.config['PASSWORD_HASH_WORKERS']):
+        node_slots.acquire(app.config['PASSWORD_HASH_WORKERS'], 0)
+    monkeypatch.setitem(app.config, 'PASSWORD_HASH_QUEUE', 0)
+
+    response = client.post('/auth/login', data={'email': 'admin@example.com', 'password': 'password'})
+    assert response.status_code == 503
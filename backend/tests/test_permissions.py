@@ -0,0 +1,64 @@
+from datetime import datetime
+from flask import g
+from app import db
+from app.models.user import Admin, Permission, Role, admin_permissions
+from app.utils.cache_versions import shared_version, bump_shared_version
+from app.utils.admin_cache import load_admin_snapshot
+from app.utils.permissions import permission_set, _permission_cache
+
+def _viewer():
+    role = Role(name=Role.VIEWER, description='Read-only access')
+    admin = Admin(email='viewer@example.com', role=role)
+    admin.set_password('password')
+    permission = Permission(name=Permission.EXPORT_DATA, description='Export data')
+    db.session.add_all([role, admin, permission])
+    db.session.commit()
+    return admin, permission
+
+def test_orm_changes_bump_the_shared_version(database):
+    before = shared_version('permissions')
+    admin, permission = _viewer()
+    assert shared_version('permissions') > before
+
+    before = shared_version('permissions')
+    admin.permissions.append(permission)
+    db.session.commit()
+    assert shared_version('permissions') > before
+
+def test_another_workers_change_reaches_the_cache(database):
+    admin, permission = _viewer()
+    assert Permission.EXPORT_DATA not in permission_set(admin)
+    assert _permission_cache
+
+    # Another worker grants the permission; nothing in this process sees the write
+    with db.engine.begin() as connection:
+        connection.execute(admin_permissions.insert().values(admin_id=admin.id, permission_id=permission.id))
+        bump_shared_version('permissions', connection)
+
+    # Next request
+    g.pop('permission_sets', None)
+    assert Permission.EXPORT_DATA in permission_set(admin)
+
+def test_another_workers_admin_change_reaches_the_snapshot(database):
+    admin, _ = _viewer()
+    assert load_admin_snapshot(admin.id).is_active
+
+    # Another worker deactivates the account
+    with db.engine.begin() as connection:
+        connection.execute(Admin.__table__.update().where(Admin.__table__.c.id == admin.id).values(is_active=False))
+        bump_shared_version('admins', connection)
+
+    # Next request
+    db.session.expire_all()
+    assert not load_admin_snapshot(admin.id).is_active
+
+def test_logins_leave_other_workers_snapshots_alone(database):
+    admin, _ = _viewer()
+    before = shared_version('admins')
+    admin.last_login = datetime.utcnow()
+    db.session.commit()
+    assert shared_version('admins') == before
+
+    admin.is_active = False
+    db.session.commit()
+    assert shared_version('admins') > before
@@ -0,0 +1,75 @@
+import pytest
+from app import db
+from app.models.user import CheckIn, RegistrationStatus
+
+# Views with @query_budget raise QueryBudgetExceeded under TESTING, so these
+# also fail if a view goes over its own budget
+
+@pytest.fixture
+def api_headers(app):
+    return {'X-API-Key': app.config.get('API_KEY', 'your-api-key-here')}
+
+@pytest.fixture
+def measure(count_queries):
+    """Return a callable running a request and giving (response, statements it ran)"""
+    def run(client, url, **kwargs):
+        before = count_queries()
+        response = client.get(url, **kwargs)
+        # Streamed bodies run their queries while being read
+        response.get_data()
+        return response, count_queries() - before
+    return run
+
+def _check_in(admin, registrations):
+    db.session.add_all(CheckIn(registration_id=row['id'], checked_in_by=admin.id) for row in registrations)
+    db.session.commit()
+
+def _assert_flat(client, url, make_registrations, measure, **kwargs):
+    """Assert url runs the same number of statements for 3 rows as for 40"""
+    make_registrations(3, status=RegistrationStatus.CONFIRMED)
+    # Warm the login, permission and count caches
+    assert client.get(url, **kwargs).status_code == 200
+
+    make_registrations(1, status=RegistrationStatus.CONFIRMED)
+    response, few = measure(client, url, **kwargs)
+    assert response.status_code == 200
+
+    make_registrations(36, status=RegistrationStatus.CONFIRMED)
+    response, many = measure(client, url, **kwargs)
+    assert response.status_code == 200
+    assert many == few
+    return many
+
+def test_api_registrations(client, api_headers, make_registrations, measure):
+    assert _assert_flat(client, '/api/registrations', make_registrations, measure, headers=api_headers) == 1
+
+def test_api_registrations_cursor_page(client, api_headers, make_registrations, measure):
+    assert _assert_flat(client, '/api/registrations?limit=20', make_registrations, measure, headers=api_headers) == 1
+
+def test_api_registration_detail(client, admin, api_headers, make_registrations, measure):
+    registration = make_registrations(1)[0]
+    _check_in(admin, [registration])
+    response, queries = measure(client, f"/api/registrations/{registration['id']}", headers=api_headers)
+    assert response.status_code == 200
+    assert response.json['checked_in'] is True
+    assert queries <= 2
+
+@pytest.mark.parametrize('query', [
+    'draw=1&start=0&length=25',
+    'draw=1&start=0&length=25&search[value]=attendee',
+    'draw=1&length=25&paging=cursor',
+])
+def test_admin_registrations_table(admin_client, make_registrations, measure, query):
+    assert _assert_flat(admin_client, f'/admin/api/registrations?{query}', make_registrations, measure) <= 3
+
+def test_changes_feed(admin_client, admin, make_registrations, measure):
+    _check_in(admin, make_registrations(2))
+    assert _assert_flat(admin_client, '/admin/api/changes?since=2000-01-01T00:00:00',
+                        make_registrations, measure) <= 3
+
+def test_attendee_export_streams_in_one_query(admin_client, admin, make_registrations, measure):
+    _check_in(admin, make_registrations(2, status=RegistrationStatus.CONFIRMED))
+    assert _assert_flat(admin_client, '/admin/export-attendees', make_registrations, measure) <= 1
+
+def test_registration_export_does_not_query_per_row(admin_client, make_registrations, measure):
+    _assert_flat(admin_client, '/admin/export-registrations', make_registrations, measure)
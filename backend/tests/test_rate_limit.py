@@ -0,0 +1,35 @@
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+from app.utils.rate_limit import get_store
+
+@pytest.fixture
+def limited(app, monkeypatch):
+    """Allow one status check per client per minute"""
+    monkeypatch.setitem(app.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setitem(app.config, 'RATE_LIMITS', {'api.check_status': (1, 60)})
+    with get_store(app)._transaction() as connection:
+        connection.execute('DELETE FROM rate_limits')
+
+@pytest.fixture
+def proxied(app, monkeypatch):
+    """Serve the app as if deployed behind one reverse proxy"""
+    monkeypatch.setattr(app, 'wsgi_app', ProxyFix(app.wsgi_app, x_for=1))
+
+def _check(client, forwarded_for):
+    return client.get('/api/check-status/1', headers={'X-Forwarded-For': forwarded_for}).status_code
+
+def test_clients_behind_the_proxy_get_their_own_limits(client, limited, proxied):
+    assert _check(client, '203.0.113.1') != 429
+    assert _check(client, '203.0.113.1') == 429
+    assert _check(client, '203.0.113.2') != 429
+
+def test_only_the_trusted_hop_is_used(client, limited, proxied):
+    # A client can't dodge its limit by prepending addresses of its own
+    assert _check(client, '203.0.113.1') != 429
+    assert _check(client, '198.51.100.7, 203.0.113.1') == 429
+
+def test_forwarded_addresses_are_ignored_by_default(app, client, limited):
+    assert not app.config['PROXY_FIX_X_FOR']
+    assert _check(client, '203.0.113.1') != 429
+    # Without a trusted proxy a client can't get a fresh limit by naming another address
+    assert _check(client, '203.0.113.2') == 429
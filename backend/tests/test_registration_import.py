@@ -0,0 +1,106 @@
+import importlib.util
+import io
+import os
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from app import db
+from app.models.user import Registration
+from app.utils import email as email_utils
+from app.utils.availability import normalise_phone
+from app.utils.registration_import import import_registrations
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions',
+                         '4f2a7c1e9d30_normalise_registration_phone_numbers.py')
+
+def _phones():
+    return sorted(phone for phone, in db.session.query(Registration.phone_number))
+
+@pytest.mark.parametrize('typed', ['0241234567', ' 024 123 4567 ', '024-123-4567', '(024) 123.4567'])
+def test_normalise_phone(typed):
+    assert normalise_phone(typed) == '0241234567'
+
+def test_import_stores_phones_like_the_site(make_registrations):
+    make_registrations(1)
+    lines = io.StringIO(
+        'Full Name,Email Address,Phone\n'
+        'Ama Mensah,AMA@example.com,024 123 4567\n'
+        'Ama Again,ama2@example.com,(024) 123-4567\n'
+        'Taken Phone,kofi@example.com,024-000-0000\n'
+        'No Phone,esi@example.com,\n'
+    )
+    totals = import_registrations(lines)
+
+    assert totals == {'imported': 1, 'duplicate': 2, 'invalid': 1}
+    assert _phones() == ['0240000000', '0241234567']
+
+def test_site_and_lookup_use_normalised_phones(client, monkeypatch):
+    monkeypatch.setattr(email_utils, 'save_email_to_file', lambda msg: True)
+    response = client.post('/api/register', json={
+        'name': 'Ama Mensah', 'email': 'ama@example.com', 'phone_number': '024 123-4567'
+    })
+    assert response.status_code == 201
+    assert _phones() == ['0241234567']
+
+    assert client.get('/verify-phone/(024) 123 4567').json == {'exists': True}
+    duplicate = client.post('/api/register', json={
+        'name': 'Kofi', 'email': 'kofi@example.com', 'phone_number': '0241234567'
+    })
+    assert duplicate.status_code == 409
+
+@pytest.mark.parametrize('stored, typed', [
+    ('ama@example.com', 'AMA@Example.com'),
+    ('Ama@Example.com', 'ama@example.com'),
+])
+def test_email_lookup_ignores_case(client, stored, typed):
+    db.session.execute(Registration.__table__.insert(), [
+        {'name': 'Ama', 'email': stored, 'phone_number': '0241234567', 'status': 'PENDING_PAYMENT'},
+    ])
+    db.session.commit()
+    assert client.get(f'/verify-email/{typed}').json == {'exists': True}
+    assert client.get('/verify-email/kofi@example.com').json == {'exists': False}
+
+def test_migration_normalises_existing_phones(database):
+    table = Registration.__table__
+    db.session.execute(table.insert(), [
+        {'name': 'A', 'email': 'a@example.com', 'phone_number': '024 111 1111', 'status': 'PENDING_PAYMENT'},
+        {'name': 'B', 'email': 'b@example.com', 'phone_number': '0242222222', 'status': 'PENDING_PAYMENT'},
+        # Collides with B once normalised, so it's left for an admin
+        {'name': 'C', 'email': 'c@example.com', 'phone_number': '024-222-2222', 'status': 'PENDING_PAYMENT'},
+    ])
+    db.session.commit()
+
+    spec = importlib.util.spec_from_file_location('normalise_phones', MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with db.engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            migration.upgrade()
+
+    db.session.expire_all()
+    assert _phones() == ['024-222-2222', '0241111111', '0242222222']
+
+def test_unnormalised_phones_are_reported(app, make_registrations):
+    holder = make_registrations(1)[0]
+    db.session.execute(Registration.__table__.insert(), [
+        {'name': 'C', 'email': 'c@example.com', 'phone_number': '024-000-0000', 'status': 'PENDING_PAYMENT'},
+        {'name': 'D', 'email': 'd@example.com', 'phone_number': '024 999 9999', 'status': 'PENDING_PAYMENT'},
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['report-unnormalised-phones'])
+
+    assert result.exit_code == 0
+    assert result.output.splitlines() == [
+        f"Registration {holder['id'] + 1} (c@example.com): '024-000-0000', registration {holder['id']} has it normalised",
+        f"Registration {holder['id'] + 2} (d@example.com): '024 999 9999', no clash left, edit to normalise",
+        "2 registrations have phone numbers that aren't normalised.",
+    ]
+
+def test_bulk_emails_keep_the_plain_text_part(app, make_registrations, monkeypatch):
+    saved = []
+    monkeypatch.setattr(email_utils, 'save_email_to_file', lambda msg: saved.append(msg) or True)
+    rows = make_registrations(2)
+
+    assert email_utils.send_bulk_registration_emails('registration_confirmation', rows) == 2
+    assert all(msg.html and rows[i]['name'] in msg.body for i, msg in enumerate(saved))
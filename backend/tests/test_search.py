@@ -0,0 +1,78 @@
+import pytest
+from app import db
+from app.models.user import Registration, RegistrationStatus
+from app.utils.intake import create_registration, insert_registrations
+from app.utils.search import SEARCH_TABLE, apply_search, build_match_query, rebuild_search_index
+
+@pytest.fixture
+def search_index(database):
+    rebuild_search_index()
+
+def _indexed(term):
+    """Ids matched through the full-text table itself, not the LIKE fallback"""
+    rows = db.session.execute(db.text(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :q'),
+                              {'q': f'"{term}"*'})
+    return sorted(row[0] for row in rows)
+
+def _search(term):
+    return sorted(r.id for r in apply_search(Registration.query, term))
+
+def test_rebuild_indexes_existing_rows(make_registrations):
+    rows = make_registrations(3)
+    rebuild_search_index()
+    assert _indexed('attendee1') == [rows[1]['id']]
+
+def test_orm_insert_update_and_delete_keep_the_index_in_sync(search_index):
+    registration = Registration(name='Kwame Mensah', email='kwame@example.com', phone_number='0241234567',
+                                status=RegistrationStatus.PENDING_PAYMENT)
+    db.session.add(registration)
+    db.session.commit()
+    assert _indexed('mensah') == [registration.id]
+
+    registration.name = 'Kwame Asante'
+    db.session.commit()
+    assert _indexed('mensah') == []
+    assert _indexed('asante') == [registration.id]
+
+    db.session.delete(registration)
+    db.session.commit()
+    assert _indexed('asante') == []
+
+def test_single_insert_is_indexed(search_index):
+    registration = create_registration('Ama Owusu', 'ama@example.com', '0201112222')
+    assert _indexed('owusu') == [registration.id]
+    assert _search('Owusu') == [registration.id]
+
+def test_batched_core_insert_is_indexed(search_index):
+    rows = insert_registrations([
+        ('Yaw Boateng', 'yaw@example.com', '0541112222'),
+        ('Efua Boateng', 'efua@example.com', '0541113333'),
+    ])
+    assert _indexed('boateng') == sorted(row['id'] for row in rows)
+    # Phone numbers are found by their digits, with or without the trunk zero
+    assert _search('541113333') == [rows[1]['id']]
+
+def test_duplicates_in_a_batch_are_not_indexed(search_index):
+    rows = insert_registrations([
+        ('Kofi Annan', 'kofi@example.com', '0241110000'),
+        ('Kofi Again', 'kofi@example.com', '0241110001'),
+    ])
+    assert isinstance(rows[1], Exception)
+    assert _indexed('kofi') == [rows[0]['id']]
+
+@pytest.mark.parametrize('term, expected', [
+    ('ama@example.com', ('+(ama*) +(example*)', ['com'])),
+    ('Ama Li', ('+(ama*)', ['li'])),
+    ('the who', (None, ['the', 'who'])),
+    ('024 123', ('+(024123* 24123*)', [])),
+])
+def test_mysql_match_query_leaves_out_words_innodb_does_not_index(term, expected):
+    assert build_match_query(term, 'mysql') == expected
+
+def test_words_the_index_cannot_match_are_still_required(search_index):
+    rows = insert_registrations([
+        ('Ama Li', 'ama.li@example.com', '0241110000'),
+        ('Ama Owusu', 'ama@example.com', '0241110001'),
+    ])
+    assert _search('Ama Li') == [rows[0]['id']]
+    assert _search('Ama') == sorted(row['id'] for row in rows)